@@ -1,56 +1,167 @@
+import os
 import streamlit as st
 import pandas as pd
-import numpy as np
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 from collections import Counter
+from datetime import timedelta
+
+from logica.cache_busquedas import CacheBusquedas
+from logica.datos import RUTA_DICCIONARIO, RUTA_EMBEDDINGS, RUTA_OTS
+from logica.indice_actuaciones import cargar_o_construir, definiciones_por_codigo
+from logica.ingesta import DIR_INGESTA, FICHERO_REGISTRO, RegistroIngesta, codificar
+from logica.instrumentacion import medir, contar, iniciar_traza, cerrar_traza
+from logica.sintesis import CacheRespuestas, ErrorLLM, MAX_VECINOS_PROMPT, sintetizar
+from logica.cliente_llm_async import ClienteOllamaAsync, ClienteLLMFondo
+from logica.memoria_compartida import limpiar, plano_ots
+from logica.multicampo import RUTA_EMBEDDINGS_CAMPOS, apilar_consulta, pesos_configurados, similaridad_ponderada
+from logica.shards import DIR_SHARDS, MANIFIESTO, RouterShards
+from logica.resultados import construir_resultado, descripciones_claveros
+from logica.snapshots import GestorSnapshots
+from vistas.panel_debug import perfil_activo, render_panel_debug
 
 # --- CACHING: cargar recursos pesados una sola vez ---
 @st.cache_resource
 def load_model():
     return SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
 
+# `version` (fecha de modificación del fichero) forma parte de la clave de la caché: si el CSV
+# cambia, la siguiente ejecución lo vuelve a leer sin reiniciar la aplicación
 @st.cache_data
-def load_embeddings(path="embeddings.npy"):
-    return np.load(path)
+def load_jerarquia(path="data/jerarquia_total.csv", version=None):
+    return pd.read_csv(path)
 
 @st.cache_data
-def load_df(path="data/data_ots_completo.csv"):
+def load_diccionario(path="data/diccionario.csv", version=None):
     return pd.read_csv(path)
 
 @st.cache_data
-def load_jerarquia(path="data/jerarquia_total.csv"):
-    return pd.read_csv(path)
+def load_definiciones(path="data/diccionario.csv", version=None):
+    # código de tarea -> definición, para no filtrar el diccionario por cada código
+    return definiciones_por_codigo(load_diccionario(path, version))
+
+@st.cache_resource
+def load_indice_actuaciones(version=None):
+    # Definiciones del diccionario ya codificadas (se reconstruye si cambia el diccionario)
+    return cargar_o_construir(codificar_textos=lambda textos: codificar(textos, model))
 
 @st.cache_data
-def load_diccionario(path="data/diccionario.csv"):
-    return pd.read_csv(path)
+def load_descripciones(path="data/jerarquia_total.csv", version=None):
+    # clavero -> componente_total, para no recorrer jerarquia_total por cada clavero de los vecinos
+    return descripciones_claveros(load_jerarquia(path, version))
 
-# --- UTILIDADES ---
-model = load_model()
-df = load_df()
-embeddings = load_embeddings()
-jerarquia_total = load_jerarquia()
-diccionario = load_diccionario()
+def _version(path):
+    return os.path.getmtime(path) if os.path.exists(path) else None
 
-col_texto = "descripcion_ot"
-col_clave = "clavero"
+@st.cache_resource
+def load_cliente_llm():
+    # Un único cliente asíncrono por proceso, compartido por todas las sesiones
+    return ClienteLLMFondo(ClienteOllamaAsync())
 
+@st.cache_resource
+def load_cache_respuestas():
+    return CacheRespuestas()
 
-def buscar_averias(query, top_k=10):
-    """Devuelve los vecinos más similares y un conteo de claves (clavero)."""
-    query_vec = model.encode([query], normalize_embeddings=True)
-    scores = cosine_similarity(query_vec, embeddings)[0]
-    top_idx = np.argsort(scores)[::-1][:top_k]
+@st.cache_resource
+def load_cache_busquedas():
+    # Vecinos de cada búsqueda, compartidos por todas las sesiones y procesos de la máquina
+    return CacheBusquedas()
+
+def _construir_router():
+    # Con data/shards/manifest.json se cargan sólo los shards que pide cada consulta; si no, el
+    # CSV y los embeddings se publican una vez en el plano compartido y todos los procesos de
+    # Streamlit de la máquina los leen del mismo mmap
+    if RouterShards.existe():
+        router = RouterShards.abrir()
+    else:
+        router = RouterShards.desde_plano(plano_ots(RUTA_OTS, _ruta_embeddings()))
+    return _aplicar_registro(router)
+
+def _ruta_embeddings():
+    # Con embeddings_campos.npy (logica.multicampo) se puntúan también la avería y la reparación
+    return RUTA_EMBEDDINGS_CAMPOS if os.path.exists(RUTA_EMBEDDINGS_CAMPOS) else RUTA_EMBEDDINGS
+
+def _aplicar_registro(router):
+    # Las OTs ingeridas (logica.ingesta) van a los shards delta del router, sin recargar la base
+    pendientes = RegistroIngesta().pendientes(router.registro, 'ots', router.filas() - router.filas_delta(),
+                                              dimension=router.manifiesto['dimension'])
+    if pendientes is None:
+        return None
+    df, embeddings, posicion = pendientes
+    nuevo = router.agregar(df, embeddings) if len(df) else router
+    nuevo.registro = posicion
+    return nuevo
+
+def _fuentes_router():
+    if RouterShards.existe():
+        return [os.path.join(DIR_SHARDS, MANIFIESTO)]
+    return [RUTA_OTS, _ruta_embeddings()]
+
+def _retirar_plano(nuevo, viejo):
+    # Los procesos que aún usan el plano anterior conservan su mmap aunque se borren los ficheros
+    if viejo is not None and nuevo.plano is not None:
+        limpiar(os.path.dirname(nuevo.plano.ruta), conservar=[nuevo.plano.ruta], prefijo='ots-')
 
-    cols_to_keep = [col_texto, col_clave]
-    if 'clavero_actuacion' in df.columns:
-        cols_to_keep.append('clavero_actuacion')
-    if 'descripcion_averia' in df.columns:
-        cols_to_keep.append('descripcion_averia')
+@st.cache_resource
+def load_snapshots():
+    # El router vigente se sustituye en segundo plano cuando cambian el CSV o los embeddings
+    # (las OTs ingeridas se aplican sobre el router vigente)
+    return GestorSnapshots('busqueda', _construir_router, _fuentes_router, al_publicar=_retirar_plano,
+                           registro=[os.path.join(DIR_INGESTA, FICHERO_REGISTRO)], actualizar=_aplicar_registro)
 
-    vecinos = df.iloc[top_idx][cols_to_keep].copy()
-    vecinos["similaridad"] = scores[top_idx]
+# --- UTILIDADES ---
+model = load_model()
+# Cada ejecución del script usa un único snapshot de principio a fin
+router = load_snapshots().actual()
+descripciones = load_descripciones(version=_version("data/jerarquia_total.csv"))
+definiciones = load_definiciones(version=_version(RUTA_DICCIONARIO))
+indice_actuaciones = load_indice_actuaciones(version=_version(RUTA_DICCIONARIO))
+
+col_texto = "descripcion_ot"
+col_clave = "clavero"
+SIN_DEFINICION = 'No hay actuación registrada en el manual.'
+
+
+def buscar_averias(query, top_k=10, diversidad=None, desde=None, hasta=None, flotas=None, sistemas=None, pesos=None):
+    """Devuelve los vecinos más similares y un conteo de claves (clavero).
+
+    Si se indica `diversidad` (lambda de MMR entre 0 y 1) los vecinos se re-ordenan
+    para no repetir el mismo clavero y la misma redacción. `desde`/`hasta` limitan la
+    búsqueda a órdenes con fecha_creacion en [desde, hasta). `flotas`/`sistemas` limitan
+    los shards en los que se busca (None = todos). Los vecinos de una búsqueda ya hecha con el
+    mismo índice se leen de la caché compartida sin codificar la consulta. Con el almacén de
+    embeddings por campo, `pesos` (descripcion_ot, avería, reparación; por defecto los de
+    $AVERIAS_PESOS_CAMPOS) ponderan la similitud de cada campo.
+    """
+    contar('busqueda.consultas')
+    pesos = pesos_configurados() if pesos is None else tuple(pesos)
+    dimension = router.manifiesto['dimension']
+    cache = load_cache_busquedas()
+    cache.usar_version(router.version)
+    clave_cache = cache.clave(query, router.version, top_k=top_k, diversidad=diversidad, desde=desde, hasta=hasta, flotas=flotas, sistemas=sistemas, pesos=','.join(map(str, pesos)))
+    with medir('busqueda.cache'):
+        vecinos = cache.get(clave_cache)
+
+    if vecinos is None:
+        with medir('busqueda.encode'):
+            query_vec = model.encode([query], normalize_embeddings=True)[0]
+            multicampo = dimension != query_vec.shape[0]
+            query_vec = apilar_consulta(query_vec, dimension, pesos)
+        with medir('busqueda.shards'):
+            resultado = router.buscar(query_vec, top_k, flotas=flotas, sistemas=sistemas, diversidad=diversidad, desde=desde, hasta=hasta)
+        contar('busqueda.shards', len(router.claves(flotas, sistemas)))
+        if multicampo and len(resultado):
+            resultado['similaridad'] = similaridad_ponderada(resultado['similaridad'].to_numpy(), pesos)
+
+        cols_to_keep = [col_texto, col_clave]
+        if 'clavero_actuacion' in resultado.columns:
+            cols_to_keep.append('clavero_actuacion')
+        if 'descripcion_averia' in resultado.columns:
+            cols_to_keep.append('descripcion_averia')
+        if 'descripcion_reparacion' in resultado.columns:
+            cols_to_keep.append('descripcion_reparacion')
+
+        vecinos = resultado.reindex(columns=cols_to_keep + ['flota', 'similaridad'])
+        cache.set(clave_cache, router.version, vecinos)
 
     claves = vecinos[col_clave].dropna().tolist() if col_clave in vecinos.columns else []
     conteo = Counter(claves)
@@ -58,156 +169,149 @@ def buscar_averias(query, top_k=10):
     return vecinos, conteo
 
 
+@medir('diccionario.buscar_definicion')
 def buscar_definicion_por_codigo(cod_act):
-    """Busca la definición en el diccionario por diferentes columnas conocidas."""
+    """Busca la definición en el diccionario por 'Código tarea std' o 'Std Tasks Codes'."""
     if not cod_act or pd.isna(cod_act):
-        return 'No hay actuación registrada en el manual.'
-    cod_act_clean = str(cod_act).strip()
-    defin_row = pd.DataFrame()
-
-    if 'Código tarea std' in diccionario.columns:
-        mask1 = diccionario['Código tarea std'].astype(str).str.strip() == cod_act_clean
-        if mask1.any():
-            defin_row = diccionario.loc[mask1]
-    if defin_row.empty and 'Std Tasks Codes' in diccionario.columns:
-        mask2 = diccionario['Std Tasks Codes'].astype(str).str.strip() == cod_act_clean
-        if mask2.any():
-            defin_row = diccionario.loc[mask2]
-
-    if defin_row.empty:
-        return 'No hay actuación registrada en el manual.'
-
-    if 'DEFINICION' in defin_row.columns:
-        defin_text = defin_row['DEFINICION'].values[0]
-    elif 'DEFINITION' in defin_row.columns:
-        defin_text = defin_row['DEFINITION'].values[0]
-    else:
-        possible = [c for c in defin_row.columns if 'defin' in c.lower() or 'descripcion' in c.lower()]
-        defin_text = defin_row[possible[0]].values[0] if possible else 'No hay actuación registrada en el manual.'
-
-    if pd.isna(defin_text) or str(defin_text).strip() == '':
-        return 'No hay actuación registrada en el manual.'
+        return SIN_DEFINICION
+    defin_text = definiciones.get(str(cod_act).strip())
+    if defin_text is None or str(defin_text).strip() == '':
+        return SIN_DEFINICION
     return defin_text
 
 
+@st.cache_data(max_entries=256)
+def vector_consulta(query):
+    # Sólo para ordenar actuaciones: las búsquedas servidas desde la caché no codifican la consulta
+    return model.encode([query], normalize_embeddings=True)[0]
+
+
+def mostrar_actuaciones(consulta, clavero=None, top=3):
+    """Actuaciones del manual (de `clavero` y sus descendientes) más parecidas a la consulta."""
+    with medir('actuaciones.rankear'):
+        candidatas = indice_actuaciones.rankear(vector_consulta(consulta), clavero, top=top)
+    if candidatas.empty:
+        return
+    st.subheader("Actuaciones del manual más parecidas a la descripción")
+    for _, act in candidatas.iterrows():
+        st.write(f"**{act['codigo']}** ({act['similaridad']:.2f}): {act['definicion']}")
+
+
+def mostrar_detalle(resultado, fila):
+    desc_averia, cod_act, defin_text = resultado.detalle(fila)
+    st.write(f"**Descripción de la avería por el operario:** {desc_averia}")
+    st.write(f"**Actuación que se llevó a cabo:** {defin_text}")
+    st.write(f"**Código tarea:** {cod_act if cod_act else '(no indicado)'}")
+
+
+# Los cambios de selección sólo re-ejecutan este fragment, no el script completo
+@st.fragment
+def panel_resultados(resultado):
+    with medir('resultados.detalle'):
+        if resultado.hay_alta:
+            st.subheader("Selecciona el componente implicado")
+            st.write("En base al histórico de órdenes de trabajo te presentamos las componentes más probables con las que podría estar relacionada la avería. ")
+
+            seleccion = st.selectbox("Componentes:", list(resultado.opciones_componentes), key='seleccion_clavero')
+
+            if seleccion:
+                clave_sel, desc_sel, pct_sel = resultado.opciones_componentes[seleccion]
+                mostrar_actuaciones(resultado.consulta, clave_sel)
+
+                vecinos_clave = resultado.vecinos_de(clave_sel)
+                if vecinos_clave.empty:
+                    st.info("No hay registros históricos en los vecinos para la clave seleccionada.")
+                else:
+                    st.subheader("Órdenes de trabajo históricas relacionadas con dicho componente")
+                    # Mostrar lista resumida y detalles en expanders
+                    for idx, fila in vecinos_clave.iterrows():
+                        with st.expander(f"Orden {idx}", expanded=False):
+                            mostrar_detalle(resultado, fila)
+
+        else:
+            # Todos los componentes tienen probabilidad <= 10% -> mostrar las 5 órdenes con mayor similaridad
+            st.write("Presentando las 5 órdenes históricas más similares al texto introducido para que elijas la más relevante.")
+
+            seleccion = st.selectbox("Órdenes más similares:", list(resultado.opciones_vecinos), key='seleccion_vecino_por_sim')
+
+            if seleccion:
+                fila = resultado.opciones_vecinos[seleccion]
+                st.subheader(f"Detalles de la orden seleccionada (similaridad: {fila.get('similaridad', 0.0):.3f})")
+                mostrar_detalle(resultado, fila)
+
+            mostrar_actuaciones(resultado.consulta)
+
+
+@st.fragment
+def panel_resumen(resultado):
+    st.subheader("Resumen generado con IA")
+    st.write("Combina las reparaciones de las órdenes más similares en una recomendación (modelo local).")
+    if st.button("Generar resumen de las reparaciones", key='generar_resumen'):
+        vecinos = resultado.vecinos
+        definiciones = {}
+        if 'clavero_actuacion' in vecinos.columns:
+            for cod in vecinos['clavero_actuacion'].head(MAX_VECINOS_PROMPT).dropna().unique():
+                defin = resultado.definiciones.get(cod, SIN_DEFINICION)
+                if defin != SIN_DEFINICION:
+                    definiciones[cod] = defin
+        try:
+            with medir('sintesis.llm'):
+                st.write_stream(sintetizar(resultado.consulta, vecinos, load_cliente_llm(), load_cache_respuestas(), definiciones))
+        except ErrorLLM as exc:
+            st.warning(f"No se pudo generar el resumen: {exc}")
+
+
 # --- INTERFAZ STREAMLIT ---
 st.set_page_config(page_title="Búsqueda de averías", layout="wide")
 st.title("Buscador de averías — Asistente para operarios")
 st.write("Introduce la descripción de la avería y el sistema te mostrará averías históricas similares y las actuaciones asociadas.")
 
-with st.form("form_busqueda"):
-    consulta = st.text_area("Descripción de la avería (operario):", height=120)
-    top_k = 10
-    submitted = st.form_submit_button("Buscar")
-
-if submitted:
-    if not consulta or str(consulta).strip() == "":
-        st.warning("Por favor introduce una descripción de la avería.")
-    else:
-        with st.spinner("Buscando averías similares..."):
-            vecinos, conteo = buscar_averias(consulta, top_k=top_k)
-
-        # Guardar resultados en session_state para que la UI (selectbox) pueda interactuar
-        st.session_state['vecinos'] = vecinos
-        st.session_state['conteo'] = conteo
-        st.session_state['consulta'] = consulta
-        st.session_state['top_k'] = top_k
-
-        st.success("Búsqueda realizada. Selecciona una opción en el desplegable para ver los registros históricos.")
-
-# Renderizar la UI de resultados siempre que haya resultados guardados en session_state
-if 'conteo' in st.session_state and st.session_state['conteo']:
-    vecinos = st.session_state['vecinos']
-    conteo = st.session_state['conteo']
-
-    total = sum(conteo.values())
-    # construir lista de entradas (clave, freq, porcentaje_float, descripcion)
-    entradas = []
-    for clave, freq in conteo.items():
-        descripcion = jerarquia_total.loc[jerarquia_total['clavero'] == clave, 'componente_total']
-        descripcion_texto = descripcion.values[0] if not descripcion.empty else '(sin descripción)'
-        porcentaje_float = (freq / total) if total > 0 else 0.0
-        entradas.append((clave, freq, porcentaje_float, descripcion_texto))
-
-    # determinar si hay alguna entrada con probabilidad > 10%
-    hay_alta = any(pct > 0.10 for (_, _, pct, _) in entradas)
-
-    if hay_alta:
-        # filtrar y ordenar por probabilidad descendente
-        entradas_filtradas = sorted([e for e in entradas if e[2] > 0.10], key=lambda x: x[2], reverse=True)
-
-        opciones = []
-        mapping = {}
-        st.subheader("Selecciona el componente implicado")
-        st.write("En base al histórico de órdenes de trabajo te presentamos las componentes más probables con las que podría estar relacionada la avería. ")
-
-        for i, (clave, freq, pct, descripcion_texto) in enumerate(entradas_filtradas):
-            # no mostrar porcentajes; marcar la primera como 'Más probable'
-            if i == 0:
-                label = f"{descripcion_texto} (Opción más probable)"
-            else:
-                label = f"{descripcion_texto} "
-            opciones.append(label)
-            mapping[label] = (clave, descripcion_texto, pct)
-
-        seleccion = st.selectbox("Componentes:", opciones, key='seleccion_clavero')
-
-        if seleccion:
-            clave_sel, desc_sel, pct_sel = mapping[seleccion]
-
-            vecinos_clave = vecinos[vecinos[col_clave] == clave_sel] if col_clave in vecinos.columns else pd.DataFrame()
-            if vecinos_clave.empty:
-                st.info("No hay registros históricos en los vecinos para la clave seleccionada.")
-            else:
-                st.subheader("Órdenes de trabajo históricas relacionadas con dicho componente")
-                # Mostrar lista resumida y detalles en expanders
-                for idx, fila in vecinos_clave.iterrows():
-                    desc_averia = fila.get('descripcion_averia', '') if ('descripcion_averia' in fila.index and pd.notna(fila.get('descripcion_averia', ''))) else '(sin descripción de avería)'
-                    cod_act = fila.get('clavero_actuacion', '') if ('clavero_actuacion' in fila.index and pd.notna(fila.get('clavero_actuacion', ''))) else ''
-                    similar = fila.get('similaridad', None)
-
-                    if cod_act:
-                        defin_text = buscar_definicion_por_codigo(cod_act)
-                    else:
-                        defin_text = 'No hay código de actuación en el registro.'
-
-                    titulo = f"Orden {idx}"
-                    with st.expander(titulo, expanded=False):
-                        st.write(f"**Descripción de la avería por el operario:** {desc_averia}")
-                        st.write(f"**Actuación que se llevó a cabo:** {defin_text}")
-                        st.write(f"**Código tarea:** {cod_act if cod_act else '(no indicado)'}")
-
-    else:
-        # Todos los componentes tienen probabilidad <= 10% -> mostrar las 5 órdenes con mayor similaridad
-        st.write("Presentando las 5 órdenes históricas más similares al texto introducido para que elijas la más relevante.")
-
-        vecinos_sorted = vecinos.sort_values(by='similaridad', ascending=False).head(5)
-        opciones = []
-        mapping = {}
-        for idx, fila in vecinos_sorted.iterrows():
-            sim = fila.get('similaridad', 0.0)
-            desc = fila.get('descripcion_averia', '') if ('descripcion_averia' in fila.index and pd.notna(fila.get('descripcion_averia', ''))) else '(sin descripción de avería)'
-            label = f"Orden idx={idx} — Similaridad {sim:.3f}"
-            opciones.append(label)
-            # guardamos la fila completa para mostrar detalles al seleccionar
-            mapping[label] = fila.to_dict()
-
-        seleccion = st.selectbox("Órdenes más similares:", opciones, key='seleccion_vecino_por_sim')
-
-        if seleccion:
-            fila = mapping[seleccion]
-            desc_averia = fila.get('descripcion_averia', '(sin descripción de avería)')
-            cod_act = fila.get('clavero_actuacion', '')
-            similar = fila.get('similaridad', None)
-
-            if cod_act:
-                defin_text = buscar_definicion_por_codigo(cod_act)
-            else:
-                defin_text = 'No hay código de actuación en el registro.'
-
-            st.subheader(f"Detalles de la orden seleccionada (similaridad: {similar:.3f})")
-            st.write(f"**Descripción de la avería por el operario:** {desc_averia}")
-            st.write(f"**Actuación que se llevó a cabo:** {defin_text}")
-            st.write(f"**Código tarea:** {cod_act if cod_act else '(no indicado)'}")
-
-    st.divider()
+traza = iniciar_traza('averias_st', perfilar=perfil_activo())
+# La traza se cierra aunque la ejecución falle o Streamlit la detenga o la vuelva a lanzar; el panel
+# de depuración sólo se pinta si ha terminado con normalidad
+try:
+    with st.form("form_busqueda"):
+        consulta = st.text_area("Descripción de la avería (operario):", height=120)
+        top_k = 10
+        diversificar = st.checkbox("Diversificar resultados (evitar órdenes casi idénticas)", value=False)
+        lambda_mmr = st.slider("Relevancia frente a diversidad", 0.0, 1.0, 0.7, 0.05)
+        flotas_sel = sistemas_sel = None
+        if len(router.flotas()) > 1:
+            flotas_sel = st.multiselect("Flotas (vacío = todas)", router.flotas())
+        if len(router.sistemas()) > 1:
+            sistemas_sel = st.multiselect("Sistemas (vacío = todos)", router.sistemas())
+        fecha_min, fecha_max = router.extremos()
+        filtrar_fecha = st.checkbox("Buscar sólo en un periodo", value=False, disabled=fecha_min is None)
+        periodo = st.date_input(
+            "Periodo de las órdenes históricas",
+            value=(fecha_min.date(), fecha_max.date()) if fecha_min is not None else (),
+        )
+        submitted = st.form_submit_button("Buscar")
+
+    if submitted:
+        if not consulta or str(consulta).strip() == "":
+            st.warning("Por favor introduce una descripción de la avería.")
+        else:
+            with st.spinner("Buscando averías similares..."):
+                desde = hasta = None
+                if filtrar_fecha and len(periodo) == 2:
+                    desde, hasta = periodo[0], periodo[1] + timedelta(days=1)
+                vecinos, conteo = buscar_averias(consulta, top_k=top_k, diversidad=lambda_mmr if diversificar else None, desde=desde, hasta=hasta, flotas=flotas_sel, sistemas=sistemas_sel)
+                with medir('resultados.construir'):
+                    resultado = construir_resultado(consulta, vecinos, conteo, descripciones, buscar_definicion_por_codigo)
+
+            # El resultado agregado se guarda en la sesión; el panel sólo lee de él
+            st.session_state['resultado'] = resultado
+            st.session_state['top_k'] = top_k
+
+            st.success("Búsqueda realizada. Selecciona una opción en el desplegable para ver los registros históricos.")
+
+    # Renderizar la UI de resultados siempre que haya resultados guardados en session_state
+    resultado = st.session_state.get('resultado')
+    if resultado is not None and resultado.conteo:
+        panel_resultados(resultado)
+        panel_resumen(resultado)
+        st.divider()
+finally:
+    cerrar_traza(traza)
+render_panel_debug(traza)
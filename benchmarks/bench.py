@@ -0,0 +1,421 @@
+"""Benchmarks de los caminos calientes de la aplicación.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.bench                       # escalas 10x y 100x
+    python -m benchmarks.bench --escalas 10 100 1000 --casos busqueda
+    python -m benchmarks.bench --comparar benchmarks/resultados/<commit>.json --umbral 1.25
+
+Cada caso se ejecuta sobre datos sintéticos escalados (ver `datos_sinteticos.py`). Se guarda la
+mediana y el mínimo del tiempo de pared y el pico de memoria (tracemalloc) en un JSON en
+`benchmarks/resultados/`. Con `--comparar` se compara contra otro JSON y el proceso termina con
+código 1 si algún caso es más lento que el umbral indicado.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import datos_sinteticos
+
+DIR_RESULTADOS = os.path.join('benchmarks', 'resultados')
+
+CASOS = {}
+
+
+def caso(nombre, repeticiones=None):
+    """Registra una función de benchmark.
+
+    La función recibe el contexto de datos de la escala y devuelve una función sin argumentos
+    que ejecuta el camino caliente (la preparación queda fuera de la medida).
+    """
+    def decorador(fn):
+        CASOS[nombre] = (fn, repeticiones)
+        return fn
+    return decorador
+
+
+# --- DATOS ---
+
+class Contexto:
+    """Datos sintéticos de una escala, generados de forma perezosa y compartidos entre casos."""
+
+    def __init__(self, escala, semilla=0):
+        self.escala = escala
+        self.semilla = semilla
+        self._cache = {}
+
+    def _get(self, clave, construir):
+        if clave not in self._cache:
+            self._cache[clave] = construir()
+        return self._cache[clave]
+
+    @property
+    def ots(self):
+        return self._get('ots', lambda: datos_sinteticos.escalar_ots(
+            pd.read_csv('data/data_ots_completo.csv'), self.escala, self.semilla))
+
+    @property
+    def work_orders(self):
+        return self._get('work_orders', lambda: datos_sinteticos.escalar_ots(
+            pd.read_csv('data/work_orders_dict.csv'), self.escala, self.semilla))
+
+    @property
+    def jerarquia(self):
+        return self._get('jerarquia', lambda: datos_sinteticos.escalar_jerarquia(
+            pd.read_csv('data/jerarquia.csv'), self.escala))
+
+    @property
+    def diccionario(self):
+        return self._get('diccionario', lambda: datos_sinteticos.escalar_diccionario(
+            pd.read_csv('data/diccionario.csv'), self.escala))
+
+    @property
+    def embeddings(self):
+        def construir():
+            if os.path.exists('embeddings.npy'):
+                return datos_sinteticos.escalar_embeddings(np.load('embeddings.npy'), self.escala, semilla=self.semilla)
+            return datos_sinteticos.embeddings_aleatorios(len(self.ots), semilla=self.semilla)
+        return self._get('embeddings', construir)
+
+    def consultas(self, n=20):
+        """Vectores de consulta: embeddings existentes con algo de ruido (sin cargar el modelo)."""
+        rng = np.random.default_rng(self.semilla)
+        emb = self.embeddings
+        q = emb[rng.integers(0, emb.shape[0], size=n)] + rng.standard_normal((n, emb.shape[1]), dtype=np.float32) * 0.1
+        q /= np.linalg.norm(q, axis=1, keepdims=True)
+        return q
+
+
+# --- CASOS ---
+
+@caso('busqueda.topk')
+def _busqueda_topk(ctx):
+    from logica.busqueda import puntuar, seleccionar_vecinos
+    emb, consultas = ctx.embeddings, ctx.consultas()
+
+    def run():
+        for q in consultas:
+            scores = puntuar(q[None, :], emb)
+            seleccionar_vecinos(q, emb, scores, 10)
+    return run
+
+
+@caso('busqueda.mmr')
+def _busqueda_mmr(ctx):
+    from logica.busqueda import puntuar, seleccionar_vecinos
+    emb, consultas = ctx.embeddings, ctx.consultas()
+
+    def run():
+        for q in consultas:
+            scores = puntuar(q[None, :], emb)
+            seleccionar_vecinos(q, emb, scores, 10, diversidad=0.7)
+    return run
+
+
+@caso('busqueda.mmr_reordenado')
+def _busqueda_mmr_reordenado(ctx):
+    # Sólo el paso MMR, para acotar el coste extra frente a busqueda.topk
+    from logica.busqueda import puntuar, top_k_indices, mmr, MAX_CANDIDATOS
+    emb, consultas = ctx.embeddings, ctx.consultas()
+    pools = [top_k_indices(puntuar(q[None, :], emb), MAX_CANDIDATOS) for q in consultas]
+
+    def run():
+        for q, pool in zip(consultas, pools):
+            mmr(q, emb[pool], 10, lambda_=0.7)
+    return run
+
+
+def _router(ctx, n_sistemas=8):
+    from logica.shards import RouterShards
+    ots = datos_sinteticos.repartir_sistemas(ctx.ots, n_sistemas, ctx.semilla)
+    return RouterShards.desde_dataframe(ots, ctx.embeddings)
+
+
+@caso('shards.todos')
+def _shards_todos(ctx):
+    # Fan-out a todos los shards (4 flotas x 8 sistemas) y fusión de los top-k
+    router, consultas = _router(ctx), ctx.consultas()
+    return lambda: [router.buscar(q, 10) for q in consultas]
+
+
+@caso('shards.un_sistema')
+def _shards_un_sistema(ctx):
+    router, consultas = _router(ctx), ctx.consultas()
+    return lambda: [router.buscar(q, 10, sistemas=['FRE']) for q in consultas]
+
+
+@caso('shards.multicampo')
+def _shards_multicampo(ctx):
+    # Como shards.todos con embeddings de 3 campos apilados (frente a uno solo): mismo producto
+    # por shard con filas 3 veces más anchas
+    from logica.multicampo import apilar_consulta, codificar_campos
+    from logica.shards import RouterShards
+    ots = datos_sinteticos.repartir_sistemas(ctx.ots, 8, ctx.semilla)
+    apilados = codificar_campos(ots, lambda textos: datos_sinteticos.embeddings_aleatorios(len(textos), semilla=ctx.semilla))[0]
+    router = RouterShards.desde_dataframe(ots, apilados)
+    consultas = [apilar_consulta(q, apilados.shape[1]) for q in ctx.consultas()]
+    return lambda: [router.buscar(q, 10) for q in consultas]
+
+
+@caso('cache_busquedas.acierto')
+def _cache_busquedas_acierto(ctx):
+    # Búsquedas repetidas servidas desde la caché compartida (frente a shards.todos)
+    import tempfile
+    from logica.cache_busquedas import CacheBusquedas
+    router, consultas = _router(ctx), ctx.consultas()
+    cache = CacheBusquedas(os.path.join(tempfile.mkdtemp(prefix='cache_busquedas-'), 'cache.sqlite'))
+    claves = [cache.clave(f'consulta {i}', 'bench', top_k=10) for i in range(len(consultas))]
+    for clave, q in zip(claves, consultas):
+        cache.set(clave, 'bench', router.buscar(q, 10))
+    return lambda: [cache.get(clave) for clave in claves]
+
+
+def _modelo_con_datos(ctx):
+    import logica.modelo as modelo
+    modelo.usar_datos(ctx.work_orders)
+    return modelo
+
+
+@caso('modelo.get_models')
+def _modelo_get_models(ctx):
+    modelo = _modelo_con_datos(ctx)
+    return modelo.get_models
+
+
+@caso('modelo.give_claveros')
+def _modelo_give_claveros(ctx):
+    modelo = _modelo_con_datos(ctx)
+    return lambda: modelo.give_claveros('M1')
+
+
+@caso('modelo.give_work', repeticiones=1)
+def _modelo_give_work(ctx):
+    modelo = _modelo_con_datos(ctx)
+    clavero = ctx.work_orders['clavero'].value_counts().index[0]
+    return lambda: modelo.give_work(clavero, 'M1')
+
+
+@caso('modelo.give_work_pagina')
+def _modelo_give_work_pagina(ctx):
+    modelo = _modelo_con_datos(ctx)
+    clavero = ctx.work_orders['clavero'].value_counts().index[0]
+    return lambda: modelo.give_work_pagina(clavero, 'M1', offset=0, limit=50)
+
+
+@caso('fechas.rango')
+def _fechas_rango(ctx):
+    from logica.datos import fechas_ts
+    from logica.fechas import IndiceTemporal
+    indice = IndiceTemporal(fechas_ts(ctx.work_orders))
+    return lambda: [indice.rango(f'{anio}-01-01', f'{anio}-07-01') for anio in range(2016, 2026)]
+
+
+@caso('fechas.recientes')
+def _fechas_recientes(ctx):
+    modelo = _modelo_con_datos(ctx)
+    clavero = ctx.work_orders['clavero'].value_counts().index[0]
+    d = modelo.datos()
+    mascara = modelo._mascara_work(d, clavero, 'M1')
+    indice = d.indice
+    return lambda: indice.recientes(50, mascara)
+
+
+@caso('estadisticas.construir', repeticiones=1)
+def _estadisticas_construir(ctx):
+    from logica.estadisticas import CuboFallos
+    df = ctx.work_orders
+    return lambda: CuboFallos.desde_ots(df)
+
+
+@caso('estadisticas.consulta')
+def _estadisticas_consulta(ctx):
+    from logica.estadisticas import CuboFallos
+    cubo = CuboFallos.desde_ots(ctx.work_orders)
+    clavero = ctx.work_orders['clavero'].value_counts().index[0]
+
+    def run():
+        for _ in range(100):
+            cubo.conteo_claveros('M1')
+            cubo.mtbf_dias(clavero, modelo='M1')
+            cubo.total(clavero, modelo='M1')
+    return run
+
+
+@caso('jerarquia.filtrado')
+def _jerarquia_filtrado(ctx):
+    from logica.jerarquia import recorrer_jerarquia
+    df = ctx.jerarquia
+    return lambda: recorrer_jerarquia(df)
+
+
+@caso('jerarquia.construir')
+def _jerarquia_construir(ctx):
+    from logica.construccion_jerarquia import construir_jerarquia
+    df = ctx.diccionario
+    return lambda: construir_jerarquia(df)
+
+
+@caso('actuaciones.rankear')
+def _actuaciones_rankear(ctx):
+    # Actuaciones de un subsistema ordenadas para cada consulta (un producto por consulta)
+    from logica.indice_actuaciones import IndiceActuaciones
+    indice = IndiceActuaciones.construir(ctx.diccionario, lambda textos: datos_sinteticos.embeddings_aleatorios(len(textos)))
+    consultas = ctx.consultas()
+    return lambda: [(indice.rankear(q, 'FRE01', top=5), indice.rankear(q, top=5)) for q in consultas]
+
+
+@caso('diccionario.definiciones')
+def _diccionario_definiciones(ctx):
+    # Definición de los códigos de actuación de 1000 OTs
+    from logica.indice_actuaciones import definiciones_por_codigo
+    definiciones = definiciones_por_codigo(ctx.diccionario)
+    codigos = ctx.ots['clavero_actuacion'].dropna().head(1000).tolist()
+    return lambda: [definiciones.get(str(c).strip()) for c in codigos]
+
+
+def _lote_nuevo(df, n=100):
+    # Las últimas `n` filas hacen de OTs ingeridas sobre el resto
+    return df.iloc[:-n].copy(), df.iloc[-n:].copy()
+
+
+@caso('ingesta.aplicar_modelo')
+def _ingesta_aplicar_modelo(ctx):
+    # Un segmento de 100 OTs sobre el snapshot vigente (frente a reconstruirlo: modelo.construir)
+    from logica.modelo import DatosModelo
+    base, lote = _lote_nuevo(ctx.work_orders)
+    d = DatosModelo(base)
+    return lambda: d.agregar(lote)
+
+
+@caso('ingesta.aplicar_router')
+def _ingesta_aplicar_router(ctx):
+    from logica.shards import RouterShards
+    ots = datos_sinteticos.repartir_sistemas(ctx.ots, 8, ctx.semilla)
+    base, lote = _lote_nuevo(ots)
+    router = RouterShards.desde_dataframe(base, ctx.embeddings[:len(base)])
+    return lambda: router.agregar(lote, ctx.embeddings[len(base):])
+
+
+@caso('modelo.construir', repeticiones=1)
+def _modelo_construir(ctx):
+    from logica.modelo import DatosModelo
+    df = ctx.work_orders
+    return lambda: DatosModelo(df)
+
+
+@caso('limpieza.html', repeticiones=1)
+def _limpieza_html(ctx):
+    from logica.limpieza import limpiar_comentario
+    comentarios = ctx.work_orders['comentarios'].tolist()
+    return lambda: [limpiar_comentario(c) for c in comentarios]
+
+
+# --- MEDIDA ---
+
+def medir(run, repeticiones):
+    """Tiempos de `repeticiones` ejecuciones y pico de memoria de una ejecución adicional."""
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        run()
+        tiempos.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    run()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'tiempo_mediana_s': statistics.median(tiempos),
+        'tiempo_min_s': min(tiempos),
+        'repeticiones': repeticiones,
+        'pico_memoria_mb': pico / 2**20,
+    }
+
+
+def commit_actual():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def ejecutar(escalas, filtros=None, repeticiones=3, semilla=0):
+    resultados = {}
+    for escala in escalas:
+        ctx = Contexto(escala, semilla)
+        for nombre, (fn, reps) in CASOS.items():
+            if filtros and not any(nombre.startswith(f) for f in filtros):
+                continue
+            run = fn(ctx)
+            medida = medir(run, reps or repeticiones)
+            clave = f'{nombre}@{escala}x'
+            resultados[clave] = medida
+            print(f"{clave:<36} mediana {medida['tiempo_mediana_s'] * 1000:10.2f} ms   "
+                  f"pico {medida['pico_memoria_mb']:9.2f} MB", flush=True)
+    return resultados
+
+
+def comparar(resultados, referencia, umbral):
+    """Casos cuya mediana supera `umbral` veces la de la referencia."""
+    regresiones = []
+    for clave, medida in resultados.items():
+        ref = referencia.get('resultados', {}).get(clave)
+        if not ref or ref['tiempo_mediana_s'] <= 0:
+            continue
+        ratio = medida['tiempo_mediana_s'] / ref['tiempo_mediana_s']
+        if ratio > umbral:
+            regresiones.append((clave, ratio))
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escalas', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--casos', nargs='*', help='prefijos de los casos a ejecutar (p. ej. busqueda modelo)')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--salida', help='fichero JSON de resultados (por defecto benchmarks/resultados/<commit>.json)')
+    parser.add_argument('--comparar', help='JSON de referencia para detectar regresiones')
+    parser.add_argument('--umbral', type=float, default=1.25, help='ratio máximo tiempo/referencia permitido')
+    args = parser.parse_args(argv)
+
+    commit = commit_actual()
+    resultados = ejecutar(args.escalas, args.casos, args.repeticiones)
+
+    salida = args.salida or os.path.join(DIR_RESULTADOS, f'{commit}.json')
+    os.makedirs(os.path.dirname(salida) or '.', exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump({
+            'commit': commit,
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'resultados': resultados,
+        }, f, indent=2)
+    print(f'Resultados guardados en {salida}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            referencia = json.load(f)
+        regresiones = comparar(resultados, referencia, args.umbral)
+        for clave, ratio in regresiones:
+            print(f'REGRESIÓN {clave}: {ratio:.2f}x más lento que {referencia.get("commit")}')
+        if regresiones:
+            return 1
+        print(f'Sin regresiones respecto a {referencia.get("commit")} (umbral {args.umbral}x)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,555 @@
+"""Prueba de carga: operarios simultáneos contra la búsqueda de averías y el flujo por modelo.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.carga --operarios 1 4 16 --duracion 30
+    python -m benchmarks.carga --modo streamlit --app averias_st.py --operarios 1 4 8
+    python -m benchmarks.carga --modo streamlit --app main_view.py --url http://localhost:8501 --pid 4321
+
+Las acciones se sacan de una muestra de `data/data_ots_completo.csv`: la descripción de la OT (o
+la de la avería, como la escribiría otro operario) como consulta y el modelo y clavero de la
+misma OT para el flujo por modelo, así que los modelos y claveros frecuentes se piden más.
+
+Modo `funciones` (por defecto): cada operario es un hilo del mismo proceso, como las sesiones de
+un servidor de Streamlit, y repite la mezcla de `--mezcla`:
+
+- busqueda: codifica la consulta y busca en el router como `buscar_averias` de `averias_st.py`
+  (una parte de las búsquedas con MMR). Sin sentence_transformers (o con `--sin-modelo`) la
+  consulta es el embedding de la OT muestreada (`embeddings.npy`);
+- modelo: el flujo de `main_view.py`: get_models, give_claveros del modelo y la primera página de
+  give_work_pagina del clavero.
+
+Modo `streamlit`: cada operario abre una sesión por el websocket del servidor
+(`/_stcore/stream`, mensajes protobuf de Streamlit) y hace lo que haría el navegador. Con
+`averias_st.py` escribe la consulta y pulsa "Buscar" (la sesión se reutiliza entre búsquedas); con
+`main_view.py` abre la aplicación, entra en "Ver averías por modelo", elige modelo y clavero,
+pulsa "Continuar" y carga la tabla (una sesión nueva por flujo). Sin `--url` se arranca
+`streamlit run <app>` en un puerto libre; con `--url` se usa un servidor ya arrancado y `--pid`
+indica su proceso para medir la memoria.
+
+Cada nivel de `--operarios` dura `--duracion` segundos (o `--acciones` por operario) tras un
+calentamiento. Reporta el throughput, las latencias p50/p90/p99/máx por acción y por paso, los
+errores y la memoria del proceso que atiende (RSS y PSS): tras calentar, máxima y al final. Con
+`--pausa` cada operario espera un tiempo exponencial de esa media entre acciones (tiempo de
+lectura); sin pausa mide la capacidad máxima.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import datos_sinteticos
+from logica.datos import RUTA_EMBEDDINGS, RUTA_OTS, RUTA_WORK_ORDERS, leer_ots, modelo_de_equipo
+from logica.memoria_compartida import plano_ots, rss_proceso
+
+ACCIONES = ('busqueda', 'modelo')
+MEZCLA = 'busqueda=0.7,modelo=0.3'
+PERCENTILES = (50, 90, 99)
+# Parte de las búsquedas que piden diversificar resultados, y su lambda
+FRACCION_MMR = 0.2
+LAMBDA_MMR = 0.7
+FRACCION_AVERIA = 0.3
+TOP_K = 10
+FILAS_PAGINA = 50
+INTERVALO_MEMORIA = 0.2
+
+# Etiquetas de los widgets que usa el modo streamlit
+APP_ACCION = {'averias_st.py': 'busqueda', 'main_view.py': 'modelo'}
+ETIQUETA_CONSULTA = 'Descripción de la avería (operario):'
+ETIQUETA_BUSCAR = 'Buscar'
+ETIQUETA_VER_MODELOS = 'Ver averías por modelo'
+ETIQUETA_MODELO = 'Modelo principal'
+ETIQUETA_CLAVERO = 'Modelo secundario'
+ETIQUETA_CONTINUAR = '🛠️ Continuar'
+SIN_ELEGIR = 'Seleccione...'
+
+
+def muestra_consultas(path=RUTA_OTS, n=2000, semilla=0):
+    """DataFrame (fila, texto, modelo, clavero) con `n` OTs al azar del CSV."""
+    df = pd.read_csv(path)
+    rng = np.random.default_rng(semilla)
+    filas = np.sort(rng.choice(len(df), size=min(n, len(df)), replace=False))
+    muestra = df.iloc[filas]
+    texto = muestra['descripcion_ot'].fillna('').astype(str)
+    averia = muestra['descripcion_averia'].fillna('').astype(str)
+    usar_averia = (rng.random(len(muestra)) < FRACCION_AVERIA) & (averia.str.strip() != '').to_numpy()
+    return pd.DataFrame({
+        'fila': filas,
+        'texto': np.where(usar_averia, averia, texto),
+        'modelo': muestra['equipo'].map(modelo_de_equipo).to_numpy(),
+        'clavero': muestra['clavero'].astype(str).to_numpy(),
+    })
+
+
+def leer_mezcla(texto):
+    """'busqueda=0.7,modelo=0.3' -> (acciones, probabilidades)."""
+    pesos = {}
+    for parte in texto.split(','):
+        accion, _, peso = parte.partition('=')
+        if accion.strip() not in ACCIONES:
+            raise ValueError(f'acción desconocida en la mezcla: {accion!r} (válidas: {", ".join(ACCIONES)})')
+        pesos[accion.strip()] = float(peso or 1)
+    total = sum(pesos.values())
+    return list(pesos), np.array([p / total for p in pesos.values()])
+
+
+class Registro:
+    """Latencias por acción y errores, compartidos por todos los operarios."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tiempos = defaultdict(list)
+        self.errores = Counter()
+        self.ejemplos = {}
+
+    def anotar(self, accion, segundos):
+        with self._lock:
+            self.tiempos[accion].append(segundos)
+
+    def error(self, accion, exc):
+        with self._lock:
+            self.errores[accion] += 1
+            self.ejemplos.setdefault(accion, f'{type(exc).__name__}: {exc}')
+
+    def acciones(self):
+        # Las acciones completas (sin '.') cuentan para el throughput; los pasos sólo se detallan
+        return sum(len(t) for a, t in self.tiempos.items() if '.' not in a)
+
+
+class MonitorMemoria(threading.Thread):
+    """Muestrea la memoria de un proceso mientras dura el nivel y guarda el máximo."""
+
+    def __init__(self, pid='self', intervalo=INTERVALO_MEMORIA):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.intervalo = intervalo
+        self.maximo = {}
+        self._parar = threading.Event()
+
+    def medir(self):
+        medida = rss_proceso(self.pid)
+        for clave in ('rss', 'pss'):
+            self.maximo[clave] = max(self.maximo.get(clave, 0.0), medida.get(clave, 0.0))
+        return medida
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            self.medir()
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+        return self.medir()
+
+
+# --- Modo funciones ---
+
+class AccionesFunciones:
+    """Las acciones de los operarios sobre las funciones de búsqueda y de `logica.modelo`."""
+
+    def __init__(self, consultas, usar_modelo=True, escala=1):
+        from logica import modelo
+        from logica.multicampo import RUTA_EMBEDDINGS_CAMPOS, apilar_consulta, pesos_configurados
+        from logica.shards import RouterShards
+
+        self.modelo = modelo
+        self._apilar = lambda q: apilar_consulta(q, self.dimension, pesos_configurados())
+        self.encoder = None
+        if usar_modelo:
+            try:
+                from logica.ingesta import cargar_modelo, codificar
+                encoder = cargar_modelo()
+                self.encoder = lambda texto: codificar([texto], encoder)[0]
+            except ImportError:
+                print('sentence_transformers no está instalado: las consultas usan los embeddings de las OTs')
+        self.embeddings = np.load(RUTA_EMBEDDINGS, mmap_mode='r') if os.path.exists(RUTA_EMBEDDINGS) else None
+
+        if escala > 1:
+            # Datos sintéticos en memoria (`benchmarks.datos_sinteticos`) en lugar de los ficheros
+            df = datos_sinteticos.escalar_ots(pd.read_csv(RUTA_OTS), escala)
+            if self.embeddings is not None:
+                emb = datos_sinteticos.escalar_embeddings(np.asarray(self.embeddings), escala)
+            else:
+                emb = datos_sinteticos.embeddings_aleatorios(len(df))
+            self.router = RouterShards.desde_dataframe(df, emb)
+            modelo.usar_datos(datos_sinteticos.escalar_ots(leer_ots(RUTA_WORK_ORDERS), escala))
+        elif RouterShards.existe():
+            self.router = RouterShards.abrir()
+        else:
+            # Como `averias_st.py`: el almacén por campo si existe, en el plano compartido
+            ruta = RUTA_EMBEDDINGS_CAMPOS if os.path.exists(RUTA_EMBEDDINGS_CAMPOS) else RUTA_EMBEDDINGS
+            self.router = RouterShards.desde_plano(plano_ots(RUTA_OTS, ruta))
+        self.dimension = self.router.manifiesto['dimension']
+        self.consultas = consultas
+
+    def _vector(self, fila, rng):
+        if self.encoder is not None:
+            return self._apilar(self.encoder(fila.texto))
+        if self.embeddings is not None:
+            return self._apilar(np.asarray(self.embeddings[fila.fila % len(self.embeddings)]))
+        q = rng.standard_normal(self.dimension).astype(np.float32)
+        return q / np.linalg.norm(q)
+
+    def busqueda(self, fila, rng, registro):
+        t0 = time.perf_counter()
+        query_vec = self._vector(fila, rng)
+        t1 = time.perf_counter()
+        diversidad = LAMBDA_MMR if rng.random() < FRACCION_MMR else None
+        self.router.buscar(query_vec, TOP_K, diversidad=diversidad)
+        registro.anotar('busqueda.encode', t1 - t0)
+        registro.anotar('busqueda.shards', time.perf_counter() - t1)
+
+    def modelo_flujo(self, fila, rng, registro):
+        pasos = (
+            ('modelo.get_models', lambda: self.modelo.get_models()),
+            ('modelo.give_claveros', lambda: self.modelo.give_claveros(fila.modelo)),
+            ('modelo.give_work_pagina', lambda: self.modelo.give_work_pagina(fila.clavero, fila.modelo, 0, FILAS_PAGINA)),
+        )
+        for nombre, paso in pasos:
+            t0 = time.perf_counter()
+            paso()
+            registro.anotar(nombre, time.perf_counter() - t0)
+
+    def ejecutar(self, accion, fila, rng, registro):
+        if accion == 'busqueda':
+            self.busqueda(fila, rng, registro)
+        else:
+            self.modelo_flujo(fila, rng, registro)
+
+    def cerrar(self):
+        self.router.cerrar()
+
+
+def nivel_funciones(acciones, operarios, consultas, mezcla, duracion, por_operario, pausa, semilla):
+    registro = Registro()
+    nombres, probabilidades = mezcla
+    fin = time.perf_counter() + duracion
+
+    def operario(i):
+        rng = np.random.default_rng(semilla + i)
+        hechas = 0
+        while time.perf_counter() < fin and (por_operario is None or hechas < por_operario):
+            accion = nombres[rng.choice(len(nombres), p=probabilidades)]
+            fila = consultas.iloc[rng.integers(len(consultas))]
+            t0 = time.perf_counter()
+            try:
+                acciones.ejecutar(accion, fila, rng, registro)
+                registro.anotar(accion, time.perf_counter() - t0)
+            except Exception as exc:
+                registro.error(accion, exc)
+            hechas += 1
+            if pausa:
+                time.sleep(rng.exponential(pausa))
+
+    hilos = [threading.Thread(target=operario, args=(i,), name=f'operario-{i}') for i in range(operarios)]
+    t0 = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return registro, time.perf_counter() - t0
+
+
+# --- Modo streamlit ---
+
+class ErrorApp(RuntimeError):
+    """La ejecución del script terminó con una excepción o un error de compilación."""
+
+
+class SesionStreamlit:
+    """Una pestaña del navegador: una sesión del servidor por su websocket."""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/').replace('http', 'ws', 1) + '/_stcore/stream'
+        self.ws = None
+        self.widgets = {}
+        # Valores de los widgets que el navegador reenvía en cada ejecución (los botones no)
+        self.estados = {}
+
+    async def abrir(self):
+        from tornado.websocket import websocket_connect
+        self.ws = await websocket_connect(self.url, subprotocols=['streamlit'], max_message_size=2 ** 30)
+        await self.ejecutar()
+        return self
+
+    def opciones(self, etiqueta):
+        _, widget = self.widgets[etiqueta]
+        return list(widget.options)
+
+    async def ejecutar(self, valores=None, pulsar=None):
+        """Re-ejecuta el script con `valores` {etiqueta: texto} y el botón `pulsar`, hasta que termina."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        for etiqueta, valor in (valores or {}).items():
+            _, widget = self.widgets[etiqueta]
+            self.estados[widget.id] = WidgetState(id=widget.id, string_value=valor)
+        estados = list(self.estados.values())
+        if pulsar is not None:
+            estados.append(WidgetState(id=self.widgets[pulsar][1].id, trigger_value=True))
+        mensaje = BackMsg()
+        mensaje.rerun_script.widget_states.widgets.extend(estados)
+        await self.ws.write_message(mensaje.SerializeToString(), binary=True)
+
+        widgets = {}
+        while True:
+            datos = await self.ws.read_message()
+            if datos is None:
+                raise ConnectionError('el servidor cerró el websocket')
+            recibido = ForwardMsg()
+            recibido.ParseFromString(datos)
+            tipo = recibido.WhichOneof('type')
+            if tipo == 'delta' and recibido.delta.WhichOneof('type') == 'new_element':
+                elemento = recibido.delta.new_element
+                clase = elemento.WhichOneof('type')
+                if clase == 'exception':
+                    raise ErrorApp(f'{elemento.exception.type}: {elemento.exception.message}')
+                if clase in ('button', 'selectbox', 'text_area'):
+                    widget = getattr(elemento, clase)
+                    widgets[widget.label] = (clase, widget)
+            elif tipo == 'script_finished':
+                if recibido.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise ErrorApp('error de compilación del script')
+                # Un st.rerun() termina la ejecución y arranca otra: se espera a la siguiente
+                if recibido.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    break
+        self.widgets = widgets
+
+    def cerrar(self):
+        if self.ws is not None:
+            self.ws.close()
+
+
+def _elegir(opciones, preferida, rng):
+    """La opción que corresponde a `preferida` si está; si no, una al azar (sin el marcador)."""
+    validas = [o for o in opciones if o != SIN_ELEGIR]
+    for opcion in validas:
+        if preferida(opcion):
+            return opcion
+    return validas[rng.integers(len(validas))]
+
+
+class AccionesStreamlit:
+    """Las acciones de los operarios a través del websocket de un servidor de Streamlit."""
+
+    def __init__(self, url, app):
+        self.url = url
+        self.accion = APP_ACCION[os.path.basename(app)]
+        self.sesiones = {}
+
+    async def _paso(self, registro, nombre, corrutina):
+        t0 = time.perf_counter()
+        resultado = await corrutina
+        registro.anotar(nombre, time.perf_counter() - t0)
+        return resultado
+
+    async def busqueda(self, operario, fila, rng, registro):
+        sesion = self.sesiones.get(operario)
+        if sesion is None:
+            sesion = await self._paso(registro, 'busqueda.abrir', SesionStreamlit(self.url).abrir())
+            self.sesiones[operario] = sesion
+        await sesion.ejecutar({ETIQUETA_CONSULTA: fila.texto}, pulsar=ETIQUETA_BUSCAR)
+
+    async def modelo_flujo(self, operario, fila, rng, registro):
+        from vistas.modelo_form import normalize_primary_choice
+
+        sesion = await self._paso(registro, 'modelo.abrir', SesionStreamlit(self.url).abrir())
+        try:
+            await self._paso(registro, 'modelo.formulario', sesion.ejecutar(pulsar=ETIQUETA_VER_MODELOS))
+            modelo = _elegir(sesion.opciones(ETIQUETA_MODELO), lambda o: normalize_primary_choice(o) == fila.modelo, rng)
+            await self._paso(registro, 'modelo.claveros', sesion.ejecutar({ETIQUETA_MODELO: modelo}))
+            clavero = _elegir(sesion.opciones(ETIQUETA_CLAVERO), lambda o: o.startswith(f'{fila.clavero} ('), rng)
+            # Elegir el clavero re-ejecuta el script y habilita "Continuar"
+            await self._paso(registro, 'modelo.clavero', sesion.ejecutar({ETIQUETA_CLAVERO: clavero}))
+            await self._paso(registro, 'modelo.continuar', sesion.ejecutar(pulsar=ETIQUETA_CONTINUAR))
+            # "Continuar" cambia de página en la sesión; la tabla se pinta en la siguiente ejecución
+            await self._paso(registro, 'modelo.tabla', sesion.ejecutar())
+        finally:
+            sesion.cerrar()
+
+    async def ejecutar(self, operario, fila, rng, registro):
+        if self.accion == 'busqueda':
+            await self.busqueda(operario, fila, rng, registro)
+        else:
+            await self.modelo_flujo(operario, fila, rng, registro)
+
+    def cerrar(self):
+        for sesion in self.sesiones.values():
+            sesion.cerrar()
+        self.sesiones = {}
+
+
+async def _nivel_streamlit(acciones, operarios, consultas, duracion, por_operario, pausa, semilla):
+    registro = Registro()
+    fin = time.perf_counter() + duracion
+
+    async def operario(i):
+        rng = np.random.default_rng(semilla + i)
+        hechas = 0
+        while time.perf_counter() < fin and (por_operario is None or hechas < por_operario):
+            fila = consultas.iloc[rng.integers(len(consultas))]
+            t0 = time.perf_counter()
+            try:
+                await acciones.ejecutar(i, fila, rng, registro)
+                registro.anotar(acciones.accion, time.perf_counter() - t0)
+            except Exception as exc:
+                registro.error(acciones.accion, exc)
+                # La sesión puede haber quedado a medias: el siguiente intento abre otra
+                sesion = acciones.sesiones.pop(i, None)
+                if sesion is not None:
+                    sesion.cerrar()
+            hechas += 1
+            if pausa:
+                await asyncio.sleep(rng.exponential(pausa))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(operario(i) for i in range(operarios)))
+    acciones.cerrar()
+    return registro, time.perf_counter() - t0
+
+
+def nivel_streamlit(acciones, operarios, consultas, mezcla, duracion, por_operario, pausa, semilla):
+    return asyncio.run(_nivel_streamlit(acciones, operarios, consultas, duracion, por_operario, pausa, semilla))
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def arrancar_servidor(app, espera=120):
+    """Lanza `streamlit run app` en un puerto libre y espera a que responda; (proceso, url)."""
+    puerto = _puerto_libre()
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', app, '--server.headless', 'true', '--server.port', str(puerto),
+         '--browser.gatherUsageStats', 'false'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f'http://127.0.0.1:{puerto}'
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f'streamlit terminó al arrancar (código {proceso.returncode})')
+        try:
+            with urllib.request.urlopen(f'{url}/_stcore/health', timeout=1) as r:
+                if r.status == 200:
+                    return proceso, url
+        except OSError:
+            time.sleep(0.5)
+    proceso.terminate()
+    raise TimeoutError(f'streamlit no respondió en {espera} s')
+
+
+# --- Informe ---
+
+def _ms(tiempos, q):
+    return float(np.percentile(tiempos, q)) * 1000
+
+
+def informe(operarios, registro, segundos, memoria_base, memoria_max, memoria_final):
+    acciones = registro.acciones()
+    errores = sum(registro.errores.values())
+    print(f'\n{operarios} operarios: {acciones} acciones en {segundos:.1f} s -> {acciones / segundos:.1f} acciones/s, '
+          f'{errores} errores')
+    cabecera = ''.join(f'{f"p{q} ms":>10}' for q in PERCENTILES)
+    print(f'  {"acción":<26}{"n":>7}{cabecera}{"máx ms":>10}')
+    # Cada acción seguida de sus pasos, en el orden en que se hicieron
+    orden = [a for a in registro.tiempos if '.' not in a]
+    for accion in sorted(registro.tiempos, key=lambda a: (orden.index(a.split('.')[0]) if a.split('.')[0] in orden
+                                                           else len(orden), '.' in a)):
+        tiempos = registro.tiempos[accion]
+        nombre = accion if '.' not in accion else '  ' + accion.split('.', 1)[1]
+        columnas = ''.join(f'{_ms(tiempos, q):10.1f}' for q in PERCENTILES)
+        print(f'  {nombre:<26}{len(tiempos):>7}{columnas}{max(tiempos) * 1000:10.1f}')
+    for accion, ejemplo in registro.ejemplos.items():
+        print(f'  error en {accion} ({registro.errores[accion]}): {ejemplo}')
+    for clave in ('rss', 'pss'):
+        if clave in memoria_final:
+            print(f'  {clave.upper()} tras calentar {memoria_base.get(clave, 0):8.1f} MB   máx {memoria_max.get(clave, 0):8.1f} MB   '
+                  f'final {memoria_final[clave]:8.1f} MB ({memoria_final[clave] - memoria_base.get(clave, 0):+.1f} MB)')
+
+
+def resumen(filas):
+    print(f'\n{"operarios":>9}{"acciones/s":>12}{"p90 ms":>10}{"p99 ms":>10}{"errores":>9}{"RSS MB":>9}')
+    for operarios, registro, segundos, memoria in filas:
+        tiempos = [t for a, ts in registro.tiempos.items() if '.' not in a for t in ts]
+        p90, p99 = (_ms(tiempos, q) if tiempos else float('nan') for q in (90, 99))
+        print(f'{operarios:>9}{registro.acciones() / segundos:12.1f}{p90:10.1f}{p99:10.1f}'
+              f'{sum(registro.errores.values()):9}{memoria.get("rss", 0):9.1f}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modo', choices=('funciones', 'streamlit'), default='funciones')
+    parser.add_argument('--operarios', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--duracion', type=float, default=30.0, help='segundos por nivel de concurrencia')
+    parser.add_argument('--acciones', type=int, default=None, help='acciones por operario (límite además de la duración)')
+    parser.add_argument('--pausa', type=float, default=0.0, help='pausa media entre acciones de un operario (s)')
+    parser.add_argument('--mezcla', default=MEZCLA, help='modo funciones: pesos de las acciones')
+    parser.add_argument('--muestra', type=int, default=2000, help='OTs muestreadas como consultas')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--sin-modelo', action='store_true', help='modo funciones: no codificar las consultas')
+    parser.add_argument('--escala', type=int, default=1, help='modo funciones: replicar los datos (datos sintéticos)')
+    parser.add_argument('--app', default='averias_st.py', choices=sorted(APP_ACCION), help='modo streamlit')
+    parser.add_argument('--url', default=None, help='modo streamlit: servidor ya arrancado')
+    parser.add_argument('--pid', type=int, default=None, help='modo streamlit: proceso del servidor de --url')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists('/proc/self/status'):
+        print('Este benchmark necesita /proc (Linux) para medir la memoria.')
+        return 2
+
+    consultas = muestra_consultas(RUTA_OTS, args.muestra, args.semilla)
+    mezcla = leer_mezcla(args.mezcla)
+    servidor = None
+    if args.modo == 'funciones':
+        acciones = AccionesFunciones(consultas, usar_modelo=not args.sin_modelo, escala=args.escala)
+        nivel, pid = nivel_funciones, 'self'
+        print(f'router de {acciones.router.filas()} OTs (dimensión {acciones.dimension}), mezcla {args.mezcla}')
+    else:
+        if args.url is None:
+            servidor, url = arrancar_servidor(args.app)
+            pid = servidor.pid
+        else:
+            url, pid = args.url, args.pid
+        acciones = AccionesStreamlit(url, args.app)
+        nivel = nivel_streamlit
+        print(f'{args.app} en {url}: acción {acciones.accion}')
+
+    filas = []
+    try:
+        # Calentamiento: carga de modelo, datos y cachés antes de medir
+        nivel(acciones, 1, consultas, mezcla, float('inf'), len(mezcla[0]) * 2, 0.0, args.semilla + 10 ** 6)
+        for operarios in args.operarios:
+            monitor = MonitorMemoria(pid) if pid is not None else None
+            base = monitor.medir() if monitor else {}
+            if monitor:
+                monitor.start()
+            registro, segundos = nivel(acciones, operarios, consultas, mezcla, args.duracion, args.acciones,
+                                       args.pausa, args.semilla)
+            final = monitor.parar() if monitor else {}
+            informe(operarios, registro, segundos, base, monitor.maximo if monitor else {}, final)
+            filas.append((operarios, registro, segundos, final))
+    finally:
+        if args.modo == 'funciones':
+            acciones.cerrar()
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+    resumen(filas)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
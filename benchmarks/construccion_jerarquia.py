@@ -0,0 +1,119 @@
+"""Construcción de la jerarquía: versión fila a fila de `preprocess.ipynb` frente a la vectorizada.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.construccion_jerarquia --codigos 100000
+
+Replica `data/diccionario.csv` con prefijos de sistema sintéticos hasta tener `--codigos` claveros
+distintos y mide:
+
+- fila a fila: `nivel1_key`/`nivel2_key` con `apply`, dos auto-merges y las pasadas de máscaras
+  del notebook (copiado abajo tal cual, sólo sirve de referencia);
+- vectorizada: `logica.construccion_jerarquia.construir_jerarquia`, que además genera
+  `componente_total`;
+- incidencias: `logica.construccion_jerarquia.incidencias`.
+
+Comprueba también que ambas versiones producen la misma tabla.
+"""
+import argparse
+import math
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks import datos_sinteticos
+from logica.construccion_jerarquia import construir_jerarquia, incidencias
+
+COLUMNAS = ['clavero', 'componente', 'nivel', 'nivel1', 'componente_nivel1', 'nivel2', 'componente_nivel2']
+
+
+# --- Referencia: celdas del notebook antes de `logica.construccion_jerarquia` ---
+
+def nivel1_key(clave):
+    prefix = ''.join([c for c in clave if not c.isdigit()])
+    nums = ''.join([c for c in clave if c.isdigit()])
+    if len(nums) >= 2:
+        return prefix + nums[:2]
+    return None
+
+
+def nivel2_key(clave):
+    prefix = ''.join([c for c in clave if not c.isdigit()])
+    nums = ''.join([c for c in clave if c.isdigit()])
+    if len(nums) >= 4:
+        return prefix + nums[:4]
+    return None
+
+
+def construir_fila_a_fila(dic):
+    dic = dic.copy()
+    dic['Clavero'] = dic['Clavero'].astype(str).str.strip()
+    dic['codigo_numerico'] = dic['Clavero'].str.replace(r'^[A-Z]+', '', regex=True)
+    dic['nivel'] = dic['codigo_numerico'].str.len() // 2
+    dic['nivel1'] = dic['Clavero'].apply(nivel1_key)
+    dic['nivel2'] = dic['Clavero'].apply(nivel2_key)
+    dic = dic.drop_duplicates(subset='Clavero').reset_index(drop=True)
+    dic = dic.merge(dic[['Clavero', 'Descripción componente']], how='left',
+                    left_on='nivel1', right_on='Clavero', suffixes=('', '_nivel1'))
+    dic = dic.merge(dic[['Clavero', 'Descripción componente']], how='left',
+                    left_on='nivel2', right_on='Clavero', suffixes=('', '_nivel2'))
+    dic = dic.drop(columns=['Clavero_nivel1', 'Clavero_nivel2'])
+    dic = dic.rename(columns={
+        'Descripción componente_nivel1': 'componente_nivel1',
+        'Descripción componente_nivel2': 'componente_nivel2',
+        'Clavero': 'clavero',
+        'Descripción componente': 'componente'
+    })
+    mask_fre01 = dic['nivel'].isin([2, 3]) & (dic['nivel1'] == 'FRE01')
+    dic.loc[mask_fre01, 'componente_nivel1'] = 'Paneles'
+    dic.loc[dic['nivel'] == 1, ['nivel1', 'nivel2', 'componente_nivel1', 'componente_nivel2']] = None
+    dic.loc[dic['nivel'] == 2, ['nivel2', 'componente_nivel2']] = None
+    mask_nivel1_faltante = dic['nivel'].isin([2, 3]) & dic['componente_nivel1'].isna()
+    dic.loc[mask_nivel1_faltante, 'nivel1'] = None
+    dic.loc[mask_nivel1_faltante, 'componente_nivel1'] = 'Otros'
+    mask_nivel2_faltante = (dic['nivel'] == 3) & dic['componente_nivel2'].isna()
+    dic.loc[mask_nivel2_faltante, 'nivel2'] = None
+    dic.loc[mask_nivel2_faltante, 'componente_nivel2'] = 'Otros'
+    return dic[COLUMNAS].copy().reset_index(drop=True)
+
+
+# --- Medida ---
+
+def _tiempos(fn, repeticiones):
+    tiempos, resultado = [], None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = fn()
+        tiempos.append(time.perf_counter() - t0)
+    return statistics.median(tiempos), resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--codigos', type=int, default=100_000, help='claveros distintos del diccionario sintético')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    base = pd.read_csv('data/diccionario.csv')
+    factor = math.ceil(args.codigos / base['Clavero'].nunique())
+    dic = datos_sinteticos.escalar_diccionario(base, factor)
+    print(f"{len(dic)} filas, {dic['Clavero'].nunique()} claveros, {factor} sistemas")
+
+    t_fila, referencia = _tiempos(lambda: construir_fila_a_fila(dic), args.repeticiones)
+    t_vector, jerarquia = _tiempos(lambda: construir_jerarquia(dic), args.repeticiones)
+    t_incidencias, problemas = _tiempos(lambda: incidencias(dic), args.repeticiones)
+
+    print(f'fila a fila     {t_fila * 1000:10.1f} ms')
+    print(f'vectorizada     {t_vector * 1000:10.1f} ms   ({t_fila / t_vector:.1f}x, incluye componente_total)')
+    print(f'incidencias     {t_incidencias * 1000:10.1f} ms   ({len(problemas)} encontradas)')
+
+    nueva = jerarquia[COLUMNAS].astype(object)
+    iguales = referencia.astype(object).where(referencia.notna(), '').equals(nueva.where(nueva.notna(), ''))
+    print('misma tabla que la versión fila a fila' if iguales else 'DIFERENCIAS con la versión fila a fila')
+    return 0 if iguales else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""Generadores de datos sintéticos para los benchmarks.
+
+Escalan los CSV reales (`data_ots_completo.csv`, `work_orders_dict.csv`, `jerarquia.csv`,
+`diccionario.csv`) y `embeddings.npy` replicando sus filas `factor` veces con variaciones (código
+de OT, número de unidad, fecha, prefijo de sistema) para que las distribuciones se parezcan a las reales.
+"""
+import string
+
+import numpy as np
+import pandas as pd
+
+FORMATO_FECHA = "%m/%d/%Y %H:%M"
+
+
+def escalar_ots(df, factor, semilla=0):
+    """Replica órdenes de trabajo `factor` veces.
+
+    Cada copia recibe códigos de OT nuevos, otro número de unidad en `equipo` (manteniendo el
+    sufijo de modelo) y una fecha desplazada hasta tres años. La copia 0 es el original.
+    """
+    factor = int(factor)
+    if factor <= 1:
+        return df.copy()
+    rng = np.random.default_rng(semilla)
+    n = len(df)
+    filas = np.tile(np.arange(n), factor)
+    copia = np.repeat(np.arange(factor), n)
+
+    out = df.iloc[filas].reset_index(drop=True)
+
+    if 'codigo_ot' in out.columns:
+        base = int(df['codigo_ot'].max()) + 1
+        out['codigo_ot'] = df['codigo_ot'].to_numpy()[filas] + copia.astype(np.int64) * base
+
+    if 'equipo' in out.columns:
+        partes = df['equipo'].astype(str).str.extract(r'^(.*_)(\d+)(.*)$')
+        coincide = partes[1].notna().to_numpy()[filas]
+        numero = pd.to_numeric(partes[1], errors='coerce').fillna(0).astype(np.int64).to_numpy()[filas]
+        nuevo = (pd.Series(partes[0].to_numpy()[filas]).astype(str)
+                 + pd.Series(numero + copia * 1000).astype(str)
+                 + pd.Series(partes[2].to_numpy()[filas]).astype(str))
+        out['equipo'] = np.where(coincide & (copia > 0), nuevo.to_numpy(), out['equipo'].to_numpy())
+
+    if 'fecha_creacion' in out.columns:
+        fechas = pd.to_datetime(df['fecha_creacion'], format=FORMATO_FECHA, errors='coerce').to_numpy()[filas]
+        desplazamiento = np.where(copia > 0, rng.integers(0, 3 * 365, size=len(out)), 0)
+        fechas = pd.Series(fechas + desplazamiento.astype('timedelta64[D]'))
+        out['fecha_creacion'] = fechas.dt.strftime(FORMATO_FECHA)
+
+    return out
+
+
+def _prefijo(i):
+    """Prefijo alfabético de tres letras para el sistema sintético i (XAA, XAB, ...)."""
+    letras = string.ascii_uppercase
+    return 'X' + letras[(i // 26) % 26] + letras[i % 26]
+
+
+def escalar_jerarquia(df, factor):
+    """Replica la jerarquía con prefijos de sistema sintéticos (XAA, XAB, ...).
+
+    Los nombres de componente de nivel 1 y 2 se etiquetan con el prefijo para que las opciones
+    de los desplegables crezcan con el factor.
+    """
+    factor = int(factor)
+    if factor <= 1:
+        return df.copy()
+    copias = [df]
+    for i in range(1, factor):
+        prefijo = _prefijo(i - 1)
+        c = df.copy()
+        for col in ('clavero', 'nivel1', 'nivel2'):
+            if col in c.columns:
+                c[col] = c[col].str.replace(r'^[A-Z]+', prefijo, regex=True)
+        for col in ('componente_nivel1', 'componente_nivel2'):
+            if col in c.columns:
+                c[col] = c[col].where(c[col].isna(), c[col] + f' [{prefijo}]')
+        nivel_bajo = c['nivel'] <= 2
+        c.loc[nivel_bajo, 'componente'] = c.loc[nivel_bajo, 'componente'] + f' [{prefijo}]'
+        copias.append(c)
+    return pd.concat(copias, ignore_index=True)
+
+
+def escalar_diccionario(df, factor):
+    """Replica el diccionario de claves con prefijos de sistema sintéticos (XAA, XAB, ...)."""
+    factor = int(factor)
+    if factor <= 1:
+        return df.copy()
+    copias = [df]
+    for i in range(1, factor):
+        c = df.copy()
+        for col in ('Clavero', 'Código tarea std'):
+            if col in c.columns:
+                c[col] = c[col].astype(str).str.replace(r'^[A-Z]+', _prefijo(i - 1), regex=True)
+        copias.append(c)
+    return pd.concat(copias, ignore_index=True)
+
+
+def escalar_embeddings(embeddings, factor, ruido=0.05, semilla=0):
+    """Replica los embeddings con ruido gaussiano y los vuelve a normalizar (float32)."""
+    factor = int(factor)
+    if factor <= 1:
+        return np.asarray(embeddings, dtype=np.float32)
+    rng = np.random.default_rng(semilla)
+    out = np.tile(np.asarray(embeddings, dtype=np.float32), (factor, 1))
+    n = embeddings.shape[0]
+    out[n:] += rng.standard_normal((out.shape[0] - n, out.shape[1]), dtype=np.float32) * ruido
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    return out
+
+
+def embeddings_aleatorios(n, dim=384, semilla=0):
+    """Embeddings normalizados aleatorios, para cuando no hay `embeddings.npy` disponible."""
+    rng = np.random.default_rng(semilla)
+    out = rng.standard_normal((n, dim), dtype=np.float32)
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    return out
+
+
+def repartir_sistemas(df, n_sistemas, semilla=0):
+    """Asigna a cada orden uno de `n_sistemas` prefijos de clavero (el real y XAA, XAB, ...).
+
+    Sirve para simular varios sistemas (y por tanto varios shards por flota) con los datos de
+    frenos, que sólo tienen el prefijo FRE.
+    """
+    if n_sistemas <= 1:
+        return df.copy()
+    rng = np.random.default_rng(semilla)
+    sistema = rng.integers(0, n_sistemas, size=len(df))
+    out = df.copy()
+    for i in range(1, n_sistemas):
+        filas = sistema == i
+        out.loc[filas, 'clavero'] = out.loc[filas, 'clavero'].str.replace(r'^[A-Z]+', _prefijo(i - 1), regex=True)
+    return out
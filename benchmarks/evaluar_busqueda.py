@@ -0,0 +1,204 @@
+"""Evaluación offline de la calidad de la búsqueda frente a su latencia.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.evaluar_busqueda                          # leave-one-out, rejilla por defecto
+    python -m benchmarks.evaluar_busqueda --particion temporal --corte 0.8
+    python -m benchmarks.evaluar_busqueda --top-k 5 10 20 --umbrales 0.1 0.2 \\
+        --diversidad none 0.7 --cuantizacion float32 float16 int8 --procesos 4
+
+Usa el `clavero` de las OTs de `data_ots_completo.csv` como verdad. Las consultas son los
+embeddings ya calculados de las propias OTs (`embeddings.npy`), así que no hace falta el modelo:
+
+- leave-one-out: cada OT es una consulta contra todas las demás;
+- temporal: las OTs posteriores al cuantil `--corte` de fecha_creacion son consultas contra las
+  anteriores (lo que verá la aplicación con averías nuevas).
+
+Para cada configuración (top_k, umbral de probabilidad, diversidad MMR, cuantización de los
+embeddings) reporta:
+
+- acc@1 / acc@3: el clavero real es el más votado / está entre los 3 más votados por los vecinos;
+- propuesta: el clavero real está entre los componentes que la aplicación propone (los que
+  superan el umbral) y cuántos propone de media; si no propone ninguno cuenta como fallo;
+- recall: fracción de los top_k vecinos exactos (float32, sin MMR) que devuelve la configuración;
+- latencia por consulta (p50 y p95) de la búsqueda.
+
+Las configuraciones y bloques de consultas se reparten entre procesos.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench import DIR_RESULTADOS, commit_actual
+from logica.busqueda import seleccionar_vecinos, top_k_indices
+from logica.datos import fechas_ts, leer_ots
+from logica.fechas import FECHA_NULA
+
+CUANTIZACIONES = ('float32', 'float16', 'int8')
+BLOQUE = 256
+
+# Estado de cada proceso (se carga una vez en `_iniciar`)
+_datos = {}
+
+
+def cuantizar(embeddings, modo):
+    """(matriz, escala) con los embeddings en el tipo indicado; puntuación = matriz @ q * escala."""
+    if modo == 'float32':
+        return np.asarray(embeddings, dtype=np.float32), 1.0
+    if modo == 'float16':
+        return np.asarray(embeddings, dtype=np.float16), 1.0
+    if modo == 'int8':
+        # Embeddings normalizados: todas las componentes están en [-1, 1]
+        escala = float(np.abs(embeddings).max()) / 127.0
+        return np.round(embeddings / escala).astype(np.int8), escala
+    raise ValueError(f'cuantización desconocida: {modo}')
+
+
+def _iniciar(path_csv, path_embeddings):
+    df = leer_ots(path_csv)
+    embeddings = np.load(path_embeddings).astype(np.float32)
+    _datos.update(
+        claveros=df['clavero'].fillna('').astype(str).to_numpy(),
+        ts=fechas_ts(df),
+        embeddings=embeddings,
+        cuantizados={},
+    )
+
+
+def consultas_y_candidatos(ts, particion, corte):
+    """(consultas, máscara de candidatos o None) para la partición pedida."""
+    n = len(ts)
+    if particion == 'loo':
+        return np.arange(n), None
+    validas = ts != FECHA_NULA
+    limite = np.quantile(ts[validas], corte)
+    return np.flatnonzero(validas & (ts > limite)), validas & (ts <= limite)
+
+
+def _evaluar_bloque(tarea):
+    """Métricas por consulta de un bloque de consultas con una configuración de búsqueda."""
+    top_k, diversidad, cuantizacion, umbrales, consultas, particion, corte = tarea
+    emb, claveros = _datos['embeddings'], _datos['claveros']
+    if cuantizacion not in _datos['cuantizados']:
+        _datos['cuantizados'][cuantizacion] = cuantizar(emb, cuantizacion)
+    matriz, escala = _datos['cuantizados'][cuantizacion]
+    _, candidatos = consultas_y_candidatos(_datos['ts'], particion, corte)
+
+    filas = []
+    for i in consultas:
+        q = emb[i]
+        mascara = np.ones(len(emb), dtype=bool) if candidatos is None else candidatos.copy()
+        mascara[i] = False
+
+        t0 = time.perf_counter()
+        if cuantizacion == 'int8':
+            scores = (matriz @ np.round(q / escala).astype(np.int8).astype(np.int32)).astype(np.float32) * escala * escala
+        else:
+            scores = (matriz @ q.astype(matriz.dtype)).astype(np.float32) * escala
+        vecinos = seleccionar_vecinos(q, emb, scores, top_k, diversidad=diversidad, mascara=mascara)
+        latencia = time.perf_counter() - t0
+
+        exactos = top_k_indices(np.where(mascara, emb @ q, -np.inf), top_k)
+        verdad = claveros[i]
+        conteo = Counter(claveros[vecinos])
+        votados = [c for c, _ in conteo.most_common()]
+        total = sum(conteo.values())
+        fila = {
+            'acc1': bool(votados[:1] == [verdad]),
+            'acc3': verdad in votados[:3],
+            'recall': len(set(vecinos.tolist()) & set(exactos.tolist())) / max(len(exactos), 1),
+            'latencia': latencia,
+        }
+        for umbral in umbrales:
+            propuestos = [c for c, n in conteo.items() if total and n / total > umbral]
+            fila[f'propuesta@{umbral}'] = verdad in propuestos
+            fila[f'n_propuestos@{umbral}'] = len(propuestos)
+        filas.append(fila)
+    return (top_k, diversidad, cuantizacion), filas
+
+
+def evaluar(path_csv, path_embeddings, rejilla, umbrales, particion='loo', corte=0.8, procesos=None, max_consultas=None, semilla=0):
+    """Evalúa cada configuración de `rejilla` [(top_k, diversidad, cuantizacion)]; devuelve una lista de dicts."""
+    _iniciar(path_csv, path_embeddings)
+    consultas, _ = consultas_y_candidatos(_datos['ts'], particion, corte)
+    if max_consultas and len(consultas) > max_consultas:
+        consultas = np.sort(np.random.default_rng(semilla).choice(consultas, max_consultas, replace=False))
+    bloques = [consultas[i:i + BLOQUE] for i in range(0, len(consultas), BLOQUE)]
+    tareas = [(k, d, c, umbrales, b, particion, corte) for (k, d, c) in rejilla for b in bloques]
+
+    por_config = {}
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar, initargs=(path_csv, path_embeddings)) as pool:
+        for config, filas in pool.map(_evaluar_bloque, tareas):
+            por_config.setdefault(config, []).extend(filas)
+
+    resultados = []
+    for (top_k, diversidad, cuantizacion), filas in por_config.items():
+        df = pd.DataFrame(filas)
+        latencias = df['latencia'].to_numpy() * 1000
+        for umbral in umbrales:
+            resultados.append({
+                'top_k': top_k,
+                'umbral': umbral,
+                'diversidad': diversidad,
+                'cuantizacion': cuantizacion,
+                'consultas': len(df),
+                'acc1': df['acc1'].mean(),
+                'acc3': df['acc3'].mean(),
+                'propuesta': df[f'propuesta@{umbral}'].mean(),
+                'n_propuestos': df[f'n_propuestos@{umbral}'].mean(),
+                'recall': df['recall'].mean(),
+                'latencia_p50_ms': float(np.percentile(latencias, 50)),
+                'latencia_p95_ms': float(np.percentile(latencias, 95)),
+            })
+    return resultados
+
+
+def _diversidad(valor):
+    return None if valor.lower() in ('none', 'no', '-') else float(valor)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--csv', default='data/data_ots_completo.csv')
+    parser.add_argument('--embeddings', default='embeddings.npy')
+    parser.add_argument('--particion', choices=('loo', 'temporal'), default='loo')
+    parser.add_argument('--corte', type=float, default=0.8, help='cuantil de fecha para la partición temporal')
+    parser.add_argument('--top-k', type=int, nargs='+', default=[5, 10, 20])
+    parser.add_argument('--umbrales', type=float, nargs='+', default=[0.1, 0.2, 0.3])
+    parser.add_argument('--diversidad', type=_diversidad, nargs='+', default=[None, 0.7])
+    parser.add_argument('--cuantizacion', nargs='+', choices=CUANTIZACIONES, default=list(CUANTIZACIONES))
+    parser.add_argument('--max-consultas', type=int, help='evaluar sólo una muestra de consultas')
+    parser.add_argument('--procesos', type=int, default=os.cpu_count())
+    parser.add_argument('--salida', help='JSON de resultados (por defecto benchmarks/resultados/evaluacion-<commit>.json)')
+    args = parser.parse_args(argv)
+
+    rejilla = list(itertools.product(args.top_k, args.diversidad, args.cuantizacion))
+    t0 = time.perf_counter()
+    resultados = evaluar(args.csv, args.embeddings, rejilla, args.umbrales, args.particion, args.corte,
+                         args.procesos, args.max_consultas)
+    duracion = time.perf_counter() - t0
+
+    tabla = pd.DataFrame(resultados).sort_values(['top_k', 'diversidad', 'cuantizacion', 'umbral'], na_position='first')
+    with pd.option_context('display.width', 200, 'display.max_rows', None, 'display.float_format', '{:.3f}'.format):
+        print(tabla.to_string(index=False))
+    print(f'{len(rejilla)} configuraciones, partición {args.particion}, {duracion:.1f} s')
+
+    commit = commit_actual()
+    salida = args.salida or os.path.join(DIR_RESULTADOS, f'evaluacion-{commit}.json')
+    os.makedirs(os.path.dirname(salida) or '.', exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump({'commit': commit, 'particion': args.particion, 'corte': args.corte, 'resultados': resultados}, f, indent=2)
+    print(f'Resultados guardados en {salida}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Latencia de las re-ejecuciones del panel de resultados de `averias_st.py`.
+
+Uso (desde la raíz del repositorio, con el modelo de embeddings disponible):
+
+    python -m benchmarks.latencia_rerun --cambios 20
+
+Lanza la aplicación con `streamlit.testing.v1.AppTest`, hace una búsqueda y cambia la selección
+del desplegable de resultados `--cambios` veces. Reporta:
+
+- rerun completo: lo que cuesta cada cambio si se re-ejecuta todo el script (AppTest siempre
+  re-ejecuta el script completo, igual que la aplicación sin fragments);
+- fragment: el tiempo de la etapa `resultados.detalle`, que es lo único que se re-ejecuta en el
+  servidor real cuando el panel de detalle es un `st.fragment`.
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from logica import instrumentacion
+
+CONSULTA = 'fuga de aire en el cilindro de freno'
+ETAPA_FRAGMENT = 'resultados.detalle'
+
+
+def _etapa(nombre):
+    for linea in instrumentacion.exportar_prometheus().splitlines():
+        if linea.startswith('averias_etapa_segundos_total{') and f'etapa="{nombre}"' in linea:
+            return float(linea.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cambios', type=int, default=20)
+    parser.add_argument('--consulta', default=CONSULTA)
+    args = parser.parse_args(argv)
+
+    at = AppTest.from_file('averias_st.py', default_timeout=300).run()
+    at.text_area[0].input(args.consulta)
+    at.button[0].click().run()
+    if at.exception or not at.selectbox:
+        print('La búsqueda no devolvió resultados seleccionables')
+        return 1
+
+    selector = at.selectbox[0]
+    opciones = selector.options
+    instrumentacion.reiniciar()
+    tiempos = []
+    for i in range(args.cambios):
+        at.selectbox[0].select(opciones[(i + 1) % len(opciones)])
+        t0 = time.perf_counter()
+        at.run()
+        tiempos.append(time.perf_counter() - t0)
+    fragment = _etapa(ETAPA_FRAGMENT) / args.cambios
+
+    print(f'{len(opciones)} opciones en "{selector.label}", {args.cambios} cambios de selección')
+    print(f'rerun completo   mediana {statistics.median(tiempos) * 1000:8.2f} ms   p95 '
+          f'{sorted(tiempos)[int(0.95 * (len(tiempos) - 1))] * 1000:8.2f} ms')
+    if fragment:
+        print(f'fragment         media   {fragment * 1000:8.2f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""Memoria de las tablas de OTs: DataFrame de objetos frente a `TablaCompacta`.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.memoria_tablas --escalas 1 10 100
+
+Para cada CSV y escala compara:
+
+- pandas: el DataFrame tal como lo devuelve `read_csv` (columnas object de str de Python),
+  medido con `memory_usage(deep=True)`;
+- pandas category: las mismas columnas con dtype 'category';
+- compacta: `logica.datos.compactar_ots` (claves como códigos int32, texto libre deduplicado en
+  un buffer UTF-8 con offsets).
+"""
+import argparse
+import sys
+
+import pandas as pd
+
+from benchmarks import datos_sinteticos
+from logica.datos import compactar_ots
+
+CSVS = ('data/data_ots_completo.csv', 'data/work_orders_dict.csv')
+MB = 2 ** 20
+
+
+def medir_csv(path, escala):
+    df = datos_sinteticos.escalar_ots(pd.read_csv(path), escala)
+    objetos = df.memory_usage(deep=True).sum()
+    categorias = df.astype({c: 'category' for c in df.columns if df[c].dtype == object}).memory_usage(deep=True).sum()
+    tabla = compactar_ots(df)
+    # Sin las columnas derivadas (fecha_ts, modelo) para comparar los mismos datos
+    compacta = tabla.nbytes() - tabla.columna('fecha_ts').nbytes - tabla.columna('modelo').nbytes()
+    return len(df), objetos, categorias, compacta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escalas', type=int, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args(argv)
+
+    print(f"{'tabla':<28} {'escala':>6} {'filas':>9} {'pandas':>10} {'category':>10} {'compacta':>10} {'ahorro':>7}")
+    for path in CSVS:
+        for escala in args.escalas:
+            filas, objetos, categorias, compacta = medir_csv(path, escala)
+            print(f"{path.split('/')[-1]:<28} {escala:>5}x {filas:>9} {objetos / MB:>8.1f}MB {categorias / MB:>8.1f}MB "
+                  f"{compacta / MB:>8.1f}MB {objetos / compacta:>6.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
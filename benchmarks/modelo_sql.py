@@ -0,0 +1,99 @@
+"""Consultas de `logica.modelo`: tabla en memoria frente al almacén SQLite.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.modelo_sql --filas 1000000
+
+Escala `work_orders_dict.csv` hasta `--filas` filas, construye el snapshot en memoria
+(`DatosModelo`) y la base SQLite (`logica.almacen_sql`, en un directorio temporal) y mide con cada
+backend las formas de consulta de las vistas:
+
+- get_models y give_claveros (formulario de modelo);
+- contar_work y la primera página de give_work_pagina, con y sin periodo (tabla de averías);
+- una página con offset (ordena todas las coincidencias) y give_work completo.
+
+Reporta también el tiempo de construcción, el tamaño de la base y si ambos backends devuelven
+lo mismo.
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks import datos_sinteticos
+from logica import almacen_sql, modelo
+
+
+def _tiempo(fn, repeticiones):
+    tiempos, resultado = [], None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = fn()
+        tiempos.append(time.perf_counter() - t0)
+    return statistics.median(tiempos), resultado
+
+
+def consultas(df):
+    """(nombre, función del backend) de cada forma de consulta, con el clavero y modelo más frecuentes."""
+    clavero = df['clavero'].value_counts().index[0]
+    model = 'M1'
+    return [
+        ('get_models', lambda: sorted(modelo.get_models())),
+        ('give_claveros', lambda: modelo.give_claveros(model)),
+        ('contar_work', lambda: modelo.contar_work(clavero, model)),
+        ('pagina 1', lambda: modelo.give_work_pagina(clavero, model, 0, 50)),
+        ('pagina 1 periodo', lambda: modelo.give_work_pagina(clavero, model, 0, 50, desde='2020-01-01', hasta='2023-01-01')),
+        ('pagina offset', lambda: modelo.give_work_pagina(clavero, model, 500, 50, descendente=False)),
+        ('give_work', lambda: modelo.give_work(clavero, model)),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=1_000_000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    base = pd.read_csv(modelo.RUTA_WORK_ORDERS)
+    df = datos_sinteticos.escalar_ots(base, math.ceil(args.filas / len(base))).iloc[:args.filas]
+    print(f'{len(df)} filas')
+
+    t0 = time.perf_counter()
+    modelo.usar_datos(df)
+    t_memoria = time.perf_counter() - t0
+
+    directorio = tempfile.mkdtemp(prefix='modelo_sql-')
+    ruta = os.path.join(directorio, 'work_orders.sqlite')
+    t0 = time.perf_counter()
+    almacen_sql.construir_bd(df, ruta)
+    t_sql = time.perf_counter() - t0
+    modelo._snapshots_sql.publicar(almacen_sql.AlmacenSQL(ruta))
+    print(f'construcción     memoria {t_memoria:8.2f} s   sqlite {t_sql:8.2f} s   ({os.path.getsize(ruta) / 2 ** 20:.0f} MB)')
+
+    resultados, iguales = {}, True
+    for backend in ('memoria', almacen_sql.BACKEND_SQLITE):
+        os.environ[almacen_sql.ENV_BACKEND] = backend
+        for nombre, fn in consultas(df):
+            resultados[(backend, nombre)] = _tiempo(fn, args.repeticiones)
+    for nombre, _ in consultas(df):
+        t_mem, r_mem = resultados[('memoria', nombre)]
+        t_sql, r_sql = resultados[(almacen_sql.BACKEND_SQLITE, nombre)]
+        igual = r_mem == r_sql
+        iguales &= igual
+        print(f'{nombre:17s}memoria {t_mem * 1000:8.2f} ms   sqlite {t_sql * 1000:8.2f} ms   '
+              f'({t_mem / t_sql:5.1f}x){"" if igual else "   DIFERENTE"}')
+
+    for fichero in os.listdir(directorio):
+        os.remove(os.path.join(directorio, fichero))
+    os.rmdir(directorio)
+    print('mismos resultados con ambos backends' if iguales else 'DIFERENCIAS entre backends')
+    return 0 if iguales else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
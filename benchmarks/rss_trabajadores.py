@@ -0,0 +1,108 @@
+"""Memoria por proceso trabajador: copia privada de los datos frente al plano compartido.
+
+Uso (desde la raíz del repositorio, Linux):
+
+    python -m benchmarks.rss_trabajadores --trabajadores 4 --escala 10
+
+Genera un CSV y unos embeddings sintéticos a la escala indicada y arranca N procesos (como N
+procesos de Streamlit detrás de un balanceador) en dos modos:
+
+- privado: cada proceso lee el CSV y `np.load` de los embeddings (lo que hacía `st.cache_data`);
+- compartido: el primero publica el plano (`logica.memoria_compartida`) y todos lo abren con mmap.
+
+Cada trabajador hace unas búsquedas para tocar todos los embeddings y reporta su memoria de
+/proc: RSS, RssAnon (privada) y PSS (las páginas compartidas se reparten entre los procesos que
+las usan). La suma de PSS es la memoria real que ocupan los N procesos. Se reporta la diferencia
+respecto a la memoria del proceso antes de cargar los datos.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import datos_sinteticos
+
+MODOS = ('privado', 'compartido')
+
+
+def _trabajador(modo, path_csv, path_emb, dir_plano, barrera, cola):
+    from logica.memoria_compartida import plano_ots, rss_proceso
+    from logica.datos import leer_ots
+    from logica.shards import RouterShards
+
+    base = rss_proceso()
+    if modo == 'privado':
+        router = RouterShards.desde_dataframe(leer_ots(path_csv), np.load(path_emb))
+    else:
+        router = RouterShards.desde_plano(plano_ots(path_csv, path_emb, dir_plano))
+
+    rng = np.random.default_rng(os.getpid())
+    dim = router.manifiesto['dimension']
+    for _ in range(5):
+        q = rng.standard_normal(dim).astype(np.float32)
+        router.buscar(q / np.linalg.norm(q), 10)
+
+    # Medir con todos los procesos vivos, para que PSS reparta las páginas compartidas
+    barrera.wait()
+    medida = rss_proceso()
+    cola.put({k: medida.get(k, 0.0) - base.get(k, 0.0) for k in ('rss', 'anon', 'pss')})
+    barrera.wait()
+    router.cerrar()
+
+
+def medir_modo(modo, trabajadores, path_csv, path_emb, dir_plano):
+    ctx = mp.get_context('spawn')
+    barrera = ctx.Barrier(trabajadores)
+    cola = ctx.Queue()
+    if modo == 'compartido':
+        # Publicar antes de arrancar los trabajadores: todos se adjuntan al mismo plano
+        from logica.memoria_compartida import plano_ots
+        plano_ots(path_csv, path_emb, dir_plano)
+    procesos = [ctx.Process(target=_trabajador, args=(modo, path_csv, path_emb, dir_plano, barrera, cola))
+                for _ in range(trabajadores)]
+    for p in procesos:
+        p.start()
+    medidas = [cola.get() for _ in procesos]
+    for p in procesos:
+        p.join()
+    return medidas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trabajadores', type=int, default=4)
+    parser.add_argument('--escala', type=int, default=10)
+    parser.add_argument('--modos', nargs='*', default=list(MODOS), choices=MODOS)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists('/proc/self/status'):
+        print('Este benchmark necesita /proc (Linux).')
+        return 2
+
+    with tempfile.TemporaryDirectory(prefix='rss_trabajadores-') as tmp:
+        df = datos_sinteticos.escalar_ots(pd.read_csv('data/data_ots_completo.csv'), args.escala)
+        if os.path.exists('embeddings.npy'):
+            emb = datos_sinteticos.escalar_embeddings(np.load('embeddings.npy'), args.escala)
+        else:
+            emb = datos_sinteticos.embeddings_aleatorios(len(df))
+        path_csv, path_emb = os.path.join(tmp, 'ots.csv'), os.path.join(tmp, 'embeddings.npy')
+        df.to_csv(path_csv, index=False)
+        np.save(path_emb, emb)
+        print(f'{len(df)} filas, embeddings {emb.nbytes / 2**20:.1f} MB, {args.trabajadores} trabajadores')
+
+        for modo in args.modos:
+            medidas = medir_modo(modo, args.trabajadores, path_csv, path_emb, os.path.join(tmp, 'plano'))
+            rss = [m['rss'] for m in medidas]
+            anon = [m['anon'] for m in medidas]
+            pss = [m['pss'] for m in medidas]
+            print(f'{modo:<11} RSS/trabajador {np.mean(rss):8.1f} MB   privada/trabajador {np.mean(anon):8.1f} MB   '
+                  f'PSS total {sum(pss):8.1f} MB')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Servidor falso compatible con la API de Ollama, para desarrollo y pruebas sin el modelo.
+
+    python -m herramientas.ollama_falso --puerto 11434 --retardo 0.02
+
+Responde a `POST /api/generate` con una respuesta determinista (derivada del prompt) en trozos
+NDJSON, como el servidor real con `"stream": true`, y a `GET /api/tags`. Cuenta las peticiones
+recibidas para poder comprobar cachés y coalescencia.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def respuesta_para(prompt):
+    """Texto determinista para un prompt (el mismo prompt produce siempre la misma respuesta)."""
+    huella = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8]
+    return f"Respuesta simulada {huella}: revisar el componente más frecuente y aplicar la actuación indicada."
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, como el servidor real
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, codigo, cuerpo):
+        datos = json.dumps(cuerpo).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self._json(200, {'models': [{'name': self.server.modelo}]})
+        else:
+            self._json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/api/generate':
+            self._json(404, {'error': 'not found'})
+            return
+        longitud = int(self.headers.get('Content-Length', 0))
+        peticion = json.loads(self.rfile.read(longitud) or b'{}')
+        with self.server.lock:
+            self.server.peticiones += 1
+        if self.server.retardo_inicial:
+            time.sleep(self.server.retardo_inicial)
+
+        palabras = respuesta_para(peticion.get('prompt', '')).split(' ')
+        if not peticion.get('stream', True):
+            self._json(200, {'model': peticion.get('model'), 'response': ' '.join(palabras), 'done': True})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for i, palabra in enumerate(palabras):
+                self._trozo({'model': peticion.get('model'), 'response': palabra if i == 0 else ' ' + palabra, 'done': False})
+                if self.server.retardo:
+                    time.sleep(self.server.retardo)
+            self._trozo({'model': peticion.get('model'), 'response': '', 'done': True})
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente abandonó la respuesta (plazo vencido o cancelación)
+            self.close_connection = True
+
+    def _trozo(self, cuerpo):
+        datos = json.dumps(cuerpo).encode('utf-8') + b'\n'
+        self.wfile.write(f'{len(datos):X}\r\n'.encode('ascii') + datos + b'\r\n')
+        self.wfile.flush()
+
+
+class ServidorOllamaFalso(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, direccion=('127.0.0.1', 0), retardo=0.0, retardo_inicial=0.0, modelo='phi3:mini'):
+        super().__init__(direccion, _Manejador)
+        self.retardo = retardo
+        self.retardo_inicial = retardo_inicial
+        self.modelo = modelo
+        self.peticiones = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, puerto = self.server_address[:2]
+        return f'http://{host}:{puerto}'
+
+
+def arrancar(puerto=0, retardo=0.0, retardo_inicial=0.0):
+    """Arranca el servidor en un hilo y lo devuelve (`servidor.url`, `servidor.shutdown()`)."""
+    servidor = ServidorOllamaFalso(('127.0.0.1', puerto), retardo=retardo, retardo_inicial=retardo_inicial)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--puerto', type=int, default=11434)
+    parser.add_argument('--retardo', type=float, default=0.02, help='segundos entre tokens')
+    parser.add_argument('--retardo-inicial', type=float, default=0.0, help='segundos antes del primer token')
+    args = parser.parse_args()
+    servidor = ServidorOllamaFalso(('127.0.0.1', args.puerto), retardo=args.retardo, retardo_inicial=args.retardo_inicial)
+    print(f'Servidor Ollama falso escuchando en {servidor.url}')
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,13 +1,9 @@
 import pandas as pd
-from bs4 import BeautifulSoup
+
+from logica.limpieza import limpiar_comentario
 
 data = pd.read_csv('data/work_orders_dict.csv')
 
-for i, row in data.iterrows():
-    if row.comentarios and isinstance(row.comentarios, str) and row.comentarios.strip() != '""':
-        clean_comment = BeautifulSoup(row.comentarios, "html.parser").get_text()
-    else:
-        clean_comment = "SIN COMENTARIOS"
-    data.at[i, 'comentarios'] = clean_comment
+data['comentarios'] = data['comentarios'].map(limpiar_comentario)
 
-data.to_csv('data/work_orders_dict_limpio_sin_html.csv', index=False)
\ No newline at end of file
+data.to_csv('data/work_orders_dict_limpio_sin_html.csv', index=False)
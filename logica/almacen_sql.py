@@ -0,0 +1,277 @@
+"""Almacén SQLite opcional para las consultas de `logica.modelo`.
+
+Con AVERIAS_BACKEND=sqlite las OTs de `work_orders_dict.csv` se cargan una vez en una base SQLite
+(`data/work_orders.sqlite`) y `get_models`, `give_claveros`, `give_work`, `contar_work` y
+`give_work_pagina` se resuelven con índices en lugar de recorrer la tabla en memoria:
+
+- (clavero, modelo, fecha_ts): filtro y orden por fecha de la tabla de averías; rowid es la
+  fila del CSV, así que a igual fecha el orden es el mismo que el de `IndiceTemporal`;
+- (modelo, clavero): modelos distintos;
+- fecha_ts: extremos del selector de periodo.
+
+El conteo de averías por (modelo, clavero) de `give_claveros` está materializado en la tabla
+`conteos`, que se actualiza al insertar.
+
+Los comentarios se guardan ya limpios (columna `comentarios_limpios`), así que no se pasa el
+HTML por BeautifulSoup en cada consulta. Las fechas no válidas se guardan como FECHA_NULA.
+
+La base guarda la huella del CSV del que se construyó: si el CSV cambia se reconstruye en un
+fichero temporal que sustituye al anterior (un candado evita que varios procesos la construyan a
+la vez). Las OTs ingeridas (`logica.ingesta`) se insertan en una transacción que lee y avanza la
+posición del registro guardada en la propia base, así que da igual qué proceso las aplique.
+
+Cada hilo de cada proceso reutiliza su conexión (Streamlit atiende las sesiones en hilos).
+
+Para construirla sin arrancar la aplicación:
+
+    python -m logica.almacen_sql [data/work_orders_dict.csv] [data/work_orders.sqlite]
+"""
+import fcntl
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from logica.datos import RUTA_WORK_ORDERS, derivar_columnas, leer_ots
+from logica.fechas import FECHA_NULA, a_timestamp
+from logica.limpieza import limpiar_comentario
+from logica.memoria_compartida import huella
+
+ENV_BACKEND = 'AVERIAS_BACKEND'
+BACKEND_SQLITE = 'sqlite'
+RUTA_BD = os.path.join('data', 'work_orders.sqlite')
+LOTE_INSERCION = 50_000
+# Páginas de la base mapeadas en memoria por conexión (lecturas sin copiar al caché de SQLite)
+MMAP_BYTES = 256 * 2 ** 20
+
+ESQUEMA = """
+CREATE TABLE ots (
+    fila INTEGER PRIMARY KEY,
+    clavero TEXT,
+    modelo TEXT,
+    fecha_ts INTEGER NOT NULL,
+    fecha_creacion TEXT,
+    descripcion_ot TEXT,
+    descripcion_averia TEXT,
+    descripcion_reparacion TEXT,
+    comentarios_limpios TEXT
+);
+CREATE TABLE conteos (modelo TEXT, clavero TEXT, n INTEGER, PRIMARY KEY (modelo, clavero)) WITHOUT ROWID;
+CREATE TABLE meta (clave TEXT PRIMARY KEY, valor TEXT);
+"""
+INDICES = """
+CREATE INDEX ots_clavero_modelo_fecha ON ots (clavero, modelo, fecha_ts);
+CREATE INDEX ots_modelo_clavero ON ots (modelo, clavero);
+CREATE INDEX ots_fecha ON ots (fecha_ts);
+"""
+COLUMNAS = ['fila', 'clavero', 'modelo', 'fecha_ts', 'fecha_creacion', 'descripcion_ot',
+            'descripcion_averia', 'descripcion_reparacion', 'comentarios_limpios']
+COLUMNAS_WORK = 'fecha_creacion, descripcion_ot, descripcion_averia, descripcion_reparacion, comentarios_limpios'
+
+
+def backend_sql():
+    return os.environ.get(ENV_BACKEND, '').lower() == BACKEND_SQLITE
+
+
+def _texto(serie):
+    return serie.astype(object).where(serie.notna(), None)
+
+
+def filas_sql(df):
+    """Tuplas (en el orden de COLUMNAS) de un DataFrame de OTs; el índice de `df` es la fila."""
+    df = derivar_columnas(df)
+    comentarios = df['comentarios'] if 'comentarios' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    # Un mismo comentario sólo se limpia una vez
+    unicos = pd.unique(comentarios.astype(object))
+    limpios = comentarios.astype(object).map(dict(zip(unicos, map(limpiar_comentario, unicos))))
+    columnas = [
+        df.index.to_numpy(dtype=np.int64).tolist(),
+        _texto(df['clavero']).tolist(),
+        _texto(df['modelo']).tolist(),
+        df['fecha_ts'].to_numpy(dtype=np.int64).tolist(),
+    ] + [_texto(df[c]).tolist() for c in ('fecha_creacion', 'descripcion_ot', 'descripcion_averia', 'descripcion_reparacion')]
+    columnas.append(limpios.tolist())
+    return list(zip(*columnas))
+
+
+def _insertar(con, df):
+    filas = filas_sql(df)
+    marcas = ', '.join('?' * len(COLUMNAS))
+    for ini in range(0, len(filas), LOTE_INSERCION):
+        con.executemany(f'INSERT INTO ots VALUES ({marcas})', filas[ini:ini + LOTE_INSERCION])
+    conteo = pd.DataFrame({'modelo': [f[2] for f in filas], 'clavero': [f[1] for f in filas]}).value_counts()
+    con.executemany(
+        'INSERT INTO conteos VALUES (?, ?, ?) ON CONFLICT (modelo, clavero) DO UPDATE SET n = n + excluded.n',
+        [(m, c, int(n)) for (m, c), n in conteo.items()])
+
+
+def _meta(con, clave, defecto=None):
+    fila = con.execute('SELECT valor FROM meta WHERE clave = ?', (clave,)).fetchone()
+    return defecto if fila is None else json.loads(fila[0])
+
+
+def _guardar_meta(con, **valores):
+    con.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', [(k, json.dumps(v)) for k, v in valores.items()])
+
+
+def construir_bd(df, ruta=RUTA_BD, origen=None):
+    """Crea la base con las OTs de `df` (en un temporal que sustituye a `ruta`)."""
+    tmp = f'{ruta}.{os.getpid()}.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    con = sqlite3.connect(tmp)
+    try:
+        con.executescript('PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;' + ESQUEMA)
+        _insertar(con, df)
+        # Los índices se crean después de cargar: es más rápido que mantenerlos fila a fila
+        con.executescript(INDICES)
+        _guardar_meta(con, origen=origen, filas_base=len(df), registro=None)
+        con.commit()
+        con.execute('PRAGMA journal_mode = WAL')
+        con.execute('ANALYZE')
+    finally:
+        con.close()
+    os.replace(tmp, ruta)
+
+
+def huella_origen(ruta_csv):
+    return huella(ruta_csv) if os.path.exists(ruta_csv) else None
+
+
+def abrir_o_construir(ruta_csv=RUTA_WORK_ORDERS, ruta=RUTA_BD):
+    """`AlmacenSQL` de `ruta`, (re)construyéndola si no existe o es de otra versión del CSV."""
+    with open(ruta + '.lock', 'w') as candado:
+        fcntl.flock(candado, fcntl.LOCK_EX)
+        origen = huella_origen(ruta_csv)
+        if _origen_bd(ruta) != origen:
+            construir_bd(leer_ots(ruta_csv), ruta, origen)
+    return AlmacenSQL(ruta)
+
+
+def _origen_bd(ruta):
+    if not os.path.exists(ruta):
+        return None
+    con = sqlite3.connect(ruta)
+    try:
+        return _meta(con, 'origen')
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        con.close()
+
+
+def aplicar_registro(almacen, registro):
+    """Inserta los segmentos de `registro` (un `RegistroIngesta`) que le faltan a la base.
+
+    Devuelve un almacén nuevo sobre la misma base, o None si el registro se compactó y hay que
+    reconstruirla.
+    """
+    con = sqlite3.connect(almacen.ruta, timeout=30, isolation_level=None)
+    try:
+        # BEGIN IMMEDIATE: un único proceso lee la posición e inserta a la vez
+        con.execute('BEGIN IMMEDIATE')
+        posicion = _meta(con, 'registro')
+        pendientes = registro.pendientes(tuple(posicion) if posicion else None, 'work_orders', _meta(con, 'filas_base'))
+        if pendientes is None:
+            con.execute('ROLLBACK')
+            return None
+        df, _, posicion = pendientes
+        if len(df):
+            _insertar(con, df)
+        _guardar_meta(con, registro=list(posicion))
+        con.execute('COMMIT')
+    except BaseException:
+        if con.in_transaction:
+            con.execute('ROLLBACK')
+        raise
+    finally:
+        con.close()
+    return AlmacenSQL(almacen.ruta)
+
+
+class AlmacenSQL:
+    """Consultas de `logica.modelo` sobre la base SQLite, con una conexión por hilo."""
+
+    def __init__(self, ruta=RUTA_BD):
+        self.ruta = ruta
+        self._local = threading.local()
+
+    def conexion(self):
+        con = getattr(self._local, 'conexion', None)
+        # Tras un fork la conexión del padre no se puede usar
+        if con is None or self._local.pid != os.getpid():
+            con = sqlite3.connect(self.ruta, timeout=30)
+            con.execute('PRAGMA query_only = ON')
+            con.execute(f'PRAGMA mmap_size = {MMAP_BYTES}')
+            self._local.conexion, self._local.pid = con, os.getpid()
+        return con
+
+    def _consulta(self, sql, parametros=()):
+        return self.conexion().execute(sql, parametros).fetchall()
+
+    def __len__(self):
+        return self._consulta('SELECT COUNT(*) FROM ots')[0][0]
+
+    def modelos(self):
+        return [m for (m,) in self._consulta('SELECT DISTINCT modelo FROM ots WHERE modelo IS NOT NULL')]
+
+    def conteo_claveros(self, modelo):
+        """{clavero: averías} de un modelo (como `CuboFallos.conteo_claveros`)."""
+        return dict(self._consulta('SELECT clavero, n FROM conteos WHERE modelo = ?', (modelo,)))
+
+    def extremos(self):
+        """(fecha mínima, fecha máxima) como pd.Timestamp, como `IndiceTemporal.extremos`."""
+        fmin, fmax = self._consulta('SELECT MIN(fecha_ts), MAX(fecha_ts) FROM ots WHERE fecha_ts > ?', (FECHA_NULA,))[0]
+        if fmin is None:
+            return None, None
+        return pd.Timestamp(fmin), pd.Timestamp(fmax)
+
+    @staticmethod
+    def _filtro(clavero, modelo, desde=None, hasta=None):
+        sql, parametros = 'clavero = ? AND modelo = ?', [clavero, modelo]
+        if desde is not None or hasta is not None:
+            # Con un periodo, las OTs sin fecha quedan fuera (como en `IndiceTemporal.rango`)
+            sql += ' AND fecha_ts > ?'
+            parametros.append(FECHA_NULA)
+        if desde is not None:
+            sql += ' AND fecha_ts >= ?'
+            parametros.append(a_timestamp(desde))
+        if hasta is not None:
+            sql += ' AND fecha_ts < ?'
+            parametros.append(a_timestamp(hasta))
+        return sql, parametros
+
+    def contar_work(self, clavero, modelo, desde=None, hasta=None):
+        filtro, parametros = self._filtro(clavero, modelo, desde, hasta)
+        return self._consulta(f'SELECT COUNT(*) FROM ots WHERE {filtro}', parametros)[0][0]
+
+    def work(self, clavero, modelo, desde=None, hasta=None):
+        """Filas de `give_work` en el orden del CSV."""
+        filtro, parametros = self._filtro(clavero, modelo, desde, hasta)
+        return [list(f) for f in self._consulta(f'SELECT {COLUMNAS_WORK} FROM ots WHERE {filtro} ORDER BY fila', parametros)]
+
+    def work_pagina(self, clavero, modelo, offset=0, limit=50, descendente=True, desde=None, hasta=None):
+        """Una página de filas ordenadas por fecha_ts (y por fila a igual fecha)."""
+        filtro, parametros = self._filtro(clavero, modelo, desde, hasta)
+        sentido = 'DESC' if descendente else 'ASC'
+        filas = self._consulta(
+            f'SELECT {COLUMNAS_WORK} FROM ots WHERE {filtro} ORDER BY fecha_ts {sentido}, fila {sentido} LIMIT ? OFFSET ?',
+            parametros + [int(limit), int(offset)])
+        return [list(f) for f in filas]
+
+
+def main(argv=None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    ruta_csv = args[0] if args else RUTA_WORK_ORDERS
+    ruta = args[1] if len(args) > 1 else RUTA_BD
+    almacen = abrir_o_construir(ruta_csv, ruta)
+    print(f'{len(almacen)} filas en {ruta} ({os.path.getsize(ruta) / 2 ** 20:.1f} MB)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
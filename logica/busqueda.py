@@ -0,0 +1,88 @@
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+# Tamaño del conjunto de candidatos sobre el que se re-ordena con MMR.
+# Se acota para que el coste extra (una matriz candidatos x candidatos) no crezca con el dataset.
+FACTOR_CANDIDATOS = 4
+MAX_CANDIDATOS = 64
+
+
+def puntuar(query_vec, embeddings):
+    """Similitud coseno de la consulta (matriz 1 x d) con cada fila de `embeddings`."""
+    return cosine_similarity(query_vec, embeddings)[0]
+
+
+def puntuar_normalizados(query_vec, embeddings):
+    """Como `puntuar` cuando las filas de `embeddings` ya tienen norma 1: un único producto.
+
+    No copia `embeddings` (cosine_similarity los normaliza en una copia), así que sirve sobre
+    arrays mapeados en memoria sin generar memoria privada por consulta.
+    """
+    q = np.asarray(query_vec, dtype=embeddings.dtype).ravel()
+    return embeddings @ (q / np.linalg.norm(q))
+
+
+def normalizados(embeddings, tolerancia=1e-3):
+    """True si todas las filas de `embeddings` tienen norma 1 (salvo `tolerancia`)."""
+    if embeddings.shape[0] == 0:
+        return True
+    normas = np.einsum('ij,ij->i', embeddings, embeddings)
+    return bool(np.all(np.abs(normas - 1.0) <= tolerancia))
+
+
+def top_k_indices(scores, k):
+    """Índices de las k puntuaciones más altas, ordenados de mayor a menor."""
+    k = min(int(k), scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    parte = np.argpartition(-scores, k - 1)[:k]
+    return parte[np.argsort(-scores[parte], kind="stable")]
+
+
+def mmr(query_vec, candidatos, k, lambda_=0.7):
+    """Re-ordena candidatos por máxima relevancia marginal (MMR).
+
+    `candidatos` es la matriz (n, d) de embeddings normalizados de los candidatos.
+    `lambda_` = 1 equivale a ordenar sólo por similaridad; valores menores penalizan
+    los candidatos parecidos a los ya elegidos. Devuelve posiciones dentro de `candidatos`.
+    """
+    n = candidatos.shape[0]
+    k = min(int(k), n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    q = np.asarray(query_vec, dtype=candidatos.dtype).ravel()
+    relevancia = candidatos @ q
+    sim_candidatos = candidatos @ candidatos.T
+
+    seleccionados = np.empty(k, dtype=np.intp)
+    max_sim = np.zeros(n, dtype=relevancia.dtype)
+    disponible = np.ones(n, dtype=bool)
+    for paso in range(k):
+        puntuacion = lambda_ * relevancia - (1.0 - lambda_) * max_sim
+        puntuacion[~disponible] = -np.inf
+        elegido = int(np.argmax(puntuacion))
+        seleccionados[paso] = elegido
+        disponible[elegido] = False
+        np.maximum(max_sim, sim_candidatos[elegido], out=max_sim)
+    return seleccionados
+
+
+def seleccionar_vecinos(query_vec, embeddings, scores, top_k, diversidad=None, mascara=None):
+    """Índices de los vecinos a mostrar.
+
+    Sin `diversidad` devuelve el top-k por similaridad. Con `diversidad` (el lambda de MMR)
+    toma un conjunto acotado de candidatos y los re-ordena con `mmr`. `mascara` (booleana por
+    fila, p. ej. un rango de fechas) limita los candidatos; puede devolver menos de top_k.
+    """
+    if mascara is not None:
+        scores = np.where(mascara, scores, -np.inf)
+        top_k = min(top_k, int(mascara.sum()))
+    if diversidad is None:
+        return top_k_indices(scores, top_k)
+    n_candidatos = min(max(top_k * FACTOR_CANDIDATOS, top_k), MAX_CANDIDATOS)
+    pool = top_k_indices(scores, max(n_candidatos, top_k))
+    if mascara is not None:
+        pool = pool[np.isfinite(scores[pool])]
+    orden = mmr(query_vec, embeddings[pool], top_k, lambda_=diversidad)
+    return pool[orden]
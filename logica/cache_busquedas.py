@@ -0,0 +1,225 @@
+"""Caché de resultados de búsqueda compartida entre sesiones y procesos.
+
+Muchos operarios de la misma línea describen la misma avería en pocas horas. `st.cache_data` sólo
+sirve dentro de un proceso; esta caché guarda los vecinos de cada búsqueda en una base SQLite
+(`data/cache_busquedas.sqlite`, modo WAL: varios lectores y un escritor a la vez) que comparten
+todos los procesos de Streamlit de la máquina.
+
+La clave es un hash de:
+
+- la consulta normalizada (Unicode NFC, sin espacios repetidos ni en los extremos; no se pasa a
+  minúsculas porque el modelo distingue mayúsculas);
+- la versión del índice (`RouterShards.version`: cambia con un plano o shards nuevos y con cada
+  segmento ingerido);
+- los parámetros de la búsqueda (top_k, diversidad, periodo, flotas y sistemas).
+
+La primera vez que un proceso usa una versión nueva del índice (`usar_version`) se borran las
+entradas de las demás versiones. El tamaño total está acotado a `max_bytes`: al guardar se
+eliminan las entradas usadas hace más tiempo (LRU). Un error de la caché (base bloqueada, corrupta...) nunca hace fallar la búsqueda:
+se cuenta en `cache_busquedas.errores` y se busca sin caché.
+
+Leer no bloquea: la hora de uso de una entrada sólo se actualiza si tiene más de
+`REFRESCO_USADO_S` segundos, y esas actualizaciones se acumulan en memoria y se escriben juntas al
+guardar o, sin esperar al bloqueo de escritura, en una lectura posterior. Una entrada que no se
+puede deserializar (p. ej. escrita con otra versión de pandas) se borra.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from logica.instrumentacion import contar
+
+RUTA_CACHE = os.path.join('data', 'cache_busquedas.sqlite')
+MAX_BYTES = 64 * 2 ** 20
+# Segundos de espera si otro proceso está escribiendo
+ESPERA_S = 2.0
+# Antigüedad mínima de la hora de uso para volver a escribirla (el LRU no necesita más precisión)
+REFRESCO_USADO_S = 60.0
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS busquedas (
+    clave TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    valor BLOB NOT NULL,
+    bytes INTEGER NOT NULL,
+    usado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS busquedas_usado ON busquedas (usado);
+CREATE INDEX IF NOT EXISTS busquedas_version ON busquedas (version);
+"""
+
+log = logging.getLogger(__name__)
+
+
+def normalizar_consulta(consulta):
+    return ' '.join(unicodedata.normalize('NFC', str(consulta)).split())
+
+
+def _parametro(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return sorted(str(v) for v in valor)
+    return str(valor)
+
+
+class CacheBusquedas:
+    """Resultados de búsqueda en SQLite, con una conexión por hilo y proceso."""
+
+    def __init__(self, ruta=RUTA_CACHE, max_bytes=MAX_BYTES):
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._version = None
+        # Horas de uso pendientes de escribir {clave: hora}, compartidas por los hilos del proceso
+        self._usados = {}
+        self._lock_usados = threading.Lock()
+        self._volcado = time.time()
+
+    @staticmethod
+    def clave(consulta, version, **parametros):
+        """Clave de una búsqueda, o None si el índice no tiene versión (no se puede invalidar)."""
+        if version is None:
+            return None
+        datos = {'consulta': normalizar_consulta(consulta), 'version': str(version),
+                 'parametros': {k: _parametro(v) for k, v in sorted(parametros.items())}}
+        return hashlib.sha1(json.dumps(datos, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def conexion(self):
+        con = getattr(self._local, 'conexion', None)
+        if con is None or self._local.pid != os.getpid():
+            con = sqlite3.connect(self.ruta, timeout=ESPERA_S, isolation_level=None)
+            con.execute('PRAGMA journal_mode = WAL')
+            con.execute('PRAGMA synchronous = NORMAL')
+            con.executescript(ESQUEMA)
+            self._local.conexion, self._local.pid = con, os.getpid()
+        return con
+
+    def _error(self, operacion):
+        log.warning('caché de búsquedas %s: error al %s', self.ruta, operacion, exc_info=True)
+        contar('cache_busquedas.errores')
+
+    def get(self, clave):
+        """Valor guardado para `clave` (y lo marca como usado), o None."""
+        if clave is None:
+            return None
+        try:
+            con = self.conexion()
+            fila = con.execute('SELECT valor, usado FROM busquedas WHERE clave = ?', (clave,)).fetchone()
+        except sqlite3.Error:
+            self._error('leer')
+            return None
+        if fila is None:
+            contar('cache_busquedas.fallos')
+            return None
+        try:
+            valor = pickle.loads(fila[0])
+        except Exception:
+            self._error('deserializar')
+            self._sin_esperar(con, 'DELETE FROM busquedas WHERE clave = ?', [(clave,)])
+            return None
+        ahora = time.time()
+        if ahora - fila[1] > REFRESCO_USADO_S:
+            with self._lock_usados:
+                self._usados[clave] = ahora
+        if self._usados and ahora - self._volcado > REFRESCO_USADO_S:
+            self._volcar_usados(con)
+        contar('cache_busquedas.aciertos')
+        return valor
+
+    def _tomar_usados(self):
+        with self._lock_usados:
+            usados, self._usados = self._usados, {}
+            self._volcado = time.time()
+        return [(hora, clave) for clave, hora in usados.items()]
+
+    def _devolver_usados(self, usados):
+        with self._lock_usados:
+            for hora, clave in usados:
+                self._usados.setdefault(clave, hora)
+
+    def _volcar_usados(self, con):
+        """Escribe las horas de uso pendientes si la base no está bloqueada (si lo está, quedan para luego)."""
+        usados = self._tomar_usados()
+        if usados and not self._sin_esperar(con, 'UPDATE busquedas SET usado = MAX(usado, ?) WHERE clave = ?', usados):
+            self._devolver_usados(usados)
+
+    @staticmethod
+    def _sin_esperar(con, sql, parametros):
+        """Ejecuta una escritura sólo si consigue el bloqueo al momento; devuelve si se hizo."""
+        try:
+            con.execute('PRAGMA busy_timeout = 0')
+            try:
+                con.execute('BEGIN IMMEDIATE')
+                try:
+                    con.executemany(sql, parametros)
+                    con.execute('COMMIT')
+                except BaseException:
+                    con.execute('ROLLBACK')
+                    raise
+            finally:
+                con.execute(f'PRAGMA busy_timeout = {int(ESPERA_S * 1000)}')
+        except sqlite3.Error:
+            return False
+        return True
+
+    def set(self, clave, version, valor):
+        if clave is None:
+            return
+        datos = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(datos) > self.max_bytes:
+            return
+        usados = self._tomar_usados()
+        try:
+            con = self.conexion()
+            con.execute('BEGIN IMMEDIATE')
+            try:
+                # Las horas de uso pendientes van en la misma transacción, antes de expulsar
+                con.executemany('UPDATE busquedas SET usado = MAX(usado, ?) WHERE clave = ?', usados)
+                con.execute('INSERT OR REPLACE INTO busquedas VALUES (?, ?, ?, ?, ?)',
+                            (clave, str(version), datos, len(datos), time.time()))
+                self._expulsar(con)
+                con.execute('COMMIT')
+            except BaseException:
+                con.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            self._devolver_usados(usados)
+            self._error('guardar')
+
+    def _expulsar(self, con):
+        """Borra las entradas menos usadas recientemente hasta que el total quepa en `max_bytes`."""
+        total = con.execute('SELECT COALESCE(SUM(bytes), 0) FROM busquedas').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        borradas = con.execute(
+            'DELETE FROM busquedas WHERE clave IN (SELECT clave FROM ('
+            ' SELECT clave, SUM(bytes) OVER (ORDER BY usado DESC, clave) AS acumulado FROM busquedas'
+            ') WHERE acumulado > ?)', (self.max_bytes,)).rowcount
+        contar('cache_busquedas.expulsadas', borradas)
+
+    def purgar(self, version):
+        """Borra las entradas de versiones del índice distintas de `version`."""
+        try:
+            borradas = self.conexion().execute('DELETE FROM busquedas WHERE version != ?', (str(version),)).rowcount
+        except sqlite3.Error:
+            self._error('purgar')
+            return 0
+        contar('cache_busquedas.invalidadas', borradas)
+        return borradas
+
+    def usar_version(self, version):
+        """Purga las demás versiones la primera vez que se usa `version` en este proceso."""
+        if version is not None and version != self._version:
+            self._version = version
+            self.purgar(version)
+
+    def estadisticas(self):
+        """(entradas, bytes) guardados."""
+        return tuple(self.conexion().execute('SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM busquedas').fetchone())
@@ -0,0 +1,309 @@
+"""Clasificación por lotes de OTs sin clavero o con un clavero genérico.
+
+Miles de OTs tienen el clavero vacío o sólo el sistema o el nivel 1 (FRE, FRE09). Este comando
+las lee de un CSV por bloques, codifica su `descripcion_ot` con el modelo de la aplicación en un
+pool de procesos y propone para cada una:
+
+- el clavero más votado por sus `--top-k` vecinos más similares entre las OTs etiquetadas
+  (clavero de nivel >= NIVEL_MINIMO), con votos ponderados por similitud; `confianza_clavero` es
+  la fracción del peso que recibe y `alternativas` los siguientes;
+- la actuación (clavero_actuacion) más votada entre los vecinos de ese clavero.
+
+Si la OT ya tiene un clavero genérico sólo se buscan vecinos entre sus descendientes en la
+jerarquía (FRE01 -> FRE0101, FRE010113...). Si ninguna OT etiquetada desciende de él (todas las de
+FRE09 están sin detallar), se compara la OT con la descripción completa (`componente_total`) de
+sus descendientes en `jerarquia_total.csv`, codificadas una vez al empezar; la columna `fuente`
+indica de dónde sale la sugerencia ('vecinos' o 'jerarquia').
+
+Las puntuaciones se calculan por bloques de la base, así que la memoria no depende del tamaño de
+la entrada ni crece con el de la base.
+
+Uso (desde la raíz del repositorio):
+
+    python -m logica.clasificacion pendientes.csv sugerencias.csv
+    python -m logica.clasificacion pendientes.csv sugerencias.csv --procesos 4 --lote 4096 --todas
+
+La salida tiene las columnas de la entrada más las de la sugerencia (vacías en las OTs que no
+se clasifican: las que ya tienen un clavero específico, salvo con --todas).
+"""
+import argparse
+import collections
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from logica.construccion_jerarquia import descomponer, normalizar_claveros
+from logica.datos import RUTA_EMBEDDINGS, RUTA_OTS, leer_ots
+from logica.ingesta import COL_TEXTO, cargar_modelo, codificar
+from logica.memoria_compartida import rss_proceso
+from logica.resultados import descripciones_claveros
+
+NIVEL_MINIMO = 2
+TOP_K = 10
+LOTE = 2048
+# Filas de la base por bloque de puntuación (memoria: lote x BLOQUE_BASE float32)
+BLOQUE_BASE = 65_536
+MAX_ALTERNATIVAS = 3
+RUTA_JERARQUIA_TOTAL = os.path.join('data', 'jerarquia_total.csv')
+COLUMNAS_SUGERENCIA = ['clavero_sugerido', 'componente_sugerido', 'confianza_clavero', 'alternativas',
+                       'clavero_actuacion_sugerido', 'confianza_actuacion', 'fuente']
+FUENTE_VECINOS = 'vecinos'
+FUENTE_JERARQUIA = 'jerarquia'
+# Código de actuación tras el clavero (T70, T71...); 'no' o '""' no cuentan como actuación
+_RE_ACTUACION = re.compile(r'[A-Za-z]+\d+')
+
+
+def genericos(claveros):
+    """Máscara de claveros vacíos, no válidos o de nivel menor que NIVEL_MINIMO."""
+    nivel = descomponer(pd.Series(claveros, dtype=object).fillna(''))['nivel']
+    return (nivel.isna() | (nivel < NIVEL_MINIMO)).to_numpy(dtype=bool)
+
+
+def vecinos_por_bloques(consultas, embeddings, k, mascara=None, bloque=BLOQUE_BASE):
+    """(índices, puntuaciones) de los k vecinos de cada consulta, recorriendo la base por bloques.
+
+    Sólo se consideran las filas de la base con `mascara` a True; ambos resultados tienen forma
+    (consultas, k) ordenados de mayor a menor, con índice -1 si hay menos de k candidatos.
+    """
+    n = consultas.shape[0]
+    mejores_i = np.full((n, k), -1, dtype=np.int64)
+    mejores_s = np.full((n, k), -np.inf, dtype=np.float32)
+    for ini in range(0, embeddings.shape[0], bloque):
+        fin = min(ini + bloque, embeddings.shape[0])
+        scores = consultas @ np.asarray(embeddings[ini:fin], dtype=np.float32).T
+        if mascara is not None:
+            scores[:, ~mascara[ini:fin]] = -np.inf
+        kb = min(k, fin - ini)
+        parte = np.argpartition(-scores, kb - 1, axis=1)[:, :kb]
+        # Fusión con los mejores hasta ahora
+        todos_s = np.concatenate([mejores_s, np.take_along_axis(scores, parte, axis=1)], axis=1)
+        todos_i = np.concatenate([mejores_i, parte + ini], axis=1)
+        orden = np.argsort(-todos_s, axis=1, kind='stable')[:, :k]
+        mejores_s, mejores_i = np.take_along_axis(todos_s, orden, axis=1), np.take_along_axis(todos_i, orden, axis=1)
+    mejores_i[~np.isfinite(mejores_s)] = -1
+    return mejores_i, mejores_s
+
+
+def _votar(etiquetas, pesos):
+    """[(etiqueta, fracción del peso)] de mayor a menor."""
+    votos = collections.defaultdict(float)
+    for etiqueta, peso in zip(etiquetas, pesos):
+        votos[etiqueta] += peso
+    total = sum(votos.values())
+    if total <= 0:
+        return []
+    return sorted(((e, v / total) for e, v in votos.items()), key=lambda x: -x[1])
+
+
+class Clasificador:
+    """OTs etiquetadas de la base (claveros de nivel >= NIVEL_MINIMO) y sus embeddings.
+
+    `jerarquia` (DataFrame con clavero, nivel y componente_total) sirve de respaldo para los
+    claveros genéricos sin OTs etiquetadas debajo; sus descripciones se codifican con
+    `preparar_jerarquia`.
+    """
+
+    def __init__(self, df, embeddings, jerarquia=None, top_k=TOP_K):
+        if len(df) != embeddings.shape[0]:
+            raise ValueError(f'{len(df)} OTs y {embeddings.shape[0]} embeddings: no están alineados')
+        self.claveros = normalizar_claveros(df['clavero'].fillna('')).to_numpy(dtype=object, na_value='')
+        col_act = df['clavero_actuacion'] if 'clavero_actuacion' in df.columns else pd.Series(None, index=df.index, dtype=object)
+        self.actuaciones = col_act.to_numpy(dtype=object)
+        self.embeddings = embeddings
+        self.etiquetadas = ~genericos(self.claveros)
+        self.top_k = top_k
+        if jerarquia is None:
+            jerarquia = pd.DataFrame({'clavero': [], 'nivel': [], 'componente_total': []})
+        jerarquia = jerarquia.drop_duplicates('clavero')
+        self.descripciones = descripciones_claveros(jerarquia)
+        especificos = (jerarquia['nivel'] >= NIVEL_MINIMO).to_numpy()
+        self.claveros_jerarquia = jerarquia['clavero'].astype(str).to_numpy(dtype=object)[especificos]
+        self.textos_jerarquia = jerarquia['componente_total'].fillna('').astype(str).tolist()
+        self.textos_jerarquia = [t for t, e in zip(self.textos_jerarquia, especificos) if e]
+        self.embeddings_jerarquia = None
+        self._mascaras = {}
+
+    def preparar_jerarquia(self, codificar_textos):
+        """Codifica las descripciones de la jerarquía con `codificar_textos(lista) -> matriz`."""
+        if self.textos_jerarquia:
+            self.embeddings_jerarquia = np.asarray(codificar_textos(self.textos_jerarquia), dtype=np.float32)
+
+    def candidatos(self, prefijo):
+        """(fuente, matriz, claveros, máscara) donde buscar para un clavero genérico, o None.
+
+        Sin prefijo (o con uno que no es un clavero válido) se busca en todas las OTs etiquetadas.
+        """
+        if prefijo not in self._mascaras:
+            self._mascaras[prefijo] = self._candidatos(prefijo)
+        return self._mascaras[prefijo]
+
+    def _candidatos(self, prefijo):
+        if not prefijo or descomponer(pd.Series([prefijo]))['nivel'].isna().all():
+            return FUENTE_VECINOS, self.embeddings, self.claveros, self.etiquetadas
+        mascara = self.etiquetadas & np.char.startswith(self.claveros.astype(str), prefijo)
+        if mascara.any():
+            return FUENTE_VECINOS, self.embeddings, self.claveros, mascara
+        if self.embeddings_jerarquia is not None:
+            mascara = np.char.startswith(self.claveros_jerarquia.astype(str), prefijo)
+            if mascara.any():
+                return FUENTE_JERARQUIA, self.embeddings_jerarquia, self.claveros_jerarquia, mascara
+        return None
+
+    def _actuacion(self, indices, pesos, clavero):
+        """(clavero_actuacion, confianza) más votado entre los vecinos de `clavero`."""
+        actuaciones = [
+            (a, p) for c, a, p in zip(self.claveros[indices], self.actuaciones[indices], pesos)
+            if c == clavero and isinstance(a, str) and _RE_ACTUACION.fullmatch(a[len(c):])
+        ]
+        votos = _votar(*zip(*actuaciones)) if actuaciones else []
+        return votos[0] if votos else (None, None)
+
+    def _sugerencia(self, fuente, claveros, indices, scores):
+        validos = indices >= 0
+        indices, pesos = indices[validos], np.maximum(scores[validos], 0)
+        votos = _votar(claveros[indices], pesos)
+        if not votos:
+            return [None] * len(COLUMNAS_SUGERENCIA)
+        clavero, confianza = votos[0]
+        actuacion, confianza_act = self._actuacion(indices, pesos, clavero) if fuente == FUENTE_VECINOS else (None, None)
+        alternativas = '|'.join(f'{c}:{p:.2f}' for c, p in votos[1:1 + MAX_ALTERNATIVAS])
+        return [clavero, self.descripciones.get(clavero), round(confianza, 4), alternativas, actuacion,
+                None if confianza_act is None else round(confianza_act, 4), fuente]
+
+    def clasificar(self, embeddings, prefijos):
+        """DataFrame con las columnas de COLUMNAS_SUGERENCIA para cada fila de `embeddings`.
+
+        `prefijos` es el clavero genérico de cada fila (None o '' si no tiene).
+        """
+        filas = [[None] * len(COLUMNAS_SUGERENCIA)] * len(prefijos)
+        prefijos = pd.Series(prefijos, dtype=object).fillna('').astype(str).str.strip()
+        for prefijo, posiciones in prefijos.groupby(prefijos).indices.items():
+            candidatos = self.candidatos(prefijo)
+            if candidatos is None:
+                continue
+            fuente, matriz, claveros, mascara = candidatos
+            indices, scores = vecinos_por_bloques(embeddings[posiciones], matriz, self.top_k, mascara)
+            for j, pos in enumerate(posiciones):
+                filas[pos] = self._sugerencia(fuente, claveros, indices[j], scores[j])
+        return pd.DataFrame(filas, columns=COLUMNAS_SUGERENCIA)
+
+
+# --- Codificación en un pool de procesos ---
+
+_modelo = None
+
+
+def _iniciar_trabajador(hilos):
+    global _modelo
+    try:
+        import torch
+        torch.set_num_threads(hilos)
+    except ImportError:
+        pass
+    _modelo = cargar_modelo()
+
+
+def _codificar_en_trabajador(textos):
+    return codificar(textos, _modelo)
+
+
+def _textos(bloque):
+    col = bloque[COL_TEXTO] if COL_TEXTO in bloque.columns else pd.Series('', index=bloque.index)
+    return col.fillna('').astype(str).tolist()
+
+
+def clasificar_csv(entrada, salida, clasificador, lote=LOTE, procesos=None, todas=False, progreso=print):
+    """Clasifica el CSV `entrada` por bloques y escribe `salida`; devuelve (filas, clasificadas, segundos).
+
+    Con `procesos` = 0 se codifica en este proceso. Como mucho hay 2 x procesos bloques leídos y
+    pendientes de codificar a la vez.
+    """
+    procesos = os.cpu_count() if procesos is None else procesos
+    t0 = time.perf_counter()
+    filas = clasificadas = 0
+    pool = modelo = None
+    if procesos > 0:
+        hilos = max(1, (os.cpu_count() or 1) // procesos)
+        pool = ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_trabajador, initargs=(hilos,))
+    else:
+        modelo = cargar_modelo()
+
+    def codificar_bloque(textos):
+        # En el pool devuelve un Future; `_resultado` espera a que termine
+        return pool.submit(_codificar_en_trabajador, textos) if pool is not None else codificar(textos, modelo)
+
+    clasificador.preparar_jerarquia(lambda textos: _resultado((None, None, codificar_bloque(textos)))[2])
+
+    def escribir(bloque, seleccion, embeddings):
+        nonlocal filas, clasificadas
+        sugerencias = pd.DataFrame(index=range(len(bloque)), columns=COLUMNAS_SUGERENCIA, dtype=object)
+        if seleccion.any():
+            # Un clavero genérico restringe los vecinos a sus descendientes; uno específico (--todas), no
+            claveros = bloque['clavero'].to_numpy(dtype=object)
+            prefijos = np.where(genericos(claveros), claveros, None)[seleccion]
+            sugerencias.loc[seleccion] = clasificador.clasificar(embeddings, prefijos).to_numpy()
+        out = pd.concat([bloque.reset_index(drop=True), sugerencias], axis=1)
+        out.to_csv(salida, mode='w' if filas == 0 else 'a', header=filas == 0, index=False)
+        filas += len(bloque)
+        clasificadas += int(seleccion.sum())
+        segundos = time.perf_counter() - t0
+        progreso(f'{filas} filas ({clasificadas} clasificadas), {clasificadas / segundos:.0f} OTs/s, '
+                 f'{rss_proceso().get("rss", 0):.0f} MB')
+
+    try:
+        pendientes = collections.deque()
+        for bloque in pd.read_csv(entrada, chunksize=lote):
+            if 'clavero' not in bloque.columns:
+                bloque['clavero'] = None
+            seleccion = np.ones(len(bloque), dtype=bool) if todas else genericos(bloque['clavero'])
+            textos = [t for t, s in zip(_textos(bloque), seleccion) if s]
+            pendientes.append((bloque, seleccion, codificar_bloque(textos) if textos else None))
+            while len(pendientes) > 2 * max(procesos, 1) - 1:
+                escribir(*_resultado(pendientes.popleft()))
+        while pendientes:
+            escribir(*_resultado(pendientes.popleft()))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return filas, clasificadas, time.perf_counter() - t0
+
+
+def _resultado(pendiente):
+    bloque, seleccion, codificado = pendiente
+    if codificado is not None and hasattr(codificado, 'result'):
+        codificado = codificado.result()
+    return bloque, seleccion, codificado
+
+
+def cargar_clasificador(ruta_ots=RUTA_OTS, ruta_embeddings=RUTA_EMBEDDINGS, ruta_jerarquia=RUTA_JERARQUIA_TOTAL, top_k=TOP_K):
+    """Clasificador sobre las OTs etiquetadas (embeddings abiertos con mmap, sin copiarlos)."""
+    jerarquia = pd.read_csv(ruta_jerarquia) if os.path.exists(ruta_jerarquia) else None
+    return Clasificador(leer_ots(ruta_ots), np.load(ruta_embeddings, mmap_mode='r'), jerarquia, top_k)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('entrada', help='CSV de OTs (con descripcion_ot y, si lo tiene, clavero)')
+    parser.add_argument('salida')
+    parser.add_argument('--lote', type=int, default=LOTE, help='filas por bloque')
+    parser.add_argument('--procesos', type=int, default=os.cpu_count(), help='procesos que codifican (0 = este)')
+    parser.add_argument('--top-k', type=int, default=TOP_K)
+    parser.add_argument('--todas', action='store_true', help='clasificar también las OTs con clavero específico')
+    parser.add_argument('--ots', default=RUTA_OTS)
+    parser.add_argument('--embeddings', default=RUTA_EMBEDDINGS)
+    args = parser.parse_args(argv)
+
+    clasificador = cargar_clasificador(args.ots, args.embeddings, top_k=args.top_k)
+    print(f'{int(clasificador.etiquetadas.sum())} OTs etiquetadas de {len(clasificador.claveros)}')
+    filas, clasificadas, segundos = clasificar_csv(args.entrada, args.salida, clasificador, args.lote, args.procesos, args.todas)
+    print(f'{filas} filas, {clasificadas} clasificadas en {segundos:.1f} s ({clasificadas / max(segundos, 1e-9):.0f} OTs/s) -> {args.salida}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
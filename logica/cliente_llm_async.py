@@ -0,0 +1,282 @@
+"""Cliente asíncrono de un servidor compatible con Ollama.
+
+- Reutiliza conexiones HTTP/1.1 keep-alive (pool de conexiones libres).
+- Limita el número de generaciones simultáneas con un semáforo.
+- Cada llamada tiene su propio plazo; si vence se lanza `asyncio.TimeoutError` sin afectar al
+  resto de llamadas que comparten la generación.
+- Las peticiones idénticas (modelo, prompt, opciones) que coinciden en el tiempo comparten una
+  única generación: el primer llamante la lanza y los demás reciben los mismos tokens.
+
+`ClienteLLMFondo` ejecuta el cliente en un bucle de eventos propio en segundo plano y ofrece la
+misma interfaz síncrona que `logica.sintesis.ClienteOllama`, para usarlo desde Streamlit
+(un único cliente compartido por todas las sesiones del proceso).
+"""
+import asyncio
+import json
+import queue
+import threading
+from contextlib import aclosing
+from urllib.parse import urlsplit
+
+from logica.sintesis import OLLAMA_URL, OLLAMA_MODELO, ErrorLLM
+
+
+class _Difusion:
+    """Tokens de una generación en curso, compartidos entre los llamantes que la esperan."""
+
+    def __init__(self):
+        self.tokens = []
+        self.terminado = False
+        self.error = None
+        self.suscriptores = 0
+        self.tarea = None
+        self.cond = asyncio.Condition()
+
+
+class ClienteOllamaAsync:
+
+    def __init__(self, url=OLLAMA_URL, modelo=OLLAMA_MODELO, max_concurrencia=4, max_conexiones=None,
+                 timeout=60.0, timeout_conexion=3.0):
+        partes = urlsplit(url)
+        if partes.scheme != 'http':
+            raise ValueError(f'Sólo se admite http:// para el servidor local: {url}')
+        self.host = partes.hostname or 'localhost'
+        self.puerto = partes.port or 80
+        self.modelo = modelo
+        self.timeout = timeout
+        self.timeout_conexion = timeout_conexion
+        self.max_concurrencia = max_concurrencia
+        self.max_conexiones = max_conexiones or max_concurrencia
+        self._semaforo = None
+        self._libres = []
+        self._en_vuelo = {}
+        self._bucle = None
+
+    # --- API pública ---
+
+    async def generar(self, prompt, timeout=None, **opciones):
+        """Generador asíncrono de fragmentos de texto."""
+        self._comprobar_bucle()
+        bucle = asyncio.get_running_loop()
+        limite = bucle.time() + (timeout or self.timeout)
+        clave = (self.modelo, prompt, json.dumps(opciones, sort_keys=True))
+
+        difusion = self._en_vuelo.get(clave)
+        if difusion is None:
+            difusion = _Difusion()
+            self._en_vuelo[clave] = difusion
+            difusion.tarea = asyncio.ensure_future(self._producir(clave, difusion, prompt, opciones))
+        difusion.suscriptores += 1
+
+        i = 0
+        try:
+            while True:
+                async with difusion.cond:
+                    restante = limite - bucle.time()
+                    if restante <= 0:
+                        raise asyncio.TimeoutError()
+                    await asyncio.wait_for(
+                        difusion.cond.wait_for(lambda: len(difusion.tokens) > i or difusion.terminado),
+                        restante,
+                    )
+                    nuevos = difusion.tokens[i:]
+                    terminado, error = difusion.terminado, difusion.error
+                i += len(nuevos)
+                for token in nuevos:
+                    yield token
+                if terminado and i >= len(difusion.tokens):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            difusion.suscriptores -= 1
+            if difusion.suscriptores == 0 and not difusion.terminado:
+                difusion.tarea.cancel()
+
+    async def completar(self, prompt, timeout=None, **opciones):
+        """Respuesta completa (comparte la generación con peticiones idénticas simultáneas)."""
+        async with aclosing(self.generar(prompt, timeout=timeout, **opciones)) as tokens:
+            return ''.join([token async for token in tokens])
+
+    async def cerrar(self):
+        for tarea in [d.tarea for d in self._en_vuelo.values()]:
+            tarea.cancel()
+        while self._libres:
+            _, writer = self._libres.pop()
+            writer.close()
+
+    # --- Generación compartida ---
+
+    def _comprobar_bucle(self):
+        bucle = asyncio.get_running_loop()
+        if self._bucle is not bucle:
+            # Las conexiones y el semáforo pertenecen a un bucle concreto
+            self._bucle = bucle
+            self._semaforo = asyncio.Semaphore(self.max_concurrencia)
+            self._libres = []
+            self._en_vuelo = {}
+
+    async def _producir(self, clave, difusion, prompt, opciones):
+        try:
+            async with self._semaforo:
+                async with aclosing(self._stream(prompt, opciones)) as tokens:
+                    async for token in tokens:
+                        async with difusion.cond:
+                            difusion.tokens.append(token)
+                            difusion.cond.notify_all()
+        except asyncio.CancelledError:
+            difusion.error = ErrorLLM('Generación cancelada')
+            raise
+        except Exception as exc:
+            difusion.error = exc if isinstance(exc, ErrorLLM) else ErrorLLM(f'Error al generar: {exc}')
+        finally:
+            if self._en_vuelo.get(clave) is difusion:
+                del self._en_vuelo[clave]
+            difusion.terminado = True
+            try:
+                async with difusion.cond:
+                    difusion.cond.notify_all()
+            except asyncio.CancelledError:
+                pass
+
+    async def _stream(self, prompt, opciones):
+        cuerpo = {'model': self.modelo, 'prompt': prompt, 'stream': True}
+        if opciones:
+            cuerpo['options'] = opciones
+        pendiente = b''
+        async with aclosing(self._post('/api/generate', cuerpo)) as respuesta:
+            async for datos in respuesta:
+                pendiente += datos
+                *lineas, pendiente = pendiente.split(b'\n')
+                for linea in lineas:
+                    if not linea.strip():
+                        continue
+                    fragmento = json.loads(linea)
+                    if fragmento.get('error'):
+                        raise ErrorLLM(fragmento['error'])
+                    if fragmento.get('response'):
+                        yield fragmento['response']
+
+    # --- HTTP/1.1 mínimo con keep-alive ---
+
+    async def _conexion(self):
+        while self._libres:
+            reader, writer = self._libres.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        try:
+            return await asyncio.wait_for(asyncio.open_connection(self.host, self.puerto), self.timeout_conexion)
+        except (OSError, asyncio.TimeoutError) as exc:
+            raise ErrorLLM(f'No se pudo contactar con el modelo en {self.host}:{self.puerto}: {exc!r}') from exc
+
+    def _devolver(self, reader, writer):
+        if len(self._libres) < self.max_conexiones and not writer.is_closing():
+            self._libres.append((reader, writer))
+        else:
+            writer.close()
+
+    async def _post(self, ruta, cuerpo):
+        """Envía un POST JSON y devuelve el cuerpo de la respuesta a trozos."""
+        datos = json.dumps(cuerpo).encode('utf-8')
+        reader, writer = await self._conexion()
+        reutilizable = False
+        try:
+            writer.write(
+                f'POST {ruta} HTTP/1.1\r\nHost: {self.host}:{self.puerto}\r\n'
+                f'Content-Type: application/json\r\nContent-Length: {len(datos)}\r\n'
+                f'Connection: keep-alive\r\n\r\n'.encode('ascii') + datos
+            )
+            await writer.drain()
+
+            linea_estado = await reader.readline()
+            if not linea_estado:
+                raise ErrorLLM('El servidor del modelo cerró la conexión')
+            estado = int(linea_estado.split()[1])
+            cabeceras = {}
+            while True:
+                linea = await reader.readline()
+                if linea in (b'\r\n', b'\n', b''):
+                    break
+                nombre, _, valor = linea.decode('latin-1').partition(':')
+                cabeceras[nombre.strip().lower()] = valor.strip()
+
+            if estado != 200:
+                cuerpo_error = await self._leer_cuerpo(reader, cabeceras)
+                raise ErrorLLM(f'El servidor del modelo respondió {estado}: {cuerpo_error[:200]!r}')
+
+            if cabeceras.get('transfer-encoding', '').lower() == 'chunked':
+                while True:
+                    tam = int((await reader.readline()).split(b';')[0], 16)
+                    if tam == 0:
+                        await reader.readline()
+                        break
+                    trozo = await reader.readexactly(tam)
+                    await reader.readexactly(2)
+                    yield trozo
+            else:
+                yield await self._leer_cuerpo(reader, cabeceras)
+            reutilizable = cabeceras.get('connection', '').lower() != 'close'
+        finally:
+            if reutilizable:
+                self._devolver(reader, writer)
+            else:
+                writer.close()
+
+    @staticmethod
+    async def _leer_cuerpo(reader, cabeceras):
+        if 'content-length' in cabeceras:
+            return await reader.readexactly(int(cabeceras['content-length']))
+        return await reader.read()
+
+
+class ClienteLLMFondo:
+    """Fachada síncrona de `ClienteOllamaAsync` sobre un bucle de eventos en un hilo propio."""
+
+    def __init__(self, cliente=None):
+        self.cliente = cliente or ClienteOllamaAsync()
+        self.modelo = self.cliente.modelo
+        self._bucle = asyncio.new_event_loop()
+        threading.Thread(target=self._bucle.run_forever, name='cliente-llm', daemon=True).start()
+
+    def generar(self, prompt, timeout=None, **opciones):
+        """Generador síncrono de fragmentos, compatible con `logica.sintesis.sintetizar`."""
+        cola = queue.Queue()
+        fin = object()
+
+        async def consumir():
+            try:
+                async with aclosing(self.cliente.generar(prompt, timeout=timeout, **opciones)) as tokens:
+                    async for token in tokens:
+                        cola.put(token)
+            except BaseException as exc:
+                cola.put(exc)
+                if isinstance(exc, asyncio.CancelledError):
+                    raise
+            finally:
+                cola.put(fin)
+
+        futuro = asyncio.run_coroutine_threadsafe(consumir(), self._bucle)
+        try:
+            while True:
+                elemento = cola.get()
+                if elemento is fin:
+                    return
+                if isinstance(elemento, asyncio.TimeoutError):
+                    raise ErrorLLM('El modelo no respondió a tiempo') from elemento
+                if isinstance(elemento, BaseException):
+                    raise elemento
+                yield elemento
+        finally:
+            futuro.cancel()
+
+    def completar(self, prompt, timeout=None, **opciones):
+        futuro = asyncio.run_coroutine_threadsafe(self.cliente.completar(prompt, timeout=timeout, **opciones), self._bucle)
+        try:
+            return futuro.result()
+        except asyncio.TimeoutError as exc:
+            raise ErrorLLM('El modelo no respondió a tiempo') from exc
+
+    def cerrar(self):
+        asyncio.run_coroutine_threadsafe(self.cliente.cerrar(), self._bucle).result()
+        self._bucle.call_soon_threadsafe(self._bucle.stop)
@@ -0,0 +1,280 @@
+"""Columnas compactas para las tablas de órdenes de trabajo.
+
+- `ColumnaCategorica`: códigos int32 y la lista de valores distintos (equipo, clavero, ...).
+- `BloqueTexto`: texto libre en un único buffer UTF-8 contiguo con offsets; los textos repetidos
+  se guardan una vez y cada fila apunta al suyo.
+- `TablaCompacta`: conjunto de columnas (categóricas, de texto o arrays numpy) con la misma
+  longitud; `filas(posiciones)` materializa sólo las filas pedidas como DataFrame.
+
+Todas se guardan como ficheros .npy y se pueden abrir con `mmap`, de modo que varios procesos
+comparten las mismas páginas sin copiarlas (ver `logica.memoria_compartida`).
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FICHERO_TABLA = 'tabla.json'
+
+
+def _cargar_npy(path, mmap):
+    return np.load(path, mmap_mode='r' if mmap else None)
+
+
+class ColumnaCategorica:
+    """Columna codificada como enteros; el código -1 es un valor nulo."""
+
+    def __init__(self, codigos, categorias):
+        self.codigos = codigos
+        self.categorias = np.asarray(categorias, dtype=object)
+        self._ids = None
+
+    @classmethod
+    def desde_serie(cls, serie):
+        codigos, categorias = pd.factorize(serie, use_na_sentinel=True)
+        return cls(codigos.astype(np.int32), categorias.astype(str))
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def codigo(self, valor):
+        """Código de `valor`, o None si no aparece en la columna."""
+        if self._ids is None:
+            self._ids = {v: i for i, v in enumerate(self.categorias)}
+        return self._ids.get(valor)
+
+    def igual(self, valor):
+        """Máscara booleana de las filas con `valor` (sin comparar cadenas fila a fila)."""
+        codigo = self.codigo(valor)
+        if codigo is None:
+            return np.zeros(len(self.codigos), dtype=bool)
+        return np.asarray(self.codigos) == codigo
+
+    def tomar(self, posiciones):
+        codigos = np.asarray(self.codigos[posiciones])
+        valores = self.categorias[np.maximum(codigos, 0)] if len(self.categorias) else np.full(len(codigos), None, dtype=object)
+        valores[codigos < 0] = None
+        return valores
+
+    def agregar(self, serie):
+        """Columna nueva con los valores de `serie` añadidos al final (las categorías nuevas, al final)."""
+        valores = pd.Series(serie, dtype=object)
+        nuevas = [v for v in pd.unique(valores.dropna().astype(str)) if self.codigo(v) is None]
+        categorias = np.concatenate([self.categorias, np.asarray(nuevas, dtype=object)])
+        ids = {v: i for i, v in enumerate(categorias)}
+        codigos = valores.map(lambda v: -1 if v is None or pd.isna(v) else ids[str(v)]).to_numpy(dtype=np.int32)
+        col = ColumnaCategorica(np.concatenate([np.asarray(self.codigos), codigos]), categorias)
+        col._ids = ids
+        return col
+
+    def rebanada(self, ini, fin):
+        col = ColumnaCategorica(self.codigos[ini:fin], self.categorias)
+        col._ids = self._ids
+        return col
+
+    def nbytes(self):
+        return self.codigos.nbytes + sum(len(c.encode('utf-8')) + 49 for c in self.categorias)
+
+    def guardar(self, directorio, nombre):
+        np.save(os.path.join(directorio, f'{nombre}.codigos.npy'), np.asarray(self.codigos))
+        with open(os.path.join(directorio, f'{nombre}.categorias.json'), 'w', encoding='utf-8') as f:
+            json.dump(list(self.categorias), f, ensure_ascii=False)
+
+    @classmethod
+    def cargar(cls, directorio, nombre, mmap=True):
+        with open(os.path.join(directorio, f'{nombre}.categorias.json'), encoding='utf-8') as f:
+            categorias = json.load(f)
+        return cls(_cargar_npy(os.path.join(directorio, f'{nombre}.codigos.npy'), mmap), categorias)
+
+
+class BloqueTexto:
+    """Columna de texto libre: los textos distintos en un buffer UTF-8 (`datos`) con `offsets`.
+
+    La fila i apunta con `codigos[i]` a su texto, datos[offsets[c]:offsets[c + 1]]; el código -1
+    es un valor nulo. Los textos repetidos ('SIN COMENTARIOS', definiciones del manual...) se
+    guardan una sola vez.
+    """
+
+    def __init__(self, datos, offsets, codigos):
+        self.datos = datos
+        self.offsets = offsets
+        self.codigos = codigos
+
+    @classmethod
+    def desde_serie(cls, serie):
+        codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+        codificados = [str(v).encode('utf-8') for v in unicos]
+        offsets = np.zeros(len(codificados) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in codificados], out=offsets[1:])
+        datos = np.frombuffer(b''.join(codificados), dtype=np.uint8)
+        return cls(datos, offsets, codigos.astype(np.int32))
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def _texto(self, codigo):
+        return bytes(self.datos[self.offsets[codigo]:self.offsets[codigo + 1]]).decode('utf-8')
+
+    def __getitem__(self, i):
+        codigo = int(self.codigos[i])
+        return None if codigo < 0 else self._texto(codigo)
+
+    def tomar(self, posiciones):
+        codigos = np.asarray(self.codigos[posiciones]).ravel()
+        textos = {c: self._texto(c) for c in np.unique(codigos) if c >= 0}
+        return np.array([textos.get(c) for c in codigos], dtype=object)
+
+    def agregar(self, serie):
+        """Bloque nuevo con los textos de `serie` añadidos al final.
+
+        Los textos nuevos sólo se deduplican entre sí, no contra los ya guardados (eso lo hace
+        volver a construir el bloque con `desde_serie`).
+        """
+        nuevo = BloqueTexto.desde_serie(pd.Series(serie, dtype=object))
+        n_textos = len(self.offsets) - 1
+        codigos = np.where(nuevo.codigos >= 0, nuevo.codigos + n_textos, -1).astype(np.int32)
+        return BloqueTexto(
+            np.concatenate([np.asarray(self.datos), nuevo.datos]),
+            np.concatenate([np.asarray(self.offsets), nuevo.offsets[1:] + self.offsets[-1]]),
+            np.concatenate([np.asarray(self.codigos), codigos]),
+        )
+
+    def rebanada(self, ini, fin):
+        return BloqueTexto(self.datos, self.offsets, self.codigos[ini:fin])
+
+    def nbytes(self):
+        return self.datos.nbytes + self.offsets.nbytes + self.codigos.nbytes
+
+    def guardar(self, directorio, nombre):
+        np.save(os.path.join(directorio, f'{nombre}.utf8.npy'), np.asarray(self.datos))
+        np.save(os.path.join(directorio, f'{nombre}.offsets.npy'), np.asarray(self.offsets))
+        np.save(os.path.join(directorio, f'{nombre}.codigos.npy'), np.asarray(self.codigos))
+
+    @classmethod
+    def cargar(cls, directorio, nombre, mmap=True):
+        return cls(*(_cargar_npy(os.path.join(directorio, f'{nombre}.{parte}.npy'), mmap)
+                     for parte in ('utf8', 'offsets', 'codigos')))
+
+
+class TablaCompacta:
+    """Columnas compactas de igual longitud, con el índice (etiquetas de fila) del DataFrame de origen."""
+
+    def __init__(self, columnas, indice):
+        self.columnas = columnas
+        self.indice = indice
+
+    @classmethod
+    def desde_dataframe(cls, df, categoricas=None, max_ratio_categorias=0.5):
+        """Codifica `df`: columnas numéricas tal cual, de texto como categóricas o bloques UTF-8.
+
+        Sin `categoricas`, una columna de texto se codifica como categórica si tiene menos de
+        `max_ratio_categorias` valores distintos por fila.
+        """
+        columnas = {}
+        for nombre in df.columns:
+            serie = df[nombre]
+            if serie.dtype.kind in 'biufcmM':
+                columnas[nombre] = serie.to_numpy()
+                continue
+            if categoricas is not None:
+                categorica = nombre in categoricas
+            else:
+                categorica = serie.nunique(dropna=True) < max_ratio_categorias * max(len(serie), 1)
+            columnas[nombre] = ColumnaCategorica.desde_serie(serie) if categorica else BloqueTexto.desde_serie(serie)
+        return cls(columnas, df.index.to_numpy())
+
+    def __len__(self):
+        return len(self.indice)
+
+    @property
+    def columns(self):
+        return list(self.columnas)
+
+    def columna(self, nombre):
+        return self.columnas[nombre]
+
+    def valor(self, nombre, posicion):
+        """Valor de una celda (str, número o None)."""
+        return self.valores(nombre, [posicion])[0]
+
+    def valores(self, nombre, posiciones):
+        col = self.columnas[nombre]
+        if isinstance(col, (ColumnaCategorica, BloqueTexto)):
+            return col.tomar(posiciones)
+        return np.asarray(col[posiciones])
+
+    def filas(self, posiciones, columnas=None):
+        """DataFrame con las filas `posiciones` (y sólo las `columnas` indicadas)."""
+        posiciones = np.asarray(posiciones, dtype=np.intp)
+        nombres = self.columns if columnas is None else [c for c in columnas if c in self.columnas]
+        return pd.DataFrame(
+            {nombre: self.valores(nombre, posiciones) for nombre in nombres},
+            index=pd.Index(np.asarray(self.indice[posiciones])),
+            columns=nombres,
+        )
+
+    def agregar(self, df):
+        """Tabla nueva con las filas de `df` añadidas al final, sin volver a codificar las existentes.
+
+        Las columnas que no están en `df` se rellenan con nulos; las de `df` que no están en la
+        tabla se ignoran.
+        """
+        columnas = {}
+        for nombre, col in self.columnas.items():
+            serie = df[nombre] if nombre in df.columns else pd.Series([None] * len(df), dtype=object)
+            if isinstance(col, (ColumnaCategorica, BloqueTexto)):
+                columnas[nombre] = col.agregar(serie.to_numpy())
+            else:
+                tipo = np.asarray(col).dtype
+                if tipo.kind in 'iu' and serie.isna().any():
+                    # to_numpy convertiría el nulo en un entero cualquiera
+                    raise ValueError(f'columna {nombre!r}: valores nulos en una columna {tipo}')
+                columnas[nombre] = np.concatenate([np.asarray(col), serie.to_numpy(dtype=tipo)])
+        return TablaCompacta(columnas, np.concatenate([np.asarray(self.indice), df.index.to_numpy()]))
+
+    def rebanada(self, ini, fin):
+        """Filas [ini, fin) sin copiar datos."""
+        columnas = {
+            nombre: col.rebanada(ini, fin) if isinstance(col, (ColumnaCategorica, BloqueTexto)) else col[ini:fin]
+            for nombre, col in self.columnas.items()
+        }
+        return TablaCompacta(columnas, self.indice[ini:fin])
+
+    def nbytes(self):
+        total = self.indice.nbytes
+        for col in self.columnas.values():
+            total += col.nbytes() if isinstance(col, (ColumnaCategorica, BloqueTexto)) else col.nbytes
+        return total
+
+    def guardar(self, directorio):
+        os.makedirs(directorio, exist_ok=True)
+        tipos = {}
+        for i, (nombre, col) in enumerate(self.columnas.items()):
+            fichero = f'c{i}'
+            if isinstance(col, ColumnaCategorica):
+                tipos[nombre] = ('categorica', fichero)
+            elif isinstance(col, BloqueTexto):
+                tipos[nombre] = ('texto', fichero)
+            else:
+                tipos[nombre] = ('array', fichero)
+                np.save(os.path.join(directorio, f'{fichero}.npy'), np.asarray(col))
+                continue
+            col.guardar(directorio, fichero)
+        np.save(os.path.join(directorio, 'indice.npy'), np.asarray(self.indice))
+        with open(os.path.join(directorio, FICHERO_TABLA), 'w', encoding='utf-8') as f:
+            json.dump({'filas': len(self), 'columnas': tipos}, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def cargar(cls, directorio, mmap=True):
+        with open(os.path.join(directorio, FICHERO_TABLA), encoding='utf-8') as f:
+            meta = json.load(f)
+        columnas = {}
+        for nombre, (tipo, fichero) in meta['columnas'].items():
+            if tipo == 'categorica':
+                columnas[nombre] = ColumnaCategorica.cargar(directorio, fichero, mmap)
+            elif tipo == 'texto':
+                columnas[nombre] = BloqueTexto.cargar(directorio, fichero, mmap)
+            else:
+                columnas[nombre] = _cargar_npy(os.path.join(directorio, f'{fichero}.npy'), mmap)
+        return cls(columnas, _cargar_npy(os.path.join(directorio, 'indice.npy'), mmap))
@@ -0,0 +1,191 @@
+"""Construcción de la jerarquía de claveros a partir del diccionario de claves.
+
+Un clavero es un prefijo alfabético de sistema seguido de pares de dígitos: FRE (sistema, nivel 0),
+FRE03 (nivel 1), FRE0312 (nivel 2), FRE031201 (nivel 3)... El ancestro de nivel k de un clavero es
+el sistema con los 2k primeros dígitos. Los niveles se extraen con una expresión regular sobre la
+columna entera y los nombres de los ancestros con un `map` por nivel, sin `apply` por fila ni
+auto-merges, para cualquier profundidad y cualquier prefijo de sistema.
+
+Uso (sustituye a `nivel1_key`/`nivel2_key` de `preprocess.ipynb`):
+
+    python -m logica.construccion_jerarquia [data/diccionario.csv] [data] [--estricto]
+
+escribe `jerarquia.csv` y `jerarquia_total.csv` (la misma tabla con `componente_total`) e informa
+de las incidencias del diccionario; con --estricto termina con código 1 si hay alguna.
+"""
+import os
+import string
+import sys
+
+import numpy as np
+import pandas as pd
+
+from logica.jerarquia import OTROS
+
+PATRON_CLAVERO = r'[A-Za-z]+\d*'
+# Cadenas de Arrow: strip, fullmatch, slice, len... se ejecutan sobre la columna entera
+TIPO_CADENA = 'string[pyarrow]'
+COL_CLAVERO = 'Clavero'
+COL_DESCRIPCION = 'Descripción componente'
+# Ancestros sin fila propia en el diccionario cuyo nombre se conoce
+NOMBRES_FALTANTES = {'FRE01': 'Paneles'}
+SEPARADOR_TOTAL = ' de '
+FICHERO_JERARQUIA = 'jerarquia.csv'
+FICHERO_JERARQUIA_TOTAL = 'jerarquia_total.csv'
+
+
+def normalizar_claveros(claveros):
+    return claveros.astype(TIPO_CADENA).str.strip()
+
+
+def descomponer(claveros):
+    """DataFrame (sistema, digitos, nivel) de una serie de claveros; nivel NA si no es válido."""
+    claveros = normalizar_claveros(claveros)
+    valido = claveros.str.fullmatch(PATRON_CLAVERO).fillna(False).to_numpy(dtype=bool)
+    digitos = claveros.str.lstrip(string.ascii_letters).where(valido)
+    sistema = claveros.str.replace(r'\d+$', '', regex=True).where(valido)
+    return pd.DataFrame({'sistema': sistema, 'digitos': digitos, 'nivel': digitos.str.len() // 2})
+
+
+def _claveros(diccionario):
+    """(clavero, componente) del diccionario: una fila por clavero, la primera que aparece."""
+    df = pd.DataFrame({
+        'clavero': normalizar_claveros(diccionario[COL_CLAVERO]),
+        'componente': diccionario[COL_DESCRIPCION],
+    })
+    return df.drop_duplicates('clavero').reset_index(drop=True)
+
+
+def _nombres(df, nombres_faltantes):
+    """Serie clavero -> componente, con `nombres_faltantes` por encima del diccionario."""
+    nombres = pd.Series(df['componente'].to_numpy(dtype=object), index=df['clavero'].to_numpy(dtype=object))
+    if not nombres_faltantes:
+        return nombres
+    faltantes = pd.Series(nombres_faltantes, dtype=object)
+    return pd.concat([nombres[~nombres.index.isin(faltantes.index)], faltantes])
+
+
+def _buscar(nombres, claves):
+    """Nombre de cada clave (array de objetos, None si no está en `nombres` o no tiene nombre)."""
+    pos = nombres.index.get_indexer(claves)
+    nombre = np.where(pos >= 0, nombres.to_numpy(dtype=object)[pos], None)
+    nombre[pd.isna(nombre)] = None
+    return nombre
+
+
+def _objetos(serie):
+    """Array de objetos de una serie de cadenas, con None para los nulos."""
+    return serie.to_numpy(dtype=object, na_value=None)
+
+
+def construir_jerarquia(diccionario, nombres_faltantes=NOMBRES_FALTANTES, profundidad=None):
+    """Tabla clavero, componente, nivel, nivel1, componente_nivel1, nivel2, ..., componente_total.
+
+    Hay un par nivel<k>/componente_nivel<k> para k = 1 .. profundidad - 1 (por defecto la
+    profundidad máxima del diccionario). Un clavero de nivel n sólo tiene los ancestros k < n; si
+    uno no está en el diccionario (ni en `nombres_faltantes`) su clave queda vacía y su nombre es
+    'Otros'. `componente_total` es el componente seguido de los nombres de sus ancestros, del más
+    cercano al sistema. Los claveros que no siguen el patrón se descartan (ver `incidencias`).
+    """
+    df = _claveros(diccionario)
+    partes = descomponer(df['clavero'])
+    validos = partes['nivel'].notna().to_numpy()
+    df, partes = df[validos].reset_index(drop=True), partes[validos].reset_index(drop=True)
+    nivel = partes['nivel'].to_numpy(dtype=np.int64)
+    df['clavero'] = _objetos(df['clavero'])
+    df['nivel'] = nivel
+    if profundidad is None:
+        profundidad = int(nivel.max()) if len(df) else 0
+
+    nombres = _nombres(df, nombres_faltantes)
+    total = df['componente'].fillna('').astype(str).to_numpy(dtype=object)
+    ancestros = []
+    for k in range(1, profundidad):
+        tiene = nivel > k
+        clave = np.where(tiene, _objetos(partes['sistema'] + partes['digitos'].str[:2 * k]), None)
+        nombre = _buscar(nombres, clave)
+        falta = tiene & (nombre == None)  # noqa: E711 (comparación elemento a elemento)
+        clave[falta] = None
+        nombre[falta] = OTROS
+        ancestros.append((k, clave, nombre))
+    for k, _, nombre in reversed(ancestros):
+        tiene = nivel > k
+        total[tiene] = total[tiene] + SEPARADOR_TOTAL + nombre[tiene]
+
+    for k, clave, nombre in ancestros:
+        df[f'nivel{k}'] = clave
+        df[f'componente_nivel{k}'] = nombre
+    df['componente_total'] = total
+    return df
+
+
+def _incidencia(claveros, tipo, detalle):
+    detalle = detalle.to_numpy(dtype=object) if isinstance(detalle, pd.Series) else detalle
+    return pd.DataFrame({'clavero': np.asarray(claveros, dtype=object), 'tipo': tipo, 'detalle': detalle})
+
+
+def incidencias(diccionario, nombres_faltantes=NOMBRES_FALTANTES):
+    """Problemas de consistencia del diccionario: DataFrame (clavero, tipo, detalle).
+
+    Tipos: 'clavero_invalido' (no es prefijo alfabético + dígitos), 'digitos_impares',
+    'descripcion_duplicada' (el mismo clavero con varias descripciones), 'sin_descripcion' y
+    'sin_padre' (el padre directo no está en el diccionario; el hijo se cuelga de 'Otros').
+    """
+    claveros = normalizar_claveros(diccionario[COL_CLAVERO])
+    partes = descomponer(claveros)
+    invalido = partes['nivel'].isna().to_numpy()
+    impar = (partes['digitos'].str.len() % 2 == 1).fillna(False).to_numpy(dtype=bool)
+    filas = [
+        _incidencia(claveros[invalido], 'clavero_invalido', 'no es SISTEMA + dígitos'),
+        _incidencia(claveros[impar], 'digitos_impares', 'número impar de dígitos'),
+    ]
+
+    descripciones = diccionario[COL_DESCRIPCION].groupby(claveros.to_numpy(dtype=object, na_value='')).nunique()
+    duplicadas = descripciones[descripciones > 1]
+    filas.append(_incidencia(duplicadas.index, 'descripcion_duplicada', duplicadas.astype(str) + ' descripciones distintas'))
+
+    df = _claveros(diccionario)
+    vacio = (df['componente'].isna() | (df['componente'].astype(str).str.strip() == '')).to_numpy()
+    filas.append(_incidencia(df['clavero'][vacio], 'sin_descripcion', ''))
+
+    # Padre directo: el prefijo con dos dígitos menos (un recorte por nivel, no por fila)
+    unicos = descomponer(df['clavero'])
+    nivel = unicos['nivel'].fillna(0).to_numpy(dtype=np.int64)
+    padre = np.full(len(df), None, dtype=object)
+    for n in np.unique(nivel[nivel >= 1]):
+        filas_n = nivel == n
+        padre[filas_n] = _objetos(unicos['sistema'][filas_n] + unicos['digitos'][filas_n].str[:2 * (int(n) - 1)])
+    conocidos = _nombres(df, nombres_faltantes).index
+    huerfano = (nivel >= 1) & (conocidos.get_indexer(padre) < 0)
+    filas.append(_incidencia(df['clavero'][huerfano], 'sin_padre', 'falta ' + padre[huerfano]))
+
+    return pd.concat(filas, ignore_index=True)
+
+
+def guardar_jerarquia(jerarquia, directorio='data'):
+    """Escribe `jerarquia.csv` (sin componente_total) y `jerarquia_total.csv`."""
+    jerarquia.drop(columns='componente_total').to_csv(os.path.join(directorio, FICHERO_JERARQUIA), index=False)
+    jerarquia.to_csv(os.path.join(directorio, FICHERO_JERARQUIA_TOTAL), index=False)
+
+
+def main(argv=None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    estricto = '--estricto' in args
+    args = [a for a in args if a != '--estricto']
+    origen = args[0] if args else os.path.join('data', 'diccionario.csv')
+    destino = args[1] if len(args) > 1 else 'data'
+
+    diccionario = pd.read_csv(origen)
+    problemas = incidencias(diccionario)
+    jerarquia = construir_jerarquia(diccionario)
+    guardar_jerarquia(jerarquia, destino)
+
+    print(f'{len(jerarquia)} claveros, niveles {jerarquia["nivel"].value_counts().sort_index().to_dict()}')
+    for tipo, grupo in problemas.groupby('tipo'):
+        ejemplos = ', '.join(f'{c} ({d})' if d else c for c, d in zip(grupo['clavero'].head(5), grupo['detalle'].head(5)))
+        print(f'{tipo}: {len(grupo)}  p. ej. {ejemplos}')
+    return 1 if estricto and len(problemas) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import pandas as pd
+
+from logica.columnar import TablaCompacta
+from logica.fechas import parsear_fechas
+
+RUTA_OTS = 'data/data_ots_completo.csv'
+RUTA_EMBEDDINGS = 'embeddings.npy'
+RUTA_WORK_ORDERS = 'data/work_orders_dict.csv'
+RUTA_DICCIONARIO = 'data/diccionario.csv'
+COL_FECHA_TS = 'fecha_ts'
+COL_MODELO = 'modelo'
+SIN_MODELO = "--"
+# Columnas clave (filtros y agrupaciones) que se codifican como categóricas; el resto del texto
+# libre va a bloques UTF-8
+COLUMNAS_CATEGORICAS = ('equipo', 'clavero', COL_MODELO, 'actuacion', 'clavero_actuacion')
+
+
+def modelo_de_equipo(equipo):
+    """Código de modelo de un equipo ('7066-CO_926-R1' -> 'R1'); '--' si no tiene sufijo."""
+    equipo = str(equipo)
+    return equipo[-2:] if len(equipo) >= 3 and equipo[-3] == "-" else SIN_MODELO
+
+
+def leer_ots(path):
+    """Lee un CSV de órdenes de trabajo y añade `fecha_ts` (fecha_creacion como int64 en ns)."""
+    df = pd.read_csv(path)
+    return preparar_ots(df)
+
+
+def preparar_ots(df):
+    """Añade las columnas derivadas a un DataFrame de órdenes de trabajo ya cargado."""
+    if 'fecha_creacion' in df.columns and COL_FECHA_TS not in df.columns:
+        df[COL_FECHA_TS] = parsear_fechas(df['fecha_creacion'])
+    return df
+
+
+def fechas_ts(df):
+    """Columna `fecha_ts` del DataFrame (la calcula si el DataFrame no pasó por `leer_ots`)."""
+    if COL_FECHA_TS in df.columns:
+        return df[COL_FECHA_TS].to_numpy()
+    return parsear_fechas(df['fecha_creacion'])
+
+
+def derivar_columnas(df):
+    """`df` con `fecha_ts` y `modelo` (sin modificar el DataFrame recibido)."""
+    if 'fecha_creacion' in df.columns and COL_FECHA_TS not in df.columns:
+        df = df.assign(**{COL_FECHA_TS: parsear_fechas(df['fecha_creacion'])})
+    if 'equipo' in df.columns and COL_MODELO not in df.columns:
+        df = df.assign(**{COL_MODELO: df['equipo'].map(modelo_de_equipo)})
+    return df
+
+
+def compactar_ots(df):
+    """`TablaCompacta` de un DataFrame de OTs (con `fecha_ts` y `modelo` derivados)."""
+    df = derivar_columnas(df)
+    return TablaCompacta.desde_dataframe(df, categoricas=[c for c in COLUMNAS_CATEGORICAS if c in df.columns])
+
+
+def leer_ots_compacta(path):
+    """Como `leer_ots`, pero las columnas de texto quedan codificadas (ver `logica.columnar`)."""
+    return compactar_ots(pd.read_csv(path))
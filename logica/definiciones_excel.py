@@ -0,0 +1,217 @@
+"""Libro de definiciones de claves (Excel) servido desde una caché columnar.
+
+`preprocess.ipynb` leía `data/Definiciones clave Codigo actuacion_V6.xlsx` con
+`pd.read_excel(header=2)` y lo filtraba por el prefijo del sistema (FRE). Abrir el libro es lo más
+lento de cada refresco (unos 10 s: openpyxl procesa ~11 MB de estilos) y se repetía por cada
+sistema. Aquí cada hoja de cada versión del libro se convierte una sola vez a una
+`TablaCompacta` (ver `logica.columnar`):
+
+    data/cache_excel/<huella del libro>/<hoja>-h<fila de cabecera>/tabla.json + *.npy
+
+La huella es un hash del contenido, así que una versión nueva del libro se detecta aunque conserve
+el nombre (y copiarlo o tocarlo sin cambiarlo no obliga a convertirlo otra vez). Las columnas que
+pandas lee como números o fechas se guardan como arrays tipados; el resto, como texto UTF-8
+(categórico si se repite mucho). Los diccionarios por sistema se filtran sobre la tabla en
+caché y se guardan en memoria por (versión, sistemas).
+
+Las hojas que faltan se convierten en paralelo, un proceso por hoja; con un solo proceso se leen
+todas con una única apertura del libro. Los nombres de las hojas se leen de `xl/workbook.xml` sin
+abrirlo.
+
+Uso (regenera data/diccionario.csv como hacía el cuaderno):
+
+    python -m logica.definiciones_excel --sistemas FRE
+    python -m logica.definiciones_excel --sistemas FRE PUE --salida /tmp/diccionario.csv
+"""
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+
+from logica.columnar import TablaCompacta
+from logica.datos import RUTA_DICCIONARIO
+from logica.memoria_compartida import publicar
+
+RUTA_LIBRO = os.path.join('data', 'Definiciones clave Codigo actuacion_V6.xlsx')
+DIR_CACHE = os.path.join('data', 'cache_excel')
+HOJA_DEFINICIONES = 'Claves Comentadas'
+FILA_CABECERA = 2
+# Fila de cabecera de cada hoja (las que no aparecen, la primera)
+CABECERAS = {HOJA_DEFINICIONES: FILA_CABECERA}
+COL_CLAVERO = 'Clavero'
+# Forma parte de la ruta de la caché: un cambio de formato no reutiliza conversiones anteriores
+FORMATO_CACHE = 1
+
+_NS_HOJA = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}sheet'
+_RE_NOMBRE = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def huella_libro(path):
+    """Hash corto del contenido del libro."""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(2 ** 20), b''):
+            h.update(bloque)
+    return h.hexdigest()[:16]
+
+
+def hojas_libro(path):
+    """Nombres de las hojas, en orden, leídos de xl/workbook.xml (sin cargar el libro)."""
+    with zipfile.ZipFile(path) as z:
+        raiz = ElementTree.fromstring(z.read('xl/workbook.xml'))
+    return [hoja.get('name') for hoja in raiz.iter(_NS_HOJA)]
+
+
+def _dir_hoja(hoja, cabecera):
+    return f'{_RE_NOMBRE.sub("_", hoja)}-h{cabecera}'
+
+
+def _tipar(df):
+    """Columnas de texto como str (o nulo); las numéricas y de fecha quedan como las lee pandas.
+
+    Una columna que mezcla fechas y texto (p. ej. 'Fecha') se guarda como texto, igual que
+    quedaba en el CSV del cuaderno.
+    """
+    df = df.copy()
+    for nombre in df.columns:
+        serie = df[nombre]
+        if serie.dtype == object:
+            df[nombre] = serie.map(lambda v: v if pd.isna(v) else str(v)).astype(object)
+    df.columns = [str(c) for c in df.columns]
+    return df
+
+
+def _escribir_tabla(df, destino):
+    TablaCompacta.desde_dataframe(_tipar(df)).guardar(destino)
+
+
+def convertir_hojas(path, hojas, cabeceras, directorio):
+    """Lee `hojas` con una sola apertura del libro y publica cada una en `directorio`."""
+    with pd.ExcelFile(path) as libro:
+        for hoja in hojas:
+            cabecera = cabeceras.get(hoja, 0)
+            df = libro.parse(hoja, header=cabecera)
+            publicar(_dir_hoja(hoja, cabecera), lambda destino: _escribir_tabla(df, destino), directorio)
+    return list(hojas)
+
+
+class CacheLibro:
+    """Hojas de un libro Excel convertidas a tablas compactas, por versión del libro."""
+
+    def __init__(self, path=RUTA_LIBRO, directorio=DIR_CACHE, cabeceras=None):
+        self.path = path
+        self.directorio = directorio
+        self.cabeceras = dict(CABECERAS if cabeceras is None else cabeceras)
+        self._firma = None
+        self._huella = None
+        self._tablas = {}
+        self._diccionarios = {}
+
+    def huella(self):
+        """Huella de la versión actual; sólo se vuelve a calcular si cambian el tamaño o la fecha."""
+        st = os.stat(self.path)
+        firma = (st.st_size, st.st_mtime_ns)
+        if firma != self._firma:
+            huella = huella_libro(self.path)
+            if huella != self._huella:
+                self._tablas, self._diccionarios = {}, {}
+            self._firma, self._huella = firma, huella
+        return self._huella
+
+    def dir_version(self, huella=None):
+        return os.path.join(self.directorio, f'v{FORMATO_CACHE}-{huella or self.huella()}')
+
+    def _ruta_hoja(self, hoja):
+        return os.path.join(self.dir_version(), _dir_hoja(hoja, self.cabeceras.get(hoja, 0)))
+
+    def pendientes(self, hojas=None):
+        """Hojas (todas si es None) que aún no están convertidas en la versión actual."""
+        hojas = hojas_libro(self.path) if hojas is None else list(hojas)
+        return [h for h in hojas if not os.path.isdir(self._ruta_hoja(h))]
+
+    def convertir(self, hojas=None, procesos=None):
+        """Convierte las hojas pendientes (en paralelo si hay más de una y más de un proceso)."""
+        pendientes = self.pendientes(hojas)
+        if not pendientes:
+            return []
+        procesos = min(len(pendientes), os.cpu_count() or 1) if procesos is None else min(procesos, len(pendientes))
+        directorio = self.dir_version()
+        if procesos <= 1:
+            return convertir_hojas(self.path, pendientes, self.cabeceras, directorio)
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = [pool.submit(convertir_hojas, self.path, [hoja], self.cabeceras, directorio) for hoja in pendientes]
+            return [hoja for futuro in futuros for hoja in futuro.result()]
+
+    def tabla(self, hoja=HOJA_DEFINICIONES):
+        """`TablaCompacta` de una hoja (la convierte si hace falta), abierta con mmap."""
+        self.huella()
+        if hoja not in self._tablas:
+            self.convertir([hoja])
+            self._tablas[hoja] = TablaCompacta.cargar(self._ruta_hoja(hoja))
+        return self._tablas[hoja]
+
+    def hoja(self, hoja=HOJA_DEFINICIONES):
+        """La hoja como DataFrame (como `pd.read_excel(header=...)`)."""
+        tabla = self.tabla(hoja)
+        return tabla.filas(np.arange(len(tabla)))
+
+    def diccionario(self, sistemas=('FRE',), hoja=HOJA_DEFINICIONES):
+        """Filas de la hoja cuyo clavero empieza por alguno de los `sistemas` (None = todas)."""
+        clave = (self.huella(), hoja, None if sistemas is None else tuple(sistemas))
+        if clave not in self._diccionarios:
+            tabla = self.tabla(hoja)
+            if sistemas is None:
+                posiciones = np.arange(len(tabla))
+            else:
+                claveros = pd.Series(tabla.valores(COL_CLAVERO, np.arange(len(tabla))), dtype=object)
+                posiciones = np.flatnonzero(claveros.astype(str).str.startswith(tuple(sistemas)) & claveros.notna())
+            self._diccionarios[clave] = tabla.filas(posiciones).reset_index(drop=True)
+        return self._diccionarios[clave].copy()
+
+    def versiones(self):
+        """Versiones del libro convertidas en la caché (nombres de directorio)."""
+        if not os.path.isdir(self.directorio):
+            return []
+        return sorted(d for d in os.listdir(self.directorio) if d.startswith('v') and not d.startswith('.'))
+
+    def limpiar(self):
+        """Borra las conversiones de otras versiones del libro (o de otro formato de caché)."""
+        actual = os.path.basename(self.dir_version())
+        borradas = [v for v in self.versiones() if v != actual]
+        for version in borradas:
+            shutil.rmtree(os.path.join(self.directorio, version), ignore_errors=True)
+        return borradas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--libro', default=RUTA_LIBRO)
+    parser.add_argument('--sistemas', nargs='*', default=['FRE'], help='prefijos de clavero (sin valores = todos)')
+    parser.add_argument('--salida', default=RUTA_DICCIONARIO)
+    parser.add_argument('--procesos', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    cache = CacheLibro(args.libro)
+    t0 = time.perf_counter()
+    convertidas = cache.convertir(procesos=args.procesos)
+    print(f'versión {cache.huella()}: {len(convertidas)} hojas convertidas en {time.perf_counter() - t0:.1f} s')
+    for version in cache.limpiar():
+        print(f'borrada la versión anterior {version}')
+    t0 = time.perf_counter()
+    diccionario = cache.diccionario(args.sistemas or None)
+    diccionario.to_csv(args.salida, index=False)
+    print(f'{len(diccionario)} filas en {(time.perf_counter() - t0) * 1000:.0f} ms -> {args.salida}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""Cubo de frecuencia de averías y MTBF por clavero, unidad (equipo) y modelo.
+
+Las órdenes de trabajo se agregan en celdas (clavero, equipo, mes) con su número de averías,
+guardadas como columnas numpy ordenadas por clavero con offsets tipo CSR: consultar un clavero
+es un slice. Para el MTBF se guarda por (clavero, equipo) la primera y la última fecha y el
+número de averías con fecha: la suma de los intervalos entre averías consecutivas es
+última - primera, así que el MTBF se puede actualizar sin volver a leer las OTs.
+
+`agregar(df)` incorpora OTs nuevas de forma incremental: el coste depende del tamaño del cubo,
+no del histórico de OTs.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+
+from logica.datos import fechas_ts, modelo_de_equipo
+from logica.fechas import FECHA_NULA
+
+MES_NULO = -1
+NS_DIA = 86_400 * 10**9
+
+
+def _mes_a_texto(mes):
+    return str(np.datetime64(int(mes), 'M'))
+
+
+class _Diccionario:
+    """Codificación incremental valor -> entero."""
+
+    def __init__(self, valores=()):
+        self.valores = list(valores)
+        self.ids = {v: i for i, v in enumerate(self.valores)}
+
+    def __len__(self):
+        return len(self.valores)
+
+    def codificar(self, serie):
+        for v in pd.unique(serie):
+            if v not in self.ids:
+                self.ids[v] = len(self.valores)
+                self.valores.append(v)
+        return pd.Series(serie).map(self.ids).to_numpy(dtype=np.int32)
+
+    def get(self, valor):
+        return self.ids.get(valor)
+
+
+def _agrupar(claves, **columnas):
+    """Ordena por las columnas de `claves` y devuelve (claves_unicas, inicios, columnas ordenadas)."""
+    orden = np.lexsort(tuple(reversed(claves)))
+    claves = [k[orden] for k in claves]
+    columnas = {n: v[orden] for n, v in columnas.items()}
+    if len(orden) == 0:
+        return claves, np.empty(0, dtype=np.intp), columnas
+    cambio = np.zeros(len(orden), dtype=bool)
+    cambio[0] = True
+    for k in claves:
+        cambio[1:] |= k[1:] != k[:-1]
+    inicios = np.flatnonzero(cambio)
+    return [k[inicios] for k in claves], inicios, columnas
+
+
+class CuboFallos:
+
+    def __init__(self):
+        self.claveros = _Diccionario()
+        self.equipos = _Diccionario()
+        self.modelos = _Diccionario()
+        self.modelo_equipo = np.empty(0, dtype=np.int32)
+        # celdas (clavero, equipo, mes) -> averías
+        self.c_clavero = np.empty(0, dtype=np.int32)
+        self.c_equipo = np.empty(0, dtype=np.int32)
+        self.c_mes = np.empty(0, dtype=np.int32)
+        self.c_n = np.empty(0, dtype=np.int64)
+        # pares (clavero, equipo) -> primera/última fecha y averías con fecha
+        self.p_clavero = np.empty(0, dtype=np.int32)
+        self.p_equipo = np.empty(0, dtype=np.int32)
+        self.p_primera = np.empty(0, dtype=np.int64)
+        self.p_ultima = np.empty(0, dtype=np.int64)
+        self.p_n = np.empty(0, dtype=np.int64)
+        self._reindexar()
+
+    @classmethod
+    def desde_ots(cls, df):
+        cubo = cls()
+        cubo.agregar(df)
+        return cubo
+
+    # --- Construcción incremental ---
+
+    def copiar(self):
+        """Copia sobre la que se puede llamar a `agregar` sin modificar este cubo (los arrays se comparten)."""
+        cubo = copy.copy(self)
+        cubo.claveros = _Diccionario(self.claveros.valores)
+        cubo.equipos = _Diccionario(self.equipos.valores)
+        cubo.modelos = _Diccionario(self.modelos.valores)
+        return cubo
+
+    def agregar(self, df):
+        """Incorpora un lote de órdenes de trabajo (columnas clavero, equipo y fecha)."""
+        if len(df) == 0:
+            return self
+        clavero = self.claveros.codificar(df['clavero'].fillna('').astype(str).to_numpy())
+        n_equipos = len(self.equipos)
+        equipo = self.equipos.codificar(df['equipo'].fillna('').astype(str).to_numpy())
+        if len(self.equipos) > n_equipos:
+            nuevos = self.equipos.valores[n_equipos:]
+            self.modelo_equipo = np.concatenate([
+                self.modelo_equipo,
+                self.modelos.codificar(np.array([modelo_de_equipo(e) for e in nuevos], dtype=object)),
+            ])
+
+        ts = fechas_ts(df)
+        valida = ts != FECHA_NULA
+        mes = np.full(len(ts), MES_NULO, dtype=np.int32)
+        mes[valida] = ts[valida].view('datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+
+        (self.c_clavero, self.c_equipo, self.c_mes), inicios, cols = _agrupar(
+            [np.concatenate([self.c_clavero, clavero]),
+             np.concatenate([self.c_equipo, equipo]),
+             np.concatenate([self.c_mes, mes])],
+            n=np.concatenate([self.c_n, np.ones(len(ts), dtype=np.int64)]),
+        )
+        self.c_n = np.add.reduceat(cols['n'], inicios) if len(inicios) else cols['n']
+
+        ts_validas = ts[valida]
+        (self.p_clavero, self.p_equipo), inicios, cols = _agrupar(
+            [np.concatenate([self.p_clavero, clavero[valida]]),
+             np.concatenate([self.p_equipo, equipo[valida]])],
+            primera=np.concatenate([self.p_primera, ts_validas]),
+            ultima=np.concatenate([self.p_ultima, ts_validas]),
+            n=np.concatenate([self.p_n, np.ones(len(ts_validas), dtype=np.int64)]),
+        )
+        if len(inicios):
+            self.p_primera = np.minimum.reduceat(cols['primera'], inicios)
+            self.p_ultima = np.maximum.reduceat(cols['ultima'], inicios)
+            self.p_n = np.add.reduceat(cols['n'], inicios)
+
+        self._reindexar()
+        return self
+
+    def _reindexar(self):
+        rango = np.arange(len(self.claveros) + 1)
+        self._off_celdas = np.searchsorted(self.c_clavero, rango)
+        self._off_pares = np.searchsorted(self.p_clavero, rango)
+        # averías por (modelo, clavero), para la lista de claveros de un modelo
+        self._por_modelo = np.zeros((len(self.modelos), len(self.claveros)), dtype=np.int64)
+        if len(self.c_n):
+            np.add.at(self._por_modelo, (self.modelo_equipo[self.c_equipo], self.c_clavero), self.c_n)
+
+    # --- Consultas ---
+
+    def conteo_claveros(self, modelo=None):
+        """{clavero: averías} de un modelo (equivale a `give_claveros`); todos si modelo es None."""
+        if modelo is None:
+            fila = self._por_modelo.sum(axis=0)
+        else:
+            im = self.modelos.get(modelo)
+            if im is None:
+                return {}
+            fila = self._por_modelo[im]
+        return {self.claveros.valores[i]: int(fila[i]) for i in np.flatnonzero(fila)}
+
+    def _filtro(self, equipos, modelo=None, equipo=None):
+        if equipo is not None:
+            ie = self.equipos.get(equipo)
+            return equipos == (-1 if ie is None else ie)
+        if modelo is not None:
+            im = self.modelos.get(modelo)
+            return self.modelo_equipo[equipos] == (-1 if im is None else im)
+        return np.ones(len(equipos), dtype=bool)
+
+    def serie_mensual(self, clavero, modelo=None, equipo=None):
+        """Averías por mes (meses sin averías incluidos) como DataFrame [mes, averias]."""
+        ic = self.claveros.get(clavero)
+        if ic is None:
+            return pd.DataFrame({'mes': [], 'averias': []})
+        ini, fin = self._off_celdas[ic], self._off_celdas[ic + 1]
+        mascara = self._filtro(self.c_equipo[ini:fin], modelo, equipo) & (self.c_mes[ini:fin] != MES_NULO)
+        meses, n = self.c_mes[ini:fin][mascara], self.c_n[ini:fin][mascara]
+        if len(meses) == 0:
+            return pd.DataFrame({'mes': [], 'averias': []})
+        base = meses.min()
+        conteo = np.bincount(meses - base, weights=n).astype(np.int64)
+        return pd.DataFrame({
+            'mes': [_mes_a_texto(base + i) for i in range(len(conteo))],
+            'averias': conteo,
+        })
+
+    def total(self, clavero, modelo=None, equipo=None):
+        ic = self.claveros.get(clavero)
+        if ic is None:
+            return 0
+        ini, fin = self._off_celdas[ic], self._off_celdas[ic + 1]
+        return int(self.c_n[ini:fin][self._filtro(self.c_equipo[ini:fin], modelo, equipo)].sum())
+
+    def mtbf_dias(self, clavero, modelo=None, equipo=None):
+        """Tiempo medio entre averías en días (agregado sobre las unidades); None si no hay datos."""
+        ic = self.claveros.get(clavero)
+        if ic is None:
+            return None
+        ini, fin = self._off_pares[ic], self._off_pares[ic + 1]
+        mascara = self._filtro(self.p_equipo[ini:fin], modelo, equipo)
+        intervalos = (self.p_n[ini:fin][mascara] - 1).sum()
+        if intervalos <= 0:
+            return None
+        tiempo = (self.p_ultima[ini:fin][mascara] - self.p_primera[ini:fin][mascara]).sum()
+        return tiempo / intervalos / NS_DIA
+
+    def tabla_unidades(self, clavero, modelo=None):
+        """Por unidad: averías con fecha, primera y última avería y MTBF en días."""
+        ic = self.claveros.get(clavero)
+        columnas = ['equipo', 'averias', 'primera', 'ultima', 'mtbf_dias']
+        if ic is None:
+            return pd.DataFrame(columns=columnas)
+        ini, fin = self._off_pares[ic], self._off_pares[ic + 1]
+        mascara = self._filtro(self.p_equipo[ini:fin], modelo)
+        n = self.p_n[ini:fin][mascara]
+        primera = self.p_primera[ini:fin][mascara]
+        ultima = self.p_ultima[ini:fin][mascara]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mtbf = np.where(n > 1, (ultima - primera) / np.maximum(n - 1, 1) / NS_DIA, np.nan)
+        return pd.DataFrame({
+            'equipo': [self.equipos.valores[i] for i in self.p_equipo[ini:fin][mascara]],
+            'averias': n,
+            'primera': primera.view('datetime64[ns]'),
+            'ultima': ultima.view('datetime64[ns]'),
+            'mtbf_dias': mtbf,
+        }, columns=columnas).sort_values('averias', ascending=False, ignore_index=True)
+
+    # --- Persistencia ---
+
+    def guardar(self, path):
+        np.savez_compressed(
+            path,
+            claveros=np.array(self.claveros.valores, dtype=str),
+            equipos=np.array(self.equipos.valores, dtype=str),
+            modelos=np.array(self.modelos.valores, dtype=str),
+            modelo_equipo=self.modelo_equipo,
+            c_clavero=self.c_clavero, c_equipo=self.c_equipo, c_mes=self.c_mes, c_n=self.c_n,
+            p_clavero=self.p_clavero, p_equipo=self.p_equipo,
+            p_primera=self.p_primera, p_ultima=self.p_ultima, p_n=self.p_n,
+        )
+
+    @classmethod
+    def cargar(cls, path):
+        cubo = cls()
+        with np.load(path) as f:
+            cubo.claveros = _Diccionario(f['claveros'].tolist())
+            cubo.equipos = _Diccionario(f['equipos'].tolist())
+            cubo.modelos = _Diccionario(f['modelos'].tolist())
+            for nombre in ('modelo_equipo', 'c_clavero', 'c_equipo', 'c_mes', 'c_n',
+                           'p_clavero', 'p_equipo', 'p_primera', 'p_ultima', 'p_n'):
+                setattr(cubo, nombre, f[nombre])
+        cubo._reindexar()
+        return cubo
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+FORMATO_FECHA = '%m/%d/%Y %H:%M'
+# Las fechas que no se pueden interpretar se guardan con este valor (quedan las primeras al ordenar)
+FECHA_NULA = np.iinfo(np.int64).min
+
+
+def parsear_fechas(serie):
+    """Convierte textos como '4/26/2022 18:24' en int64 (nanosegundos desde 1970)."""
+    fechas = pd.to_datetime(serie, format=FORMATO_FECHA, errors='coerce')
+    return fechas.to_numpy(dtype='datetime64[ns]').view(np.int64).copy()
+
+
+def normalizar_fechas(serie):
+    """Fechas como texto en el formato de los CSV ('4/26/2022 18:24'); None si no se pueden interpretar.
+
+    Además de FORMATO_FECHA acepta fechas ISO ('2022-04-26T18:24:00', como llegan en un JSONL);
+    si traen zona horaria se queda la hora local que indican.
+    """
+    serie = pd.Series(serie, dtype=object).reset_index(drop=True)
+    fechas = pd.to_datetime(serie, format=FORMATO_FECHA, errors='coerce')
+    salida = serie.where(fechas.notna(), None).map(lambda v: v if v is None else str(v).strip())
+    for i in np.flatnonzero(fechas.isna().to_numpy() & serie.notna().to_numpy()):
+        try:
+            fecha = pd.Timestamp(str(serie[i]).strip())
+        except ValueError:
+            continue
+        if fecha is pd.NaT:
+            continue
+        salida[i] = f'{fecha.month}/{fecha.day}/{fecha.year} {fecha.hour}:{fecha.minute:02d}'
+    return salida
+
+
+def a_timestamp(valor):
+    """int64 en nanosegundos para un str/date/datetime/Timestamp (None se devuelve tal cual)."""
+    if valor is None:
+        return None
+    if isinstance(valor, (int, np.integer)):
+        return int(valor)
+    return pd.Timestamp(valor).value
+
+
+class IndiceTemporal:
+    """Índice ordenado por fecha sobre las filas de un DataFrame.
+
+    No reordena las filas (los embeddings siguen alineados con el CSV); guarda la permutación que
+    las ordena por fecha y resuelve rangos con búsqueda binaria.
+    """
+
+    def __init__(self, ts, orden=None):
+        self.ts = np.asarray(ts, dtype=np.int64)
+        self.orden = np.argsort(self.ts, kind='stable') if orden is None else orden
+        self.ordenados = self.ts[self.orden]
+        # posición de cada fila dentro del orden temporal
+        self.rango_fila = np.empty_like(self.orden)
+        self.rango_fila[self.orden] = np.arange(len(self.orden))
+        self._primera_valida = int(np.searchsorted(self.ordenados, FECHA_NULA, side='right'))
+
+    def agregar(self, ts):
+        """Índice nuevo con las filas `ts` añadidas al final.
+
+        Sólo se ordenan las fechas nuevas; se intercalan en el orden existente con una búsqueda
+        binaria, sin volver a ordenar todo.
+        """
+        ts = np.asarray(ts, dtype=np.int64)
+        orden_nuevas = np.argsort(ts, kind='stable')
+        # side='right': a igual fecha, las filas nuevas quedan detrás (como con argsort estable)
+        donde = np.searchsorted(self.ordenados, ts[orden_nuevas], side='right')
+        orden = np.insert(self.orden, donde, orden_nuevas + len(self.ts))
+        return IndiceTemporal(np.concatenate([self.ts, ts]), orden)
+
+    def __len__(self):
+        return len(self.ts)
+
+    def extremos(self):
+        """(fecha mínima, fecha máxima) como pd.Timestamp, o (None, None) si no hay fechas válidas."""
+        if self._primera_valida >= len(self.ordenados):
+            return None, None
+        return pd.Timestamp(self.ordenados[self._primera_valida]), pd.Timestamp(self.ordenados[-1])
+
+    def _limites(self, desde=None, hasta=None):
+        desde, hasta = a_timestamp(desde), a_timestamp(hasta)
+        ini = self._primera_valida if desde is None else max(self._primera_valida, int(np.searchsorted(self.ordenados, desde, side='left')))
+        fin = len(self.ordenados) if hasta is None else int(np.searchsorted(self.ordenados, hasta, side='left'))
+        return ini, max(ini, fin)
+
+    def rango(self, desde=None, hasta=None):
+        """Filas con fecha en [desde, hasta), en orden cronológico."""
+        ini, fin = self._limites(desde, hasta)
+        return self.orden[ini:fin]
+
+    def contar(self, desde=None, hasta=None):
+        ini, fin = self._limites(desde, hasta)
+        return fin - ini
+
+    def mascara(self, desde=None, hasta=None):
+        """Máscara booleana (por fila) del rango [desde, hasta)."""
+        if desde is None and hasta is None:
+            return np.ones(len(self.ts), dtype=bool)
+        mascara = np.zeros(len(self.ts), dtype=bool)
+        mascara[self.rango(desde, hasta)] = True
+        return mascara
+
+    def ordenar(self, posiciones, descendente=False):
+        """Ordena un subconjunto de filas por fecha sin volver a comparar fechas."""
+        posiciones = np.asarray(posiciones)
+        orden = np.argsort(self.rango_fila[posiciones], kind='stable')
+        if descendente:
+            orden = orden[::-1]
+        return posiciones[orden]
+
+    def recientes(self, n, mascara=None):
+        """Las n filas más recientes (de más nueva a más antigua), opcionalmente sólo las de `mascara`.
+
+        Con máscara recorre el orden temporal desde el final en bloques crecientes, así que para
+        n pequeño sólo toca una fracción del índice.
+        """
+        if n <= 0:
+            return np.empty(0, dtype=self.orden.dtype)
+        if mascara is None:
+            return self.orden[::-1][:n]
+        partes, encontrados = [], 0
+        fin, bloque = len(self.orden), max(4 * n, 1024)
+        while fin > 0 and encontrados < n:
+            ini = max(0, fin - bloque)
+            candidatos = self.orden[ini:fin][::-1]
+            elegidos = candidatos[mascara[candidatos]]
+            partes.append(elegidos)
+            encontrados += len(elegidos)
+            fin, bloque = ini, bloque * 2
+        return np.concatenate(partes)[:n]
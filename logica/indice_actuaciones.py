@@ -0,0 +1,193 @@
+"""Índice semántico de las definiciones de actuación del diccionario de claves.
+
+Hasta ahora la única forma de llegar de una descripción a una actuación era a través del
+`clavero_actuacion` de los vecinos. Aquí las definiciones (DEFINICION, o DEFINITION si está
+vacía) se codifican una sola vez y se guardan en `data/indice_actuaciones.npz` junto a la huella
+del diccionario y el nombre del modelo; si el diccionario cambia el índice se vuelve a construir.
+
+Las filas están ordenadas por clavero, así que las actuaciones de un clavero y de sus
+descendientes en la jerarquía (FRE01 -> FRE0101, FRE0102...) forman un rango contiguo que se
+obtiene con una búsqueda binaria. Ordenar las actuaciones candidatas para una consulta es un único
+producto (filas del rango x dimensión) por el vector de la consulta, sin filtrar el diccionario.
+
+Para regenerarlo:
+
+    python -m logica.indice_actuaciones
+"""
+import argparse
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from logica.datos import RUTA_DICCIONARIO
+from logica.ingesta import MODELO_EMBEDDINGS, cargar_modelo, codificar
+
+RUTA_INDICE = os.path.join('data', 'indice_actuaciones.npz')
+COL_CLAVERO = 'Clavero'
+COL_CODIGO = 'Código tarea std'
+COL_CODIGO_EN = 'Std Tasks Codes'
+COLUMNAS_DEFINICION = ('DEFINICION', 'DEFINITION')
+# Mayor que cualquier carácter de un clavero: [prefijo, prefijo + FIN) son sus descendientes
+_FIN = '\uffff'
+
+
+def huella_diccionario(path, modelo=MODELO_EMBEDDINGS):
+    """Hash del contenido del diccionario y del modelo (no de la fecha: el CSV se copia entre máquinas)."""
+    h = hashlib.sha1(modelo.encode('utf-8'))
+    with open(path, 'rb') as f:
+        h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def _limpio(serie):
+    return serie.astype(object).where(serie.notna(), '').astype(str).str.strip()
+
+
+def textos_definicion(diccionario):
+    """DEFINICION de cada fila o, si está vacía, DEFINITION ('' si no tiene ninguna)."""
+    texto = pd.Series('', index=diccionario.index)
+    for col in reversed(COLUMNAS_DEFINICION):
+        if col in diccionario.columns:
+            valor = _limpio(diccionario[col])
+            texto = valor.where(valor != '', texto)
+    return texto
+
+
+def definiciones_por_codigo(diccionario):
+    """{código de tarea: definición} con la misma prioridad que la búsqueda fila a fila.
+
+    Primero cuenta 'Código tarea std' y después 'Std Tasks Codes' (la primera fila de cada
+    código); la definición es DEFINICION si existe la columna y si no DEFINITION. Las
+    definiciones vacías quedan como None.
+    """
+    col_def = next((c for c in COLUMNAS_DEFINICION if c in diccionario.columns), None)
+    if col_def is None:
+        posibles = [c for c in diccionario.columns if 'defin' in c.lower() or 'descripcion' in c.lower()]
+        col_def = posibles[0] if posibles else None
+    if col_def is None:
+        definicion = pd.Series(None, index=diccionario.index, dtype=object)
+    else:
+        valor = diccionario[col_def]
+        definicion = valor.where(valor.notna() & (_limpio(valor) != ''), None)
+    resultado = {}
+    for col in (COL_CODIGO_EN, COL_CODIGO):
+        if col in diccionario.columns:
+            codigos = _limpio(diccionario[col])
+            primeras = ~codigos.duplicated()
+            resultado.update(zip(codigos[primeras], definicion[primeras]))
+    return resultado
+
+
+class IndiceActuaciones:
+    """Actuaciones con definición, ordenadas por clavero, y sus embeddings normalizados."""
+
+    def __init__(self, claveros, codigos, definiciones, embeddings, huella=None):
+        self.claveros = np.asarray(claveros, dtype=str)
+        self.codigos = np.asarray(codigos, dtype=str)
+        self.definiciones = np.asarray(definiciones, dtype=str)
+        # None en un índice construido sin modelo: lista actuaciones pero no las ordena
+        self.embeddings = None if embeddings is None else np.asarray(embeddings, dtype=np.float32)
+        self.huella = huella
+
+    def __len__(self):
+        return len(self.claveros)
+
+    @classmethod
+    def construir(cls, diccionario, codificar_textos=None, huella=None):
+        """Índice de las filas con definición; `codificar_textos(lista)` devuelve la matriz de embeddings.
+
+        Sin `codificar_textos` no se codifica nada (ni hace falta el modelo): el índice sirve para
+        `actuaciones` pero no para `rankear`.
+        """
+        textos = textos_definicion(diccionario)
+        df = pd.DataFrame({
+            'clavero': _limpio(diccionario[COL_CLAVERO]),
+            'codigo': _limpio(diccionario[COL_CODIGO]),
+            'definicion': textos,
+        })[(textos != '').to_numpy()]
+        df = df.sort_values('clavero', kind='stable')
+        if codificar_textos is None:
+            embeddings = None
+        elif len(df):
+            embeddings = codificar_textos(df['definicion'].tolist())
+        else:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        return cls(df['clavero'], df['codigo'], df['definicion'], embeddings, huella)
+
+    @classmethod
+    def cargar(cls, path=RUTA_INDICE):
+        with np.load(path) as datos:
+            return cls(datos['claveros'], datos['codigos'], datos['definiciones'], datos['embeddings'], str(datos['huella']))
+
+    def guardar(self, path=RUTA_INDICE):
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, claveros=self.claveros, codigos=self.codigos, definiciones=self.definiciones,
+                 embeddings=self.embeddings, huella=np.array(self.huella or ''))
+        os.replace(tmp, path)
+
+    def rango(self, clavero=None, descendientes=True):
+        """(inicio, fin) de las filas de `clavero` (y de sus descendientes); todas si es None."""
+        if not clavero:
+            return 0, len(self)
+        clavero = str(clavero).strip()
+        inicio = np.searchsorted(self.claveros, clavero, side='left')
+        if descendientes:
+            fin = np.searchsorted(self.claveros, clavero + _FIN, side='left')
+        else:
+            fin = np.searchsorted(self.claveros, clavero, side='right')
+        return int(inicio), int(fin)
+
+    def actuaciones(self, clavero=None, descendientes=False):
+        """DataFrame (clavero, codigo, definicion) de las filas de `clavero`, en el orden del diccionario."""
+        inicio, fin = self.rango(clavero, descendientes)
+        return pd.DataFrame({'clavero': self.claveros[inicio:fin], 'codigo': self.codigos[inicio:fin],
+                             'definicion': self.definiciones[inicio:fin]})
+
+    def rankear(self, query_vec, clavero=None, top=None, descendientes=True):
+        """Las actuaciones de `clavero` (todas si es None) ordenadas por similaridad con `query_vec`."""
+        if self.embeddings is None:
+            raise ValueError('índice sin embeddings: hay que construirlo con codificar_textos para ordenar')
+        inicio, fin = self.rango(clavero, descendientes)
+        df = self.actuaciones(clavero, descendientes)
+        if fin == inicio:
+            return df.assign(similaridad=np.zeros(0, dtype=np.float32))
+        scores = self.embeddings[inicio:fin] @ np.asarray(query_vec, dtype=np.float32).ravel()
+        orden = np.argsort(-scores, kind='stable')
+        if top is not None:
+            orden = orden[:top]
+        return df.iloc[orden].assign(similaridad=scores[orden]).reset_index(drop=True)
+
+
+def cargar_o_construir(path_diccionario=RUTA_DICCIONARIO, path=RUTA_INDICE, codificar_textos=None):
+    """Índice guardado si corresponde al diccionario actual; si no, lo construye y lo guarda.
+
+    `codificar_textos` sólo se usa al construir; si es None se carga el modelo de embeddings.
+    """
+    huella = huella_diccionario(path_diccionario)
+    if os.path.exists(path):
+        indice = IndiceActuaciones.cargar(path)
+        if indice.huella == huella:
+            return indice
+    if codificar_textos is None:
+        modelo = cargar_modelo()
+        codificar_textos = lambda textos: codificar(textos, modelo)
+    indice = IndiceActuaciones.construir(pd.read_csv(path_diccionario), codificar_textos, huella)
+    indice.guardar(path)
+    return indice
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--diccionario', default=RUTA_DICCIONARIO)
+    parser.add_argument('--salida', default=RUTA_INDICE)
+    args = parser.parse_args(argv)
+    indice = cargar_o_construir(args.diccionario, args.salida)
+    print(f'{len(indice)} actuaciones con definición ({indice.embeddings.nbytes / 1024:.0f} KB) -> {args.salida}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
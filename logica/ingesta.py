@@ -0,0 +1,429 @@
+"""Ingesta de órdenes de trabajo nuevas en un registro de sólo añadir.
+
+Hasta ahora una OT nueva sólo llegaba a la aplicación re-ejecutando `preprocess.ipynb`,
+`limpieza html.py` y `embeddings.py` y reconstruyéndolo todo. `ingerir` prepara sólo las filas
+nuevas (unión con el diccionario, `clavero_actuacion`, limpieza del HTML de los comentarios y
+embedding de `descripcion_ot`) y las escribe como un segmento del registro:
+
+    data/ingesta/registro.json
+    data/ingesta/000001/ots.csv
+    data/ingesta/000001/embeddings.npy
+    data/ingesta/000001/embeddings_campos.npy   (si existe el almacén de `logica.multicampo`)
+
+Los procesos de la aplicación vigilan `registro.json` (ver `logica.snapshots`) y aplican sólo los
+segmentos que no tienen: el router de búsqueda los añade a sus shards delta y `logica.modelo` a la
+tabla compacta, al índice temporal y al cubo de averías. De vez en cuando (más de MAX_SEGMENTOS
+segmentos o MAX_FILAS filas, o con --compactar) la compactación añade los segmentos a los CSV base
+y a `embeddings.npy`, vuelve a generar los shards si los hay y vacía el registro.
+
+El registro guarda cuántas filas tenía cada fichero base al empezar: si un proceso carga una base
+que ya incluye los segmentos (compactada), no los vuelve a aplicar.
+
+Uso (un único proceso escribe en el registro):
+
+    python -m logica.ingesta nuevas.csv
+    python -m logica.ingesta --jsonl nuevas.jsonl --lote 100
+    tail -f ots.jsonl | python -m logica.ingesta --jsonl - --espera 10
+    python -m logica.ingesta --compactar
+"""
+import argparse
+import json
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from logica.datos import RUTA_DICCIONARIO, RUTA_EMBEDDINGS, RUTA_OTS, RUTA_WORK_ORDERS, leer_ots
+from logica.fechas import normalizar_fechas
+from logica.instrumentacion import contar, medir
+from logica.limpieza import limpiar_comentario
+from logica.multicampo import RUTA_EMBEDDINGS_CAMPOS, codificar_campos, vectores_campo
+from logica.shards import DIR_SHARDS, MANIFIESTO, RouterShards, particionar
+
+DIR_INGESTA = os.path.join('data', 'ingesta')
+FICHERO_REGISTRO = 'registro.json'
+FICHERO_EMBEDDINGS = 'embeddings.npy'
+FICHERO_EMBEDDINGS_CAMPOS = 'embeddings_campos.npy'
+MODELO_EMBEDDINGS = 'paraphrase-multilingual-MiniLM-L12-v2'
+COL_TEXTO = 'descripcion_ot'
+COL_CODIGO_TAREA = 'Código tarea std'
+COL_COMENTARIOS_LIMPIOS = 'comentarios_limpios'
+# Columnas del diccionario que se añaden a cada OT (como en `preprocess.ipynb`)
+COLUMNAS_DICCIONARIO = ['Descripción componente', 'DEFINICION']
+COLUMNAS_ENTRADA = ['codigo_ot', 'equipo', 'clavero', 'actuacion', 'fecha_creacion', 'descripcion_ot',
+                    'descripcion_averia', 'descripcion_reparacion', 'comentarios']
+# Ficheros base a los que se añaden los segmentos al compactar
+BASES = {'ots': RUTA_OTS, 'work_orders': RUTA_WORK_ORDERS}
+RUTA_WORK_ORDERS_LIMPIO = os.path.join('data', 'work_orders_dict_limpio_sin_html.csv')
+MAX_SEGMENTOS = 100
+MAX_FILAS = 100_000
+LOTE_JSONL = 100
+# Filas rechazadas que se detallan en el mensaje de error
+MAX_RECHAZOS_MENSAJE = 5
+
+
+# --- Preparación de las filas nuevas ---
+
+def unir_diccionario(df, diccionario):
+    """Añade 'Código tarea std' y las columnas del diccionario de claves.
+
+    Con actuación se busca por código de tarea (clavero + actuación); sin actuación, por clavero
+    sólo si ese clavero aparece una única vez en el diccionario.
+    """
+    clavero = df['clavero'].fillna('').astype(str).str.strip()
+    # Sin comillas sólo para buscar el código de tarea: la columna 'actuacion' queda como llega
+    actuacion = df['actuacion'].fillna('').astype(str).str.replace('"', '', regex=False).str.strip()
+    con_actuacion = (actuacion != '').to_numpy()
+    out = df.assign(**{COL_CODIGO_TAREA: clavero + actuacion})
+
+    por_codigo = diccionario.drop_duplicates(COL_CODIGO_TAREA, keep='last').set_index(COL_CODIGO_TAREA)
+    claveros = diccionario['Clavero'].astype(str).str.strip()
+    unicos = diccionario[~claveros.duplicated(keep=False).to_numpy()]
+    por_clavero = unicos.set_index(unicos['Clavero'].astype(str).str.strip())
+    for col in COLUMNAS_DICCIONARIO:
+        valores = out[COL_CODIGO_TAREA].map(por_codigo[col]).where(con_actuacion)
+        out[col] = valores.where(con_actuacion, clavero.map(por_clavero[col]))
+    return out
+
+
+def validar_lote(df):
+    """`df` con codigo_ot entero y fecha_creacion en el formato de los CSV base.
+
+    Las filas que no se pueden convertir harían fallar (o corromperían) la tabla de cada proceso
+    de la aplicación al aplicar el segmento, así que se rechaza el lote entero con un ValueError
+    que indica qué filas (posición en el lote) y por qué.
+    """
+    codigo = pd.to_numeric(df['codigo_ot'], errors='coerce')
+    codigo_valido = codigo.notna() & (codigo == np.floor(codigo))
+    fecha = normalizar_fechas(df['fecha_creacion'])
+    fecha.index = df.index
+    rechazos = []
+    for i in np.flatnonzero(~(codigo_valido & fecha.notna()).to_numpy()):
+        motivos = []
+        if not codigo_valido.iloc[i]:
+            motivos.append(f'codigo_ot {df["codigo_ot"].iloc[i]!r} no es un número entero')
+        if fecha.iloc[i] is None:
+            motivos.append(f'fecha_creacion {df["fecha_creacion"].iloc[i]!r} no es una fecha')
+        rechazos.append(f'fila {i}: ' + ', '.join(motivos))
+    if rechazos:
+        detalle = '; '.join(rechazos[:MAX_RECHAZOS_MENSAJE]) + ('; ...' if len(rechazos) > MAX_RECHAZOS_MENSAJE else '')
+        raise ValueError(f'{len(rechazos)} de {len(df)} filas no válidas, no se escribe el segmento: {detalle}')
+    return df.assign(codigo_ot=codigo.astype(np.int64), fecha_creacion=fecha)
+
+
+def actuacion_work_orders(serie):
+    """'actuacion' como en work_orders_dict.csv: sin espacios y nula si está vacía o es '""'."""
+    actuacion = serie.astype(object).where(serie.isna(), serie.astype(str).str.strip())
+    return actuacion.where(~actuacion.isin(['', '""']))
+
+
+def preparar_lote(df, diccionario):
+    """Filas nuevas listas para el registro: columnas de entrada, diccionario, clavero_actuacion y comentarios limpios."""
+    df = validar_lote(df.reindex(columns=COLUMNAS_ENTRADA).reset_index(drop=True))
+    df = unir_diccionario(df, diccionario)
+    # Como el cuaderno: sobre la actuación original ('""' da FRE0703""; sólo la vacía da 'no')
+    clavero = df['clavero'].fillna('').astype(str).str.strip()
+    actuacion = df['actuacion'].fillna('').astype(str).str.strip().replace('', 'no')
+    df['clavero_actuacion'] = clavero + actuacion
+    # Los CSV base guardan el comentario original (la aplicación lo limpia al mostrarlo); el
+    # limpio va a work_orders_dict_limpio_sin_html.csv, como hacía `limpieza html.py`
+    df[COL_COMENTARIOS_LIMPIOS] = df['comentarios'].map(limpiar_comentario)
+    return df
+
+
+def cargar_modelo():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODELO_EMBEDDINGS)
+
+
+def codificar(textos, modelo):
+    """Embeddings normalizados (float32) de `textos`; los nulos se codifican como texto vacío."""
+    textos = pd.Series(textos, dtype=object).fillna('').astype(str).tolist()
+    return np.asarray(modelo.encode(textos, normalize_embeddings=True), dtype=np.float32)
+
+
+# --- Registro ---
+
+def _contar_filas(ruta):
+    return len(pd.read_csv(ruta, usecols=[0])) if os.path.exists(ruta) else 0
+
+
+def _escribir_json(ruta, datos):
+    tmp = ruta + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, ruta)
+
+
+class RegistroIngesta:
+    """Segmentos de OTs ingeridas desde la última compactación.
+
+    `registro.json` tiene la generación (sube con cada compactación), las filas de cada fichero
+    base al empezar la generación y la lista de segmentos; cada segmento guarda `inicio`, la
+    etiqueta de su primera fila (filas base + filas de los segmentos anteriores).
+    """
+
+    def __init__(self, directorio=DIR_INGESTA, bases=None):
+        self.directorio = directorio
+        self.bases = dict(BASES if bases is None else bases)
+        self.ruta = os.path.join(directorio, FICHERO_REGISTRO)
+
+    def estado(self):
+        if not os.path.exists(self.ruta):
+            return {'generacion': 0, 'filas_base': None, 'segmentos': []}
+        with open(self.ruta, encoding='utf-8') as f:
+            return json.load(f)
+
+    def segmentos(self):
+        return self.estado()['segmentos']
+
+    def filas(self):
+        return sum(s['filas'] for s in self.segmentos())
+
+    def necesita_compactar(self, max_segmentos=MAX_SEGMENTOS, max_filas=MAX_FILAS):
+        segmentos = self.segmentos()
+        return len(segmentos) > max_segmentos or sum(s['filas'] for s in segmentos) > max_filas
+
+    def agregar(self, df, embeddings, embeddings_campos=None):
+        """Escribe un segmento (de forma atómica) y lo añade al registro; devuelve su entrada."""
+        if len(df) != embeddings.shape[0]:
+            raise ValueError(f'{len(df)} filas y {embeddings.shape[0]} embeddings: no están alineados')
+        os.makedirs(self.directorio, exist_ok=True)
+        estado = self.estado()
+        if estado['filas_base'] is None:
+            estado['filas_base'] = {nombre: _contar_filas(ruta) for nombre, ruta in self.bases.items()}
+        segmentos = estado['segmentos']
+        numero = segmentos[-1]['numero'] + 1 if segmentos else 1
+        entrada = {
+            'numero': numero,
+            'nombre': f'{numero:06d}',
+            'filas': int(len(df)),
+            'inicio': estado['filas_base']['ots'] + sum(s['filas'] for s in segmentos),
+            'creado': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        tmp = tempfile.mkdtemp(prefix='.segmento-', dir=self.directorio)
+        df.to_csv(os.path.join(tmp, 'ots.csv'), index=False)
+        np.save(os.path.join(tmp, FICHERO_EMBEDDINGS), np.asarray(embeddings, dtype=np.float32))
+        if embeddings_campos is not None:
+            np.save(os.path.join(tmp, FICHERO_EMBEDDINGS_CAMPOS), np.asarray(embeddings_campos, dtype=np.float32))
+        os.rename(tmp, os.path.join(self.directorio, entrada['nombre']))
+        # El registro se escribe el último: un lector sólo ve segmentos completos
+        segmentos.append(entrada)
+        _escribir_json(self.ruta, estado)
+        return entrada
+
+    def leer(self, entrada, fichero=FICHERO_EMBEDDINGS):
+        """(df, embeddings) de un segmento; el índice de df son las etiquetas de sus filas."""
+        directorio = os.path.join(self.directorio, entrada['nombre'])
+        df = leer_ots(os.path.join(directorio, 'ots.csv'))
+        df.index = pd.RangeIndex(entrada['inicio'], entrada['inicio'] + len(df))
+        return df, np.load(os.path.join(directorio, fichero))
+
+    def fichero_embeddings(self, entrada, dimension=None):
+        """Fichero de embeddings del segmento con `dimension` columnas (un solo campo si es None)."""
+        if dimension is None:
+            return FICHERO_EMBEDDINGS
+        ruta = os.path.join(self.directorio, entrada['nombre'], FICHERO_EMBEDDINGS)
+        return FICHERO_EMBEDDINGS if np.load(ruta, mmap_mode='r').shape[1] == dimension else FICHERO_EMBEDDINGS_CAMPOS
+
+    def pendientes(self, posicion, base, filas_base, dimension=None):
+        """Segmentos que le faltan a un snapshot: (df, embeddings, posición nueva), o None.
+
+        `posicion` es la (generación, segmentos aplicados) del snapshot (None si no tiene ninguno)
+        y `filas_base` las filas del fichero `base` que cargó. None significa que el registro se
+        compactó después y hay que reconstruir; si `filas_base` no coincide con las del registro,
+        la base ya los incluye y no se aplica ninguno. Con `dimension` se leen los embeddings
+        de esa dimensión (los apilados por campo si el snapshot usa `logica.multicampo`).
+        """
+        estado = self.estado()
+        generacion, segmentos = estado['generacion'], estado['segmentos']
+        if posicion is not None and posicion[0] != generacion:
+            return None
+        aplicados = 0 if posicion is None else posicion[1]
+        if estado['filas_base'] is None or estado['filas_base'].get(base) != filas_base:
+            nuevos = []
+        else:
+            nuevos = segmentos[aplicados:]
+        if not nuevos:
+            return pd.DataFrame(columns=COLUMNAS_ENTRADA), np.empty((0, 0), dtype=np.float32), (generacion, len(segmentos))
+        partes = [self.leer(s, self.fichero_embeddings(s, dimension)) for s in nuevos]
+        df = pd.concat([p[0] for p in partes])
+        return df, np.concatenate([p[1] for p in partes]), (generacion, len(segmentos))
+
+    def vaciar(self, filas_base):
+        """Empieza una generación nueva sin segmentos (tras compactar) y borra los segmentos."""
+        estado = self.estado()
+        _escribir_json(self.ruta, {'generacion': estado['generacion'] + 1, 'filas_base': filas_base, 'segmentos': []})
+        for entrada in estado['segmentos']:
+            shutil.rmtree(os.path.join(self.directorio, entrada['nombre']), ignore_errors=True)
+
+
+# --- Ingesta y compactación ---
+
+def ingerir(df, modelo, diccionario, registro=None, campos=None):
+    """Prepara y codifica sólo las filas de `df` y las añade al registro como un segmento.
+
+    Con `campos` (por defecto, si existe el almacén de `logica.multicampo`) se codifican también
+    la avería y la reparación; los embeddings de descripcion_ot salen de los mismos textos.
+    """
+    registro = registro or RegistroIngesta()
+    campos = os.path.exists(RUTA_EMBEDDINGS_CAMPOS) if campos is None else campos
+    with medir('ingesta.preparar'):
+        lote = preparar_lote(df, diccionario)
+    with medir('ingesta.codificar'):
+        if campos:
+            embeddings_campos = codificar_campos(lote, lambda textos: codificar(textos, modelo))[0]
+            embeddings = vectores_campo(embeddings_campos, COL_TEXTO)
+        else:
+            embeddings_campos, embeddings = None, codificar(lote[COL_TEXTO], modelo)
+    with medir('ingesta.escribir'):
+        entrada = registro.agregar(lote, embeddings, embeddings_campos)
+    contar('ingesta.filas', len(lote))
+    return entrada
+
+
+def _con_filas(ruta, lote):
+    """Copia de un CSV base con las filas de `lote` al final (sólo sus columnas); devuelve la ruta temporal."""
+    columnas = pd.read_csv(ruta, nrows=0).columns
+    tmp = ruta + '.compactando'
+    shutil.copyfile(ruta, tmp)
+    lote.reindex(columns=columnas).to_csv(tmp, mode='a', header=False, index=False)
+    return tmp
+
+
+def _filas_embeddings(ruta):
+    return np.load(ruta, mmap_mode='r').shape[0] if os.path.exists(ruta) else 0
+
+
+def compactar(registro=None, ruta_embeddings=RUTA_EMBEDDINGS, ruta_limpio=RUTA_WORK_ORDERS_LIMPIO, dir_shards=DIR_SHARDS,
+              ruta_embeddings_campos=RUTA_EMBEDDINGS_CAMPOS):
+    """Añade los segmentos del registro a los ficheros base y lo vacía; devuelve las filas compactadas.
+
+    Los ficheros nuevos se escriben aparte y se sustituyen al final con `os.replace`. Si hay
+    almacén de embeddings por campo, sus segmentos se añaden también; los shards se regeneran
+    con el almacén de la misma dimensión que su manifiesto. Un fichero que ya tiene las filas de
+    los segmentos (una compactación que se interrumpió antes de vaciar el registro) no se vuelve
+    a tocar.
+    """
+    registro = registro or RegistroIngesta()
+    estado = registro.estado()
+    if not estado['segmentos']:
+        return 0
+    partes = [registro.leer(s) for s in estado['segmentos']]
+    lote = pd.concat([p[0] for p in partes])
+    filas_base = estado['filas_base']
+    # Filas que tiene cada fichero una vez compactado (el limpio va alineado con work_orders y
+    # los embeddings con las OTs)
+    esperadas = {ruta: filas_base[nombre] + len(lote) for nombre, ruta in registro.bases.items()}
+    esperadas[ruta_limpio] = filas_base['work_orders'] + len(lote)
+    esperadas[ruta_embeddings] = esperadas[ruta_embeddings_campos] = filas_base['ots'] + len(lote)
+
+    def falta(ruta, contar=_contar_filas):
+        return contar(ruta) != esperadas[ruta]
+
+    # work_orders_dict.csv guarda la actuación vacía como nula (celda 5 de preprocess.ipynb)
+    lotes = {registro.bases['work_orders']: lote.assign(actuacion=actuacion_work_orders(lote['actuacion'])),
+             ruta_limpio: lote.assign(comentarios=lote[COL_COMENTARIOS_LIMPIOS])}
+    csvs = [ruta for ruta in registro.bases.values() if falta(ruta)]
+    if os.path.exists(ruta_limpio) and falta(ruta_limpio):
+        csvs.append(ruta_limpio)
+    almacenes = {}
+    if falta(ruta_embeddings, _filas_embeddings):
+        almacenes[ruta_embeddings] = [p[1] for p in partes]
+    if os.path.exists(ruta_embeddings_campos) and falta(ruta_embeddings_campos, _filas_embeddings):
+        almacenes[ruta_embeddings_campos] = [registro.leer(s, FICHERO_EMBEDDINGS_CAMPOS)[1] for s in estado['segmentos']]
+
+    with medir('ingesta.compactar'):
+        temporales = {ruta: _con_filas(ruta, lotes.get(ruta, lote)) for ruta in csvs}
+        for ruta, segmentos in almacenes.items():
+            temporales[ruta] = ruta + '.compactando.npy'
+            np.save(temporales[ruta], np.concatenate([np.load(ruta), *segmentos]))
+        for ruta, tmp in temporales.items():
+            os.replace(tmp, ruta)
+        if RouterShards.existe(dir_shards):
+            with open(os.path.join(dir_shards, MANIFIESTO), encoding='utf-8') as f:
+                dimension = json.load(f)['dimension']
+            rutas = [r for r in (ruta_embeddings_campos, ruta_embeddings) if os.path.exists(r)]
+            ruta = next((r for r in rutas if np.load(r, mmap_mode='r').shape[1] == dimension), ruta_embeddings)
+            particionar(leer_ots(registro.bases['ots']), np.load(ruta), dir_shards)
+        registro.vaciar({nombre: filas_base[nombre] + len(lote) for nombre in registro.bases})
+    return len(lote)
+
+
+# --- CLI ---
+
+def _lotes_jsonl(fichero, lote, espera):
+    """Lotes de filas (dicts) de un JSONL; un lote se cierra con `lote` filas o `espera` segundos."""
+    lineas = queue.Queue()
+
+    def leer():
+        for linea in fichero:
+            lineas.put(linea)
+        lineas.put(None)
+
+    threading.Thread(target=leer, daemon=True).start()
+    filas, limite = [], None
+    while True:
+        try:
+            linea = lineas.get(timeout=None if limite is None else max(limite - time.monotonic(), 0))
+        except queue.Empty:
+            linea = ''
+        if linea is None:
+            break
+        if linea.strip():
+            filas.append(json.loads(linea))
+            limite = limite or (time.monotonic() + espera if espera else None)
+        if filas and (len(filas) >= lote or (limite is not None and time.monotonic() >= limite)):
+            yield filas
+            filas, limite = [], None
+    if filas:
+        yield filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('entrada', nargs='?', help="CSV (o JSONL con --jsonl; '-' = entrada estándar)")
+    parser.add_argument('--jsonl', action='store_true')
+    parser.add_argument('--lote', type=int, default=LOTE_JSONL, help='filas por segmento en modo JSONL')
+    parser.add_argument('--espera', type=float, default=0, help='segundos máximos de un lote JSONL (0 = sin límite)')
+    parser.add_argument('--registro', default=DIR_INGESTA)
+    parser.add_argument('--diccionario', default=RUTA_DICCIONARIO)
+    parser.add_argument('--compactar', action='store_true', help='compactar al terminar aunque no haga falta')
+    args = parser.parse_args(argv)
+
+    registro = RegistroIngesta(args.registro)
+    rechazados = 0
+    if args.entrada:
+        diccionario = pd.read_csv(args.diccionario)
+        modelo = cargar_modelo()
+        if args.jsonl:
+            fichero = sys.stdin if args.entrada == '-' else open(args.entrada, encoding='utf-8')
+            lotes = (pd.DataFrame(filas) for filas in _lotes_jsonl(fichero, args.lote, args.espera))
+        else:
+            lotes = [pd.read_csv(args.entrada)]
+        for df in lotes:
+            t0 = time.perf_counter()
+            try:
+                entrada = ingerir(df, modelo, diccionario, registro)
+            except ValueError as exc:
+                # Un lote con filas no válidas se descarta; la entrada JSONL sigue con el siguiente
+                print(f'lote rechazado: {exc}', file=sys.stderr, flush=True)
+                rechazados += 1
+                continue
+            print(f"segmento {entrada['nombre']}: {entrada['filas']} filas en {time.perf_counter() - t0:.2f} s", flush=True)
+
+    if args.compactar or registro.necesita_compactar():
+        t0 = time.perf_counter()
+        filas = compactar(registro)
+        print(f'compactadas {filas} filas en {time.perf_counter() - t0:.2f} s')
+    return 1 if rechazados else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
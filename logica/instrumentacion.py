@@ -0,0 +1,171 @@
+"""Instrumentación ligera de los caminos calientes.
+
+- `medir(etapa)` es a la vez context manager y decorador: suma el tiempo de la etapa a la traza
+  de la petición en curso y a los agregados del proceso.
+- `contar(nombre, n)` incrementa un contador.
+- `iniciar_traza` / `cerrar_traza` delimitan una petición (una ejecución del script de Streamlit);
+  opcionalmente capturan un perfil de cProfile.
+- `exportar_prometheus()` devuelve los agregados en formato de texto de Prometheus y, si se define
+  la variable de entorno INSTRUMENTACION_JSONL, cada traza cerrada se añade como una línea JSON a
+  ese fichero para poder agregar entre sesiones.
+"""
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import ContextDecorator
+
+_traza_actual = contextvars.ContextVar('traza_actual', default=None)
+
+_lock = threading.Lock()
+_etapas = {}      # etapa -> [llamadas, segundos_total, segundos_max]
+_contadores = {}  # nombre -> total
+
+
+class Traza:
+    """Tiempos por etapa y contadores de una petición."""
+
+    def __init__(self, nombre, perfilar=False):
+        self.nombre = nombre
+        self.inicio = time.time()
+        self.duracion = None
+        self.etapas = []      # (etapa, segundos) en orden de ejecución
+        self.contadores = {}
+        self.perfil = None
+        self._profiler = cProfile.Profile() if perfilar else None
+
+    def resumen(self):
+        """Etapas agregadas por nombre: {etapa: (llamadas, segundos)}."""
+        out = {}
+        for etapa, segundos in self.etapas:
+            llamadas, total = out.get(etapa, (0, 0.0))
+            out[etapa] = (llamadas + 1, total + segundos)
+        return out
+
+    def a_dict(self):
+        return {
+            'nombre': self.nombre,
+            'inicio': self.inicio,
+            'duracion_s': self.duracion,
+            'etapas': {k: {'llamadas': n, 'segundos': s} for k, (n, s) in self.resumen().items()},
+            'contadores': dict(self.contadores),
+        }
+
+
+class medir(ContextDecorator):
+    """Mide el tiempo de una etapa: `with medir('encode'): ...` o `@medir('modelo.give_work')`."""
+
+    def __init__(self, etapa):
+        self.etapa = etapa
+        self._t0 = None
+
+    def _recreate_cm(self):
+        # Como decorador, cada llamada usa su propia instancia (seguro entre hilos y en recursión)
+        return type(self)(self.etapa)
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        segundos = time.perf_counter() - self._t0
+        traza = _traza_actual.get()
+        if traza is not None:
+            traza.etapas.append((self.etapa, segundos))
+        with _lock:
+            agregado = _etapas.setdefault(self.etapa, [0, 0.0, 0.0])
+            agregado[0] += 1
+            agregado[1] += segundos
+            agregado[2] = max(agregado[2], segundos)
+        return False
+
+
+def contar(nombre, n=1):
+    traza = _traza_actual.get()
+    if traza is not None:
+        traza.contadores[nombre] = traza.contadores.get(nombre, 0) + n
+    with _lock:
+        _contadores[nombre] = _contadores.get(nombre, 0) + n
+
+
+def iniciar_traza(nombre, perfilar=False):
+    """Abre una traza para la petición actual y la devuelve."""
+    traza = Traza(nombre, perfilar=perfilar)
+    _traza_actual.set(traza)
+    if traza._profiler is not None:
+        traza._profiler.enable()
+    return traza
+
+
+def cerrar_traza(traza, max_funciones=30):
+    """Cierra la traza, guarda el perfil (si se pidió) y la exporta a JSONL si está configurado."""
+    if traza is None or traza.duracion is not None:
+        return traza
+    traza.duracion = time.time() - traza.inicio
+    if traza._profiler is not None:
+        traza._profiler.disable()
+        salida = io.StringIO()
+        pstats.Stats(traza._profiler, stream=salida).sort_stats('cumulative').print_stats(max_funciones)
+        traza.perfil = salida.getvalue()
+        traza._profiler = None
+    if _traza_actual.get() is traza:
+        _traza_actual.set(None)
+
+    ruta = os.environ.get('INSTRUMENTACION_JSONL')
+    if ruta:
+        escribir_jsonl(traza, ruta)
+    return traza
+
+
+def traza_actual():
+    return _traza_actual.get()
+
+
+def escribir_jsonl(traza, ruta):
+    linea = json.dumps(traza.a_dict(), ensure_ascii=False)
+    with _lock, open(ruta, 'a', encoding='utf-8') as f:
+        f.write(linea + '\n')
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def exportar_prometheus(prefijo='averias'):
+    """Agregados del proceso en formato de texto de Prometheus."""
+    with _lock:
+        etapas = {k: list(v) for k, v in _etapas.items()}
+        contadores = dict(_contadores)
+
+    lineas = [
+        f'# HELP {prefijo}_etapa_llamadas_total Número de ejecuciones de cada etapa.',
+        f'# TYPE {prefijo}_etapa_llamadas_total counter',
+    ]
+    lineas += [f'{prefijo}_etapa_llamadas_total{{etapa="{_escapar(k)}"}} {v[0]}' for k, v in sorted(etapas.items())]
+    lineas += [
+        f'# HELP {prefijo}_etapa_segundos_total Tiempo acumulado por etapa.',
+        f'# TYPE {prefijo}_etapa_segundos_total counter',
+    ]
+    lineas += [f'{prefijo}_etapa_segundos_total{{etapa="{_escapar(k)}"}} {v[1]:.6f}' for k, v in sorted(etapas.items())]
+    lineas += [
+        f'# HELP {prefijo}_etapa_segundos_max Tiempo máximo de una ejecución de la etapa.',
+        f'# TYPE {prefijo}_etapa_segundos_max gauge',
+    ]
+    lineas += [f'{prefijo}_etapa_segundos_max{{etapa="{_escapar(k)}"}} {v[2]:.6f}' for k, v in sorted(etapas.items())]
+    lineas += [
+        f'# HELP {prefijo}_contador_total Contadores de la aplicación.',
+        f'# TYPE {prefijo}_contador_total counter',
+    ]
+    lineas += [f'{prefijo}_contador_total{{nombre="{_escapar(k)}"}} {v}' for k, v in sorted(contadores.items())]
+    return '\n'.join(lineas) + '\n'
+
+
+def reiniciar():
+    """Vacía los agregados del proceso."""
+    with _lock:
+        _etapas.clear()
+        _contadores.clear()
@@ -0,0 +1,74 @@
+OTROS = 'Otros'
+
+
+def opciones_nivel1(df):
+    """Sistemas principales (componente_nivel1) ordenados alfabéticamente."""
+    opciones = df[df['componente_nivel1'].notna()]['componente_nivel1'].unique()
+    return sorted([opt for opt in opciones if opt != ''])
+
+
+def filtrar_nivel1(df, nivel1):
+    return df[df['componente_nivel1'] == nivel1]
+
+
+def opciones_nivel2(df_n1):
+    """Subsistemas de un sistema principal.
+
+    Devuelve (opciones, nivel3_sin_nivel2): los componentes de nivel 3 cuyo padre de nivel 2
+    no existe se agrupan bajo la opción 'Otros'.
+    """
+    nivel2 = df_n1[df_n1['nivel'] == 2]
+    opciones = sorted([opt for opt in nivel2['componente'].unique() if opt != ''])
+    nivel3_sin_nivel2 = df_n1[(df_n1['nivel'] == 3) & ~df_n1['nivel2'].isin(nivel2['clavero'])]
+    if not nivel3_sin_nivel2.empty:
+        opciones = opciones + [OTROS]
+    return opciones, nivel3_sin_nivel2
+
+
+def filtrar_nivel2(df_n1, nivel2, nivel3_sin_nivel2):
+    if nivel2 == OTROS:
+        return nivel3_sin_nivel2
+    return df_n1[df_n1['componente_nivel2'] == nivel2]
+
+
+def componentes_finales(df_n2):
+    """Componentes de nivel 3 disponibles tras elegir subsistema."""
+    return sorted(df_n2[df_n2['nivel'] == 3]['componente'].unique())
+
+
+def resolver_clavero(df, nivel1, nivel2=None, componente=None):
+    """Clavero correspondiente a la ruta seleccionada y la propia ruta.
+
+    Devuelve (clavero, ruta); clavero es None si la ruta no existe en la jerarquía.
+    """
+    if componente:
+        resultado = df[(df['componente_nivel1'] == nivel1) & (df['componente_nivel2'] == nivel2) & (df['componente'] == componente) & (df['nivel'] == 3)]
+        ruta = [nivel1, nivel2, componente]
+    elif nivel2:
+        resultado = df[(df['componente_nivel1'] == nivel1) & (df['componente'] == nivel2) & (df['nivel'] == 2)]
+        ruta = [nivel1, nivel2]
+    else:
+        resultado = df[(df['componente'] == nivel1) & (df['nivel'] == 1)]
+        ruta = [nivel1]
+
+    if resultado.empty:
+        return None, ruta
+    return resultado.iloc[0]['clavero'], ruta
+
+
+def recorrer_jerarquia(df):
+    """Recorre todas las rutas nivel1 → nivel2 → componente como lo haría la vista.
+
+    Se usa para medir el coste del filtrado; devuelve el número de claveros resueltos.
+    """
+    resueltos = 0
+    for nivel1 in opciones_nivel1(df):
+        df_n1 = filtrar_nivel1(df, nivel1)
+        opciones, nivel3_sin_nivel2 = opciones_nivel2(df_n1)
+        for nivel2 in opciones:
+            df_n2 = filtrar_nivel2(df_n1, nivel2, nivel3_sin_nivel2)
+            componentes = componentes_finales(df_n2) or [None]
+            for componente in componentes:
+                clavero, _ = resolver_clavero(df, nivel1, nivel2, componente)
+                resueltos += clavero is not None
+    return resueltos
@@ -0,0 +1,10 @@
+from bs4 import BeautifulSoup
+
+SIN_COMENTARIOS = "SIN COMENTARIOS"
+
+
+def limpiar_comentario(comentario):
+    """Quita el HTML de un comentario; los comentarios vacíos pasan a 'SIN COMENTARIOS'."""
+    if comentario and isinstance(comentario, str) and comentario.strip() != '""':
+        return BeautifulSoup(comentario, "html.parser").get_text()
+    return SIN_COMENTARIOS
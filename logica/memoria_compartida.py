@@ -0,0 +1,166 @@
+"""Plano de datos compartido entre procesos de Streamlit.
+
+Con varios procesos detrás de un balanceador, cada uno tenía su propia copia de los DataFrames y
+de los embeddings. Aquí los arrays inmutables se publican una sola vez como ficheros .npy en un
+directorio (por defecto en /dev/shm, es decir, en memoria) y cada proceso los abre con `mmap` en
+sólo lectura: todos comparten las mismas páginas físicas.
+
+El plano de las OTs contiene:
+
+- `embeddings.npy`, alineado con las filas;
+- la tabla compacta (`logica.columnar`): equipo, clavero, modelo... como códigos enteros, el texto
+  libre como un buffer UTF-8 con offsets y `fecha_ts`;
+- `shards.json`: las filas están ordenadas por (flota, sistema), así que cada shard es un rango
+  contiguo y se obtiene como rebanada sin copiar nada.
+
+El nombre del directorio incluye una huella (tamaño y fecha de modificación) de los ficheros de
+origen: si cambian se publica un plano nuevo. La publicación se escribe en un directorio temporal
+y se renombra, así que un proceso nunca ve un plano a medias; si dos procesos publican a la vez
+uno de los dos renombres falla y ese proceso usa el plano del otro.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from logica.columnar import TablaCompacta
+from logica.datos import compactar_ots, leer_ots
+from logica.shards import agrupar_por_shard
+
+ENV_DIR_PLANO = 'AVERIAS_PLANO'
+FICHERO_SHARDS = 'shards.json'
+# Forma parte del nombre del plano: un cambio de formato no reutiliza planos ya publicados
+FORMATO_PLANO = 2
+
+
+def dir_plano():
+    """Directorio raíz de los planos: $AVERIAS_PLANO, /dev/shm o el temporal del sistema."""
+    if os.environ.get(ENV_DIR_PLANO):
+        return os.environ[ENV_DIR_PLANO]
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'averias_plano')
+
+
+def huella(*paths):
+    """Huella corta de unos ficheros (ruta, tamaño y fecha de modificación)."""
+    h = hashlib.sha1()
+    for path in paths:
+        st = os.stat(path)
+        h.update(f'{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}'.encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+class PlanoDatos:
+    """Tabla compacta, embeddings y rangos de shards abiertos en sólo lectura."""
+
+    def __init__(self, ruta, tabla, embeddings, shards):
+        self.ruta = ruta
+        self.tabla = tabla
+        self.embeddings = embeddings
+        self.shards = shards
+
+    def __len__(self):
+        return len(self.tabla)
+
+    def shard(self, entrada):
+        """(tabla, embeddings) del rango de un shard, como vistas sobre el plano."""
+        ini, fin = entrada['inicio'], entrada['fin']
+        return self.tabla.rebanada(ini, fin), self.embeddings[ini:fin]
+
+
+def escribir_plano_ots(df, embeddings, destino):
+    """Escribe en `destino` el plano de un DataFrame de OTs y sus embeddings alineados."""
+    if len(df) != embeddings.shape[0]:
+        raise ValueError(f'{len(df)} filas y {embeddings.shape[0]} embeddings: no están alineados')
+    # Ordenar por shard para que cada uno sea un rango contiguo
+    grupos = agrupar_por_shard(df)
+    orden = np.concatenate([grupos[c] for c in sorted(grupos)]) if grupos else np.empty(0, dtype=np.intp)
+    shards, inicio = [], 0
+    for (flota, sistema) in sorted(grupos):
+        fin = inicio + len(grupos[(flota, sistema)])
+        shards.append({'flota': flota, 'sistema': sistema, 'filas': fin - inicio, 'inicio': inicio, 'fin': fin})
+        inicio = fin
+
+    os.makedirs(destino, exist_ok=True)
+    compactar_ots(df.iloc[orden]).guardar(destino)
+    np.save(os.path.join(destino, 'embeddings.npy'), np.ascontiguousarray(embeddings[orden], dtype=np.float32))
+    with open(os.path.join(destino, FICHERO_SHARDS), 'w', encoding='utf-8') as f:
+        json.dump({'dimension': int(embeddings.shape[1]), 'shards': shards}, f, indent=2, ensure_ascii=False)
+
+
+def publicar(nombre, escribir, directorio=None):
+    """Publica un plano si no existe y devuelve su ruta.
+
+    `escribir(destino)` genera los ficheros en un directorio temporal que después se renombra.
+    """
+    directorio = directorio or dir_plano()
+    ruta = os.path.join(directorio, nombre)
+    if os.path.isdir(ruta):
+        return ruta
+    os.makedirs(directorio, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f'.{nombre}-', dir=directorio)
+    try:
+        escribir(tmp)
+        os.rename(tmp, ruta)
+    except OSError:
+        # Otro proceso lo publicó mientras tanto
+        if not os.path.isdir(ruta):
+            raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return ruta
+
+
+def adjuntar(ruta):
+    """Abre un plano publicado sin copiar sus arrays (mmap de sólo lectura)."""
+    with open(os.path.join(ruta, FICHERO_SHARDS), encoding='utf-8') as f:
+        shards = json.load(f)['shards']
+    tabla = TablaCompacta.cargar(ruta, mmap=True)
+    embeddings = np.load(os.path.join(ruta, 'embeddings.npy'), mmap_mode='r')
+    return PlanoDatos(ruta, tabla, embeddings, shards)
+
+
+def plano_ots(path_csv, path_embeddings, directorio=None):
+    """Plano de las OTs de `path_csv` con sus embeddings: lo publica la primera vez y lo abre."""
+    nombre = f'ots-v{FORMATO_PLANO}-{huella(path_csv, path_embeddings)}'
+
+    def escribir(destino):
+        escribir_plano_ots(leer_ots(path_csv), np.load(path_embeddings), destino)
+
+    return adjuntar(publicar(nombre, escribir, directorio))
+
+
+def limpiar(directorio=None, conservar=(), prefijo=''):
+    """Borra los planos `prefijo`* publicados salvo los de `conservar` (rutas) y los que se están escribiendo."""
+    directorio = directorio or dir_plano()
+    if not os.path.isdir(directorio):
+        return
+    conservar = {os.path.abspath(r) for r in conservar}
+    for nombre in os.listdir(directorio):
+        if nombre.startswith('.') or not nombre.startswith(prefijo):
+            continue
+        ruta = os.path.join(directorio, nombre)
+        if os.path.abspath(ruta) not in conservar:
+            shutil.rmtree(ruta, ignore_errors=True)
+
+
+def rss_proceso(pid='self'):
+    """Memoria del proceso (por defecto el actual) en MB: {'rss', 'anon', 'fichero', 'pss'} (Linux, /proc)."""
+    out = {}
+    campos = {'VmRSS': 'rss', 'RssAnon': 'anon', 'RssFile': 'fichero', 'RssShmem': 'shmem'}
+    with open(f'/proc/{pid}/status', encoding='utf-8') as f:
+        for linea in f:
+            clave, _, valor = linea.partition(':')
+            if clave in campos:
+                out[campos[clave]] = int(valor.split()[0]) / 1024
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', encoding='utf-8') as f:
+            for linea in f:
+                if linea.startswith('Pss:'):
+                    out['pss'] = int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return out
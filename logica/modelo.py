@@ -1,45 +1,179 @@
-import pandas as pd
-from bs4 import BeautifulSoup
+import copy
+import os
 
-data = pd.read_csv('data/work_orders_dict.csv')
+from logica.almacen_sql import abrir_o_construir, aplicar_registro, backend_sql
+from logica.datos import COL_FECHA_TS, COL_MODELO, RUTA_WORK_ORDERS, compactar_ots, derivar_columnas, leer_ots
+from logica.estadisticas import CuboFallos
+from logica.fechas import IndiceTemporal
+from logica.ingesta import DIR_INGESTA, FICHERO_REGISTRO, RegistroIngesta
+from logica.instrumentacion import medir, contar
+from logica.limpieza import limpiar_comentario
+from logica.snapshots import GestorSnapshots
 
+
+class DatosModelo:
+    """Snapshot de las órdenes de trabajo con su índice temporal y su cubo de averías.
+
+    Las OTs se guardan como `TablaCompacta` (claves codificadas y texto libre en bloques UTF-8);
+    el DataFrame leído del CSV sólo se usa para construirla. `agregar` devuelve un snapshot nuevo
+    con las OTs ingeridas (ver `logica.ingesta`) sin volver a construir lo existente.
+    """
+
+    def __init__(self, df):
+        self.tabla = compactar_ots(df)
+        self.indice = IndiceTemporal(self.tabla.columna(COL_FECHA_TS))
+        self.cubo = CuboFallos.desde_ots(df)
+        # Filas del CSV base y posición del registro de ingesta ya aplicada
+        self.filas_base = len(df)
+        self.registro = None
+
+    def agregar(self, df, registro=None):
+        """Snapshot nuevo con las filas de `df` añadidas a la tabla, al índice y al cubo."""
+        nuevo = copy.copy(self)
+        nuevo.registro = registro
+        if len(df):
+            df = derivar_columnas(df)
+            nuevo.tabla = self.tabla.agregar(df)
+            nuevo.indice = self.indice.agregar(df[COL_FECHA_TS].to_numpy())
+            nuevo.cubo = self.cubo.copiar()
+            nuevo.cubo.agregar(df)
+        return nuevo
+
+
+def _aplicar_registro(d):
+    """`d` con los segmentos del registro de ingesta que le faltan; None si hay que reconstruir."""
+    pendientes = RegistroIngesta().pendientes(d.registro, 'work_orders', d.filas_base)
+    if pendientes is None:
+        return None
+    df, _, posicion = pendientes
+    contar('modelo.filas_ingeridas', len(df))
+    return d.agregar(df, posicion)
+
+
+def _construir():
+    return _aplicar_registro(DatosModelo(leer_ots(RUTA_WORK_ORDERS)))
+
+
+# El CSV se lee en la primera consulta (no al importar) y se recarga en segundo plano cuando cambia;
+# las OTs ingeridas se aplican sobre el snapshot vigente sin releerlo
+_snapshots = GestorSnapshots('modelo', _construir, [RUTA_WORK_ORDERS],
+                             registro=[os.path.join(DIR_INGESTA, FICHERO_REGISTRO)], actualizar=_aplicar_registro)
+
+
+def _construir_sql():
+    almacen = abrir_o_construir(RUTA_WORK_ORDERS)
+    return aplicar_registro(almacen, RegistroIngesta()) or almacen
+
+
+# Con AVERIAS_BACKEND=sqlite las consultas de la tabla de averías van a `logica.almacen_sql`
+_snapshots_sql = GestorSnapshots('modelo_sql', _construir_sql, [RUTA_WORK_ORDERS],
+                                 registro=[os.path.join(DIR_INGESTA, FICHERO_REGISTRO)],
+                                 actualizar=lambda almacen: aplicar_registro(almacen, RegistroIngesta()))
+
+
+def datos():
+    """Snapshot vigente; cada función lo toma una vez para no mezclar versiones."""
+    return _snapshots.actual()
+
+
+def almacen():
+    """`AlmacenSQL` vigente, o None si el backend es el de memoria."""
+    return _snapshots_sql.actual() if backend_sql() else None
+
+
+def usar_datos(df):
+    """Sustituye los datos por `df` (benchmarks, ingesta)."""
+    _snapshots.publicar(DatosModelo(df))
+
+
+def indice_fechas():
+    """Índice temporal (con el backend SQL, el almacén: también tiene `extremos()`)."""
+    sql = almacen()
+    return datos().indice if sql is None else sql
+
+
+def cubo_fallos():
+    """Cubo de averías por (clavero, equipo, mes) del snapshot vigente."""
+    return datos().cubo
+
+
+@medir('modelo.get_models')
 def get_models():
-    models = set()
+    sql = almacen()
+    models = set(cubo_fallos().modelos.valores if sql is None else sql.modelos())
     models.add("--")
-    for code in data.equipo:
-        if code[-3] == "-": models.add(code[-2:])
     return models
 
+@medir('modelo.give_claveros')
 def give_claveros(model = ""):
-    claveros = {}
-    for i, row in data.iterrows():
-        if model == "--":
-            if row.equipo[-3] != "-":
-                if row.clavero in claveros:
-                    claveros[row.clavero] += 1
-                else:
-                    claveros[row.clavero] = 1
-        else:
-            if row.equipo[-2:] == model:
-                if row.clavero in claveros:
-                    claveros[row.clavero] += 1
-                else:
-                    claveros[row.clavero] = 1
-    return claveros
-
-def give_work(clavero, model = ""):
-    works = []
-    for i, row in data.iterrows():
-        if row.clavero == clavero:
-            if row.comentarios and isinstance(row.comentarios, str) and row.comentarios.strip() != '""':
-                clean_comment = BeautifulSoup(row.comentarios, "html.parser").get_text()
-            else:
-                clean_comment = "SIN COMENTARIOS"
-                
-            if model == "--":
-                if row.equipo[-3] != "-":
-                    works.append([row.fecha_creacion, row.descripcion_ot, row.descripcion_averia, row.descripcion_reparacion, clean_comment])
-            else:
-                if row.equipo[-2:] == model:
-                    works.append([row.fecha_creacion, row.descripcion_ot, row.descripcion_averia, row.descripcion_reparacion, clean_comment])
-    return works
\ No newline at end of file
+    sql = almacen()
+    if sql is not None:
+        return sql.conteo_claveros(model)
+    # Conteo precalculado por (modelo, clavero) en el cubo de averías
+    return cubo_fallos().conteo_claveros(model)
+
+@medir('modelo.give_work')
+def give_work(clavero, model = "", desde = None, hasta = None):
+    sql = almacen()
+    if sql is not None:
+        return sql.work(clavero, model, desde, hasta)
+    d = datos()
+    contar('modelo.filas_escaneadas', len(d.tabla))
+    return _filas_work(d, _mascara_work(d, clavero, model, desde, hasta).nonzero()[0])
+
+
+COLUMNAS_WORK = ['fecha_creacion', 'descripcion_ot', 'descripcion_averia', 'descripcion_reparacion', 'comentarios']
+
+
+def _mascara_work(d, clavero, model = "", desde = None, hasta = None):
+    """Filas de `clavero` para el modelo indicado ("--" = equipos sin sufijo de modelo).
+
+    `desde`/`hasta` restringen a fecha_creacion en [desde, hasta) usando el índice temporal.
+    """
+    # Comparación de códigos enteros, sin recorrer cadenas
+    mascara = d.tabla.columna('clavero').igual(clavero)
+    mascara &= d.tabla.columna(COL_MODELO).igual(model)
+    if desde is not None or hasta is not None:
+        mascara &= d.indice.mascara(desde, hasta)
+    return mascara
+
+
+def _filas_work(d, posiciones):
+    filas = d.tabla.filas(posiciones, COLUMNAS_WORK)
+    contar('modelo.comentarios_limpiados', len(filas))
+    return [
+        [row.fecha_creacion, row.descripcion_ot, row.descripcion_averia, row.descripcion_reparacion, limpiar_comentario(row.comentarios)]
+        for row in filas.itertuples(index=False)
+    ]
+
+
+@medir('modelo.contar_work')
+def contar_work(clavero, model = "", desde = None, hasta = None):
+    """Número de órdenes de trabajo de (clavero, modelo), sin materializarlas."""
+    sql = almacen()
+    if sql is not None:
+        return sql.contar_work(clavero, model, desde, hasta)
+    return int(_mascara_work(datos(), clavero, model, desde, hasta).sum())
+
+
+@medir('modelo.give_work_pagina')
+def give_work_pagina(clavero, model = "", offset = 0, limit = 50, descendente = True, desde = None, hasta = None):
+    """Una página de `give_work` ordenada por fecha_creacion.
+
+    Devuelve (filas, total). Sólo se limpian los comentarios HTML de las filas de la página.
+    """
+    sql = almacen()
+    if sql is not None:
+        return sql.work_pagina(clavero, model, offset, limit, descendente, desde, hasta), sql.contar_work(clavero, model, desde, hasta)
+    d = datos()
+    contar('modelo.filas_escaneadas', len(d.tabla))
+    mascara = _mascara_work(d, clavero, model, desde, hasta)
+    total = int(mascara.sum())
+    indice = d.indice
+
+    if descendente and offset == 0:
+        # Primera página de las más recientes: no hace falta ordenar todas las coincidencias
+        pagina = indice.recientes(limit, mascara)
+    else:
+        pagina = indice.ordenar(mascara.nonzero()[0], descendente=descendente)[offset:offset + limit]
+    return _filas_work(d, pagina), total
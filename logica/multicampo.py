@@ -0,0 +1,120 @@
+"""Embeddings de varios campos de texto de cada OT y puntuación ponderada en un solo producto.
+
+`embeddings.npy` sólo tiene `descripcion_ot`; los operarios reconocen mejor las averías por
+`descripcion_averia` y `descripcion_reparacion`. `embeddings_campos.npy` guarda un vector por campo
+y OT, apilados en la misma fila (filas alineadas con el CSV, como `embeddings.npy`):
+
+    fila i = [ot_i | averia_i | reparacion_i] / sqrt(3)
+
+La consulta se apila igual, con el peso de cada campo: [w_ot q | w_av q | w_rep q]. El producto de
+una fila por la consulta es la suma ponderada de las similitudes por campo, así que la búsqueda
+sigue siendo un único producto matriz-vector por shard; el router, el plano compartido, los shards
+y el MMR no distinguen entre un almacén y otro. Las filas tienen norma 1 y la consulta también:
+las puntuaciones son cosenos y `similaridad_ponderada` las pasa a la media ponderada de las
+similitudes por campo.
+
+Un campo vacío usa el vector de `descripcion_ot`. Los textos repetidos (entre filas y entre
+campos: muchas OTs copian la descripción en la avería) se codifican una sola vez.
+
+Los pesos se configuran con $AVERIAS_PESOS_CAMPOS ('0.5,0.3,0.2', en el orden de CAMPOS).
+
+Para generarlo:
+
+    python -m logica.multicampo data/data_ots_completo.csv embeddings_campos.npy
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+CAMPOS = ('descripcion_ot', 'descripcion_averia', 'descripcion_reparacion')
+PESOS = (0.5, 0.3, 0.2)
+ENV_PESOS = 'AVERIAS_PESOS_CAMPOS'
+RUTA_EMBEDDINGS_CAMPOS = 'embeddings_campos.npy'
+
+
+def pesos_configurados():
+    """Pesos de $AVERIAS_PESOS_CAMPOS, o PESOS si no está definida."""
+    texto = os.environ.get(ENV_PESOS, '').strip()
+    if not texto:
+        return PESOS
+    pesos = tuple(float(p) for p in texto.split(','))
+    if len(pesos) != len(CAMPOS) or min(pesos) < 0 or sum(pesos) <= 0:
+        raise ValueError(f'{ENV_PESOS}={texto!r}: hacen falta {len(CAMPOS)} pesos no negativos')
+    return pesos
+
+
+def _textos(df, campo):
+    if campo not in df.columns:
+        return pd.Series('', index=df.index)
+    return df[campo].astype(object).where(df[campo].notna(), '').astype(str).str.strip()
+
+
+def codificar_campos(df, codificar_textos, campos=CAMPOS):
+    """(embeddings apilados (n, campos x d) float32, textos, textos distintos codificados).
+
+    `codificar_textos(lista)` devuelve los embeddings normalizados de una lista de textos.
+    """
+    textos = [_textos(df, campo) for campo in campos]
+    # El texto vacío de descripcion_ot se codifica (como en embeddings.npy); el de los demás campos no
+    codigos, unicos = pd.factorize(pd.concat(textos, ignore_index=True))
+    codigos = codigos.reshape(len(campos), len(df))
+    emb = np.asarray(codificar_textos(list(unicos)), dtype=np.float32)
+    principal = emb[codigos[0]]
+    partes = [principal]
+    for campo, texto in zip(codigos[1:], textos[1:]):
+        vacio = (texto == '').to_numpy()
+        partes.append(np.where(vacio[:, None], principal, emb[campo]))
+    apilados = np.concatenate(partes, axis=1) / np.float32(np.sqrt(len(campos)))
+    return apilados, codigos.size, len(unicos)
+
+
+def vectores_campo(apilados, campo, campos=CAMPOS):
+    """Embeddings normalizados de un solo campo a partir de los apilados."""
+    d = apilados.shape[1] // len(campos)
+    i = campos.index(campo)
+    return np.ascontiguousarray(apilados[:, i * d:(i + 1) * d]) * np.float32(np.sqrt(len(campos)))
+
+
+def numero_campos(dimension, dimension_consulta):
+    return dimension // dimension_consulta
+
+
+def apilar_consulta(query_vec, dimension, pesos=PESOS):
+    """Consulta para un almacén de `dimension` columnas: sin cambios si es de un solo campo."""
+    q = np.asarray(query_vec, dtype=np.float32).ravel()
+    if numero_campos(dimension, q.shape[0]) <= 1:
+        return q
+    apilada = np.concatenate([w * q for w in pesos])
+    return apilada / np.linalg.norm(apilada)
+
+
+def similaridad_ponderada(scores, pesos=PESOS):
+    """Media ponderada de las similitudes por campo a partir del coseno con la consulta apilada."""
+    pesos = np.asarray(pesos, dtype=np.float64)
+    return scores * (np.sqrt(len(pesos)) * np.linalg.norm(pesos) / pesos.sum())
+
+
+def main(argv=None):
+    from logica.ingesta import cargar_modelo, codificar
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('csv')
+    parser.add_argument('salida', nargs='?', default=RUTA_EMBEDDINGS_CAMPOS)
+    args = parser.parse_args(argv)
+
+    df = pd.read_csv(args.csv)
+    modelo = cargar_modelo()
+    t0 = time.perf_counter()
+    apilados, textos, unicos = codificar_campos(df, lambda lista: codificar(lista, modelo))
+    np.save(args.salida, apilados)
+    print(f'{len(df)} OTs x {len(CAMPOS)} campos: {unicos} textos codificados de {textos} '
+          f'en {time.perf_counter() - t0:.1f} s ({apilados.nbytes / 2 ** 20:.1f} MB) -> {args.salida}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
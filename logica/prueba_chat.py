@@ -1,5 +1,4 @@
-import subprocess
-import textwrap
+from logica.sintesis import ClienteOllama
 
 prompt = "Explica por qué el cielo es azul."
 respuestas = [
@@ -17,11 +16,8 @@ y las siguientes 5 soluciones:
 Elabora una respuesta final combinando las mejores ideas.
 """
 
-resultado = subprocess.run(
-    ["ollama", "run", "phi3:mini"],
-    input=instruccion,
-    text=True,
-    capture_output=True
-)
-
-print(resultado.stdout)
+# Requiere `ollama serve` (o `python -m herramientas.ollama_falso`) escuchando en OLLAMA_URL
+cliente = ClienteOllama()
+for fragmento in cliente.generar(instruccion):
+    print(fragmento, end="", flush=True)
+print()
@@ -0,0 +1,91 @@
+"""Resultado precalculado de una búsqueda de averías, para el panel de resultados.
+
+Se construye una vez por consulta y se guarda en la sesión de Streamlit: al cambiar la selección
+del panel sólo se lee de él, sin volver a agregar los vecinos, recorrer `jerarquia_total` ni
+consultar el diccionario por cada vecino.
+"""
+import pandas as pd
+
+# Un componente se propone si aparece en más de este porcentaje de los vecinos
+UMBRAL_PROBABILIDAD = 0.10
+MAX_VECINOS_SIMILARES = 5
+SIN_DESCRIPCION = '(sin descripción)'
+SIN_DESCRIPCION_AVERIA = '(sin descripción de avería)'
+SIN_CODIGO_ACTUACION = 'No hay código de actuación en el registro.'
+COL_CLAVE = 'clavero'
+
+
+def descripciones_claveros(jerarquia_total):
+    """{clavero: componente_total} (la primera aparición de cada clavero)."""
+    df = jerarquia_total.drop_duplicates('clavero')
+    return dict(zip(df['clavero'], df['componente_total']))
+
+
+def _texto(fila, columna, defecto=''):
+    valor = fila.get(columna, defecto)
+    return defecto if valor is None or pd.isna(valor) else valor
+
+
+class ResultadoBusqueda:
+    """Vecinos de una consulta con el conteo por clavero, las opciones del panel y las definiciones.
+
+    `entradas` son tuplas (clavero, frecuencia, probabilidad, descripción) en el orden del conteo.
+    """
+
+    def __init__(self, consulta, vecinos, conteo, entradas, definiciones):
+        self.consulta = consulta
+        self.vecinos = vecinos
+        self.conteo = conteo
+        self.entradas = entradas
+        self.definiciones = definiciones
+        self.hay_alta = any(pct > UMBRAL_PROBABILIDAD for (_, _, pct, _) in entradas)
+        self.opciones_componentes = self._opciones_componentes()
+        self.opciones_vecinos = self._opciones_vecinos()
+
+    def _opciones_componentes(self):
+        """{etiqueta: (clavero, descripción, probabilidad)} por probabilidad descendente."""
+        altas = sorted([e for e in self.entradas if e[2] > UMBRAL_PROBABILIDAD], key=lambda x: x[2], reverse=True)
+        opciones = {}
+        for i, (clave, _, pct, descripcion_texto) in enumerate(altas):
+            # no mostrar porcentajes; marcar la primera como 'Más probable'
+            label = f"{descripcion_texto} (Opción más probable)" if i == 0 else f"{descripcion_texto} "
+            opciones[label] = (clave, descripcion_texto, pct)
+        return opciones
+
+    def _opciones_vecinos(self):
+        """{etiqueta: fila como dict} de los vecinos más similares."""
+        opciones = {}
+        for idx, fila in self.vecinos.sort_values(by='similaridad', ascending=False).head(MAX_VECINOS_SIMILARES).iterrows():
+            opciones[f"Orden idx={idx} — Similaridad {fila.get('similaridad', 0.0):.3f}"] = fila.to_dict()
+        return opciones
+
+    def vecinos_de(self, clave):
+        if COL_CLAVE not in self.vecinos.columns:
+            return self.vecinos.iloc[0:0]
+        return self.vecinos[self.vecinos[COL_CLAVE] == clave]
+
+    def detalle(self, fila):
+        """(descripción de la avería, código de actuación, definición) de una fila de vecinos."""
+        desc_averia = _texto(fila, 'descripcion_averia', SIN_DESCRIPCION_AVERIA)
+        cod_act = _texto(fila, 'clavero_actuacion')
+        defin_text = self.definiciones.get(cod_act) if cod_act else SIN_CODIGO_ACTUACION
+        return desc_averia, cod_act, defin_text
+
+
+def construir_resultado(consulta, vecinos, conteo, descripciones, buscar_definicion):
+    """Agrega los vecinos de una consulta una sola vez.
+
+    `descripciones` es el mapa clavero -> componente (ver `descripciones_claveros`) y
+    `buscar_definicion(codigo)` se llama una vez por código de actuación distinto.
+    """
+    total = sum(conteo.values())
+    entradas = [
+        (clave, freq, (freq / total) if total > 0 else 0.0, descripciones.get(clave, SIN_DESCRIPCION))
+        for clave, freq in conteo.items()
+    ]
+    definiciones = {}
+    if 'clavero_actuacion' in vecinos.columns:
+        for cod in vecinos['clavero_actuacion'].dropna().unique():
+            if cod:
+                definiciones[cod] = buscar_definicion(cod)
+    return ResultadoBusqueda(consulta, vecinos, conteo, entradas, definiciones)
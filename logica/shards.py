@@ -0,0 +1,377 @@
+"""Datos, embeddings e índice vectorial particionados en shards por flota y sistema.
+
+Un shard contiene las órdenes de trabajo de una flota (prefijo del equipo, '7066-CO_926-R1' ->
+'7066') y un sistema (prefijo alfabético del clavero, 'FRE0703' -> 'FRE'), con sus embeddings
+alineados fila a fila. En disco:
+
+    data/shards/manifest.json
+    data/shards/<flota>/<sistema>/ots.csv
+    data/shards/<flota>/<sistema>/embeddings.npy
+
+`RouterShards` lee sólo el manifiesto al arrancar; cada shard se carga la primera vez que una
+consulta lo necesita. Una búsqueda se reparte entre los shards seleccionados en paralelo y se
+fusionan los top-k parciales. Las filas conservan el índice del CSV de origen (columna `fila`).
+
+Las OTs ingeridas después de construir el router (`logica.ingesta`) se añaden con `agregar`, que
+devuelve un router nuevo con un shard delta en memoria por (flota, sistema); se busca junto al
+shard base hasta la siguiente compactación.
+
+Para generar los shards:
+
+    python -m logica.shards data/data_ots_completo.csv embeddings.npy data/shards
+"""
+import copy
+import json
+import os
+import re
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from logica.busqueda import FACTOR_CANDIDATOS, MAX_CANDIDATOS, mmr, normalizados, puntuar, puntuar_normalizados, top_k_indices
+from logica.columnar import TablaCompacta
+from logica.datos import COL_FECHA_TS, fechas_ts, leer_ots, preparar_ots
+from logica.fechas import IndiceTemporal
+
+DIR_SHARDS = os.path.join('data', 'shards')
+MANIFIESTO = 'manifest.json'
+SIN_FLOTA = 'SIN_FLOTA'
+SIN_SISTEMA = 'SIN_SISTEMA'
+COL_FILA = 'fila'
+MAX_HILOS = 4
+
+_RE_SISTEMA = re.compile(r'^[A-Za-z]+')
+_RE_NOMBRE = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def flota_de_equipo(equipo):
+    """Flota de un equipo ('7066-CO_926-R1' -> '7066')."""
+    if equipo is None or pd.isna(equipo) or str(equipo).strip() == '':
+        return SIN_FLOTA
+    return str(equipo).split('-', 1)[0].strip() or SIN_FLOTA
+
+
+def sistema_de_clavero(clavero):
+    """Sistema de un clavero: su prefijo alfabético en mayúsculas ('FRE0703' -> 'FRE')."""
+    if clavero is None or pd.isna(clavero):
+        return SIN_SISTEMA
+    m = _RE_SISTEMA.match(str(clavero).strip())
+    return m.group(0).upper() if m else SIN_SISTEMA
+
+
+def _claves_shard(df):
+    flotas = df['equipo'].map(flota_de_equipo) if 'equipo' in df.columns else pd.Series(SIN_FLOTA, index=df.index)
+    sistemas = df['clavero'].map(sistema_de_clavero) if 'clavero' in df.columns else pd.Series(SIN_SISTEMA, index=df.index)
+    return flotas.to_numpy(), sistemas.to_numpy()
+
+
+def agrupar_por_shard(df):
+    """{(flota, sistema): posiciones} de las filas de `df`."""
+    flotas, sistemas = _claves_shard(df)
+    grupos = pd.DataFrame({'flota': flotas, 'sistema': sistemas}).groupby(['flota', 'sistema'], sort=True).indices
+    return {clave: np.asarray(pos) for clave, pos in grupos.items()}
+
+
+def _nombre_dir(valor):
+    return _RE_NOMBRE.sub('_', str(valor))
+
+
+def particionar(df, embeddings, destino=DIR_SHARDS):
+    """Escribe los shards de `df` (y sus embeddings alineados) en `destino` y devuelve el manifiesto."""
+    if len(df) != embeddings.shape[0]:
+        raise ValueError(f'{len(df)} filas y {embeddings.shape[0]} embeddings: no están alineados')
+    df = preparar_ots(df)
+    os.makedirs(destino, exist_ok=True)
+    shards = []
+    for (flota, sistema), pos in agrupar_por_shard(df).items():
+        relativo = os.path.join(_nombre_dir(flota), _nombre_dir(sistema))
+        os.makedirs(os.path.join(destino, relativo), exist_ok=True)
+        parte = df.iloc[pos]
+        parte.to_csv(os.path.join(destino, relativo, 'ots.csv'), index_label=COL_FILA)
+        np.save(os.path.join(destino, relativo, 'embeddings.npy'), np.ascontiguousarray(embeddings[pos]))
+        extremos = IndiceTemporal(fechas_ts(parte)).extremos()
+        shards.append({
+            'flota': flota,
+            'sistema': sistema,
+            'filas': int(len(pos)),
+            'dir': relativo,
+            'fecha_min': extremos[0].isoformat() if extremos[0] is not None else None,
+            'fecha_max': extremos[1].isoformat() if extremos[1] is not None else None,
+        })
+    manifiesto = {
+        'version': uuid.uuid4().hex[:12],
+        'dimension': int(embeddings.shape[1]),
+        'shards': shards,
+    }
+    # El manifiesto se escribe el último: un lector nunca ve un manifiesto con shards a medias
+    tmp = os.path.join(destino, MANIFIESTO + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, os.path.join(destino, MANIFIESTO))
+    return manifiesto
+
+
+class Shard:
+    """Órdenes de una flota y un sistema, con sus embeddings e índice temporal.
+
+    `tabla` es un DataFrame o una `TablaCompacta` (p. ej. una rebanada del plano compartido).
+    """
+
+    def __init__(self, flota, sistema, tabla, embeddings):
+        self.flota = flota
+        self.sistema = sistema
+        self.tabla = tabla
+        self.embeddings = embeddings
+        if isinstance(tabla, TablaCompacta):
+            ts = tabla.columna(COL_FECHA_TS)
+        else:
+            ts = fechas_ts(tabla)
+        self.indice_fechas = IndiceTemporal(ts)
+        self.normalizados = normalizados(embeddings)
+
+    @classmethod
+    def cargar(cls, directorio, flota, sistema):
+        df = leer_ots(os.path.join(directorio, 'ots.csv')).set_index(COL_FILA)
+        df.index.name = None
+        # mmap: el shard no ocupa memoria hasta que se lee
+        embeddings = np.load(os.path.join(directorio, 'embeddings.npy'), mmap_mode='r')
+        return cls(flota, sistema, df, embeddings)
+
+    def __len__(self):
+        return len(self.tabla)
+
+    def filas(self, posiciones):
+        if isinstance(self.tabla, TablaCompacta):
+            return self.tabla.filas(posiciones)
+        return self.tabla.iloc[posiciones].copy()
+
+    def candidatos(self, query_vec, n, desde=None, hasta=None):
+        """(posiciones, puntuaciones) de los n mejores candidatos del shard."""
+        if self.normalizados:
+            scores = puntuar_normalizados(query_vec, self.embeddings)
+        else:
+            scores = puntuar(query_vec[None, :], self.embeddings)
+        if desde is not None or hasta is not None:
+            scores = np.where(self.indice_fechas.mascara(desde, hasta), scores, -np.inf)
+        pos = top_k_indices(scores, n)
+        pos = pos[np.isfinite(scores[pos])]
+        return pos, scores[pos]
+
+
+class RouterShards:
+    """Selecciona los shards que necesita una consulta, los carga bajo demanda y fusiona resultados."""
+
+    def __init__(self, manifiesto, directorio=None, shards=None, max_hilos=MAX_HILOS):
+        self.manifiesto = manifiesto
+        self.directorio = directorio
+        self.version = manifiesto.get('version')
+        self.plano = None
+        self._entradas = {(s['flota'], s['sistema']): s for s in manifiesto['shards']}
+        self._cargados = dict(shards or {})
+        self._base = frozenset(self._entradas)
+        self._deltas = {}
+        # Posición del registro de ingesta ya aplicada (ver `logica.ingesta`)
+        self.registro = None
+        self._lock = threading.Lock()
+        self._locks_carga = {clave: threading.Lock() for clave in self._entradas}
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix='shards')
+
+    @classmethod
+    def abrir(cls, directorio=DIR_SHARDS, **kwargs):
+        with open(os.path.join(directorio, MANIFIESTO), encoding='utf-8') as f:
+            return cls(json.load(f), directorio=directorio, **kwargs)
+
+    @classmethod
+    def desde_dataframe(cls, df, embeddings, **kwargs):
+        """Router en memoria (sin ficheros) sobre un DataFrame y sus embeddings alineados."""
+        df = preparar_ots(df)
+        shards, entradas = {}, []
+        for (flota, sistema), pos in agrupar_por_shard(df).items():
+            shards[(flota, sistema)] = Shard(flota, sistema, df.iloc[pos], embeddings[pos])
+            entradas.append({'flota': flota, 'sistema': sistema, 'filas': int(len(pos))})
+        manifiesto = {'version': None, 'dimension': int(embeddings.shape[1]), 'shards': entradas}
+        return cls(manifiesto, shards=shards, **kwargs)
+
+    @classmethod
+    def desde_plano(cls, plano, **kwargs):
+        """Router sobre un plano compartido (`logica.memoria_compartida`): los shards son vistas."""
+        shards, entradas = {}, []
+        for entrada in plano.shards:
+            clave = (entrada['flota'], entrada['sistema'])
+            shards[clave] = Shard(*clave, *plano.shard(entrada))
+            entradas.append({'flota': clave[0], 'sistema': clave[1], 'filas': entrada['filas']})
+        manifiesto = {'version': os.path.basename(plano.ruta), 'dimension': int(plano.embeddings.shape[1]), 'shards': entradas}
+        router = cls(manifiesto, shards=shards, **kwargs)
+        router.plano = plano
+        return router
+
+    @staticmethod
+    def existe(directorio=DIR_SHARDS):
+        return os.path.exists(os.path.join(directorio, MANIFIESTO))
+
+    # --- Selección ---
+
+    def flotas(self):
+        return sorted({f for f, _ in self._entradas})
+
+    def sistemas(self):
+        return sorted({s for _, s in self._entradas})
+
+    def claves(self, flotas=None, sistemas=None):
+        """Shards de las flotas y sistemas indicados (None = todos)."""
+        flotas = set(flotas) if flotas else None
+        sistemas = set(sistemas) if sistemas else None
+        return [
+            (f, s) for (f, s) in sorted(self._entradas)
+            if (flotas is None or f in flotas) and (sistemas is None or s in sistemas)
+        ]
+
+    def filas(self, flotas=None, sistemas=None):
+        return sum(self._entradas[c]['filas'] for c in self.claves(flotas, sistemas))
+
+    def extremos(self, flotas=None, sistemas=None):
+        """(fecha mínima, fecha máxima) de los shards seleccionados, sin cargarlos si es posible."""
+        minimos, maximos = [], []
+        for clave in self.claves(flotas, sistemas):
+            extremos = [self._extremos_base(clave)] if clave in self._base else []
+            if clave in self._deltas:
+                extremos.append(self._deltas[clave].indice_fechas.extremos())
+            for fmin, fmax in extremos:
+                if fmin is not None:
+                    minimos.append(fmin)
+                    maximos.append(fmax)
+        if not minimos:
+            return None, None
+        return min(minimos), max(maximos)
+
+    def _extremos_base(self, clave):
+        entrada = self._entradas[clave]
+        if 'fecha_min' not in entrada:
+            return self.shard(clave).indice_fechas.extremos()
+        fmin, fmax = entrada['fecha_min'], entrada['fecha_max']
+        return (pd.Timestamp(fmin) if fmin else None), (pd.Timestamp(fmax) if fmax else None)
+
+    # --- Carga ---
+
+    def shard(self, clave):
+        shard = self._cargados.get(clave)
+        if shard is not None:
+            return shard
+        with self._locks_carga[clave]:
+            shard = self._cargados.get(clave)
+            if shard is None:
+                entrada = self._entradas[clave]
+                shard = Shard.cargar(os.path.join(self.directorio, entrada['dir']), *clave)
+                with self._lock:
+                    self._cargados[clave] = shard
+        return shard
+
+    def cargados(self):
+        return sorted(self._cargados)
+
+    def _shards_de(self, clave):
+        """Shard base (si lo hay) y shard delta de una clave."""
+        shards = [self.shard(clave)] if clave in self._base else []
+        if clave in self._deltas:
+            shards.append(self._deltas[clave])
+        return shards
+
+    # --- OTs nuevas ---
+
+    def agregar(self, df, embeddings):
+        """Router nuevo con las filas de `df` (y sus embeddings alineados) añadidas.
+
+        Las filas de cada (flota, sistema) se juntan con las de ese shard delta, que es pequeño
+        (sólo lo ingerido desde la última compactación): los shards base no se copian ni se
+        vuelven a cargar. Este router no cambia, así que las búsquedas en curso terminan con él.
+        El índice de `df` se conserva como etiqueta de las filas.
+        """
+        if len(df) != embeddings.shape[0]:
+            raise ValueError(f'{len(df)} filas y {embeddings.shape[0]} embeddings: no están alineados')
+        df = preparar_ots(df.copy())
+        nuevo = copy.copy(self)
+        nuevo._entradas = {clave: dict(entrada) for clave, entrada in self._entradas.items()}
+        nuevo._deltas = dict(self._deltas)
+        nuevo._locks_carga = dict(self._locks_carga)
+        for (flota, sistema), pos in agrupar_por_shard(df).items():
+            clave = (flota, sistema)
+            parte, emb = df.iloc[pos], np.asarray(embeddings[pos], dtype=np.float32)
+            previo = nuevo._deltas.get(clave)
+            if previo is not None:
+                parte, emb = pd.concat([previo.tabla, parte]), np.concatenate([previo.embeddings, emb])
+            nuevo._deltas[clave] = Shard(flota, sistema, parte, emb)
+            entrada = nuevo._entradas.setdefault(clave, {'flota': flota, 'sistema': sistema, 'filas': 0})
+            entrada['filas'] += int(len(pos))
+            nuevo._locks_carga.setdefault(clave, threading.Lock())
+        nuevo.version = f"{self.manifiesto.get('version') or ''}+{nuevo.filas_delta()}"
+        return nuevo
+
+    def filas_delta(self):
+        return sum(len(d) for d in self._deltas.values())
+
+    # --- Búsqueda ---
+
+    def _buscar_en(self, clave, query_vec, n, desde, hasta):
+        return [(shard, *shard.candidatos(query_vec, n, desde, hasta)) for shard in self._shards_de(clave)]
+
+    def buscar(self, query_vec, top_k=10, flotas=None, sistemas=None, diversidad=None, desde=None, hasta=None):
+        """Vecinos más similares en los shards seleccionados, como DataFrame con `similaridad`.
+
+        Cada shard aporta sus mejores candidatos (top_k, o el conjunto de candidatos de MMR si se
+        pide `diversidad`) y se fusionan por puntuación; con `diversidad` el MMR se aplica después
+        de fusionar, sobre los candidatos de todos los shards.
+        """
+        query_vec = np.asarray(query_vec, dtype=np.float32).ravel()
+        claves = self.claves(flotas, sistemas)
+        n = top_k if diversidad is None else min(max(top_k * FACTOR_CANDIDATOS, top_k), MAX_CANDIDATOS)
+        if len(claves) == 1:
+            por_clave = [self._buscar_en(claves[0], query_vec, n, desde, hasta)]
+        else:
+            por_clave = list(self._pool.map(lambda c: self._buscar_en(c, query_vec, n, desde, hasta), claves))
+        parciales = [p for parte in por_clave for p in parte if len(p[1])]
+        if not parciales:
+            return pd.DataFrame(columns=['flota', 'sistema', 'similaridad'])
+
+        scores = np.concatenate([s for _, _, s in parciales])
+        origen = np.concatenate([np.full(len(p), i) for i, (_, p, _) in enumerate(parciales)])
+        pos = np.concatenate([p for _, p, _ in parciales])
+        elegidos = top_k_indices(scores, n)
+        if diversidad is not None:
+            candidatos = np.stack([parciales[origen[i]][0].embeddings[pos[i]] for i in elegidos])
+            elegidos = elegidos[mmr(query_vec, candidatos, top_k, lambda_=diversidad)]
+
+        filas = []
+        for i in elegidos:
+            shard = parciales[origen[i]][0]
+            fila = shard.filas([pos[i]])
+            fila['flota'] = shard.flota
+            fila['sistema'] = shard.sistema
+            fila['similaridad'] = scores[i]
+            filas.append(fila)
+        return pd.concat(filas)
+
+    def cerrar(self):
+        self._pool.shutdown(wait=False)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2:
+        print('Uso: python -m logica.shards <ots.csv> <embeddings.npy> [destino]')
+        return 2
+    df = leer_ots(argv[0])
+    embeddings = np.load(argv[1])
+    destino = argv[2] if len(argv) > 2 else DIR_SHARDS
+    manifiesto = particionar(df, embeddings, destino)
+    for s in manifiesto['shards']:
+        print(f"{s['flota']:>10} / {s['sistema']:<12} {s['filas']:>8} filas")
+    print(f"{len(manifiesto['shards'])} shards en {destino} (versión {manifiesto['version']})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
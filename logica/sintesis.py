@@ -0,0 +1,151 @@
+"""Síntesis de una respuesta a partir de los vecinos encontrados, con un LLM local.
+
+El modelo se sirve con un servidor compatible con Ollama (`ollama serve`). Las peticiones van
+por una sesión HTTP persistente y la respuesta se recibe token a token, de modo que la interfaz
+puede ir mostrándola mientras se genera. Las respuestas completas se cachean por
+(modelo, conjunto de claveros, ids de los vecinos).
+"""
+import json
+import os
+import threading
+
+import pandas as pd
+import requests
+from cachetools import LRUCache
+
+OLLAMA_URL = os.environ.get('OLLAMA_URL', 'http://localhost:11434')
+OLLAMA_MODELO = os.environ.get('OLLAMA_MODELO', 'phi3:mini')
+
+MAX_VECINOS_PROMPT = 5
+MAX_CARACTERES_CAMPO = 300
+MAX_CARACTERES_PROMPT = 4000
+
+
+class ErrorLLM(RuntimeError):
+    """El servidor del modelo no está disponible o ha devuelto un error."""
+
+
+def _recortar(texto, limite=MAX_CARACTERES_CAMPO):
+    if texto is None or (not isinstance(texto, str) and pd.isna(texto)):
+        return ''
+    texto = ' '.join(str(texto).split())
+    return texto if len(texto) <= limite else texto[:limite - 1] + '…'
+
+
+def construir_prompt(consulta, vecinos, definiciones=None, max_vecinos=MAX_VECINOS_PROMPT, max_caracteres=MAX_CARACTERES_PROMPT):
+    """Prompt acotado con la avería del operario y las reparaciones de los vecinos.
+
+    `vecinos` es el DataFrame devuelto por `buscar_averias` (se usa en su orden);
+    `definiciones` mapea clavero_actuacion -> definición del manual. Los vecinos que no caben en
+    `max_caracteres` se descartan enteros.
+    """
+    definiciones = definiciones or {}
+    cabecera = (
+        "Eres un asistente de mantenimiento ferroviario. Un operario describe esta avería:\n"
+        f"'{_recortar(consulta, 500)}'\n\n"
+        "Estas son órdenes de trabajo históricas similares y cómo se resolvieron:\n"
+    )
+    pie = (
+        "\nCon esa información, explica en pocas frases qué componente es el más probable "
+        "y qué actuación recomiendas. No inventes códigos que no aparezcan arriba.\n"
+    )
+
+    bloques = []
+    usado = len(cabecera) + len(pie)
+    for i, (_, fila) in enumerate(vecinos.head(max_vecinos).iterrows(), 1):
+        codigo = fila.get('clavero_actuacion', '')
+        lineas = [f"Orden {i}: {_recortar(fila.get('descripcion_ot'))}"]
+        if _recortar(fila.get('descripcion_averia')):
+            lineas.append(f"  Avería: {_recortar(fila.get('descripcion_averia'))}")
+        if _recortar(fila.get('descripcion_reparacion')):
+            lineas.append(f"  Reparación: {_recortar(fila.get('descripcion_reparacion'))}")
+        if _recortar(codigo):
+            lineas.append(f"  Código tarea: {_recortar(codigo)}")
+            if definiciones.get(codigo):
+                lineas.append(f"  Definición del manual: {_recortar(definiciones[codigo])}")
+        bloque = '\n'.join(lineas) + '\n'
+        if usado + len(bloque) > max_caracteres:
+            break
+        bloques.append(bloque)
+        usado += len(bloque)
+
+    return cabecera + ''.join(bloques) + pie
+
+
+class ClienteOllama:
+    """Cliente HTTP de un servidor compatible con Ollama con conexión persistente."""
+
+    def __init__(self, url=OLLAMA_URL, modelo=OLLAMA_MODELO, timeout=(3.05, 60)):
+        self.url = url.rstrip('/')
+        self.modelo = modelo
+        self.timeout = timeout
+        self._sesion = requests.Session()
+
+    def generar(self, prompt, **opciones):
+        """Genera la respuesta token a token (generador de fragmentos de texto)."""
+        cuerpo = {'model': self.modelo, 'prompt': prompt, 'stream': True}
+        if opciones:
+            cuerpo['options'] = opciones
+        try:
+            with self._sesion.post(f'{self.url}/api/generate', json=cuerpo, stream=True, timeout=self.timeout) as resp:
+                if resp.status_code != 200:
+                    raise ErrorLLM(f'El servidor del modelo respondió {resp.status_code}: {resp.text[:200]}')
+                for linea in resp.iter_lines():
+                    if not linea:
+                        continue
+                    fragmento = json.loads(linea)
+                    if fragmento.get('error'):
+                        raise ErrorLLM(fragmento['error'])
+                    if fragmento.get('response'):
+                        yield fragmento['response']
+                    if fragmento.get('done'):
+                        return
+        except requests.RequestException as exc:
+            raise ErrorLLM(f'No se pudo contactar con el modelo en {self.url}: {exc}') from exc
+
+    def cerrar(self):
+        self._sesion.close()
+
+
+class CacheRespuestas:
+    """Caché LRU de respuestas completas, segura entre hilos."""
+
+    def __init__(self, maxsize=256):
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave(modelo, vecinos, col_clave='clavero'):
+        claveros = frozenset(vecinos[col_clave].dropna()) if col_clave in vecinos.columns else frozenset()
+        return modelo, claveros, tuple(vecinos.index.tolist())
+
+    def get(self, clave):
+        with self._lock:
+            return self._cache.get(clave)
+
+    def set(self, clave, respuesta):
+        with self._lock:
+            self._cache[clave] = respuesta
+
+
+def sintetizar(consulta, vecinos, cliente, cache=None, definiciones=None):
+    """Respuesta combinada de los vecinos, en streaming.
+
+    Si la respuesta está en caché se devuelve de una vez; si no, se van devolviendo los
+    fragmentos según llegan y se guarda en caché al terminar la generación.
+    """
+    clave = CacheRespuestas.clave(cliente.modelo, vecinos) if cache is not None else None
+    if clave is not None:
+        cacheada = cache.get(clave)
+        if cacheada is not None:
+            yield cacheada
+            return
+
+    prompt = construir_prompt(consulta, vecinos, definiciones)
+    partes = []
+    for fragmento in cliente.generar(prompt):
+        partes.append(fragmento)
+        yield fragmento
+
+    if clave is not None:
+        cache.set(clave, ''.join(partes))
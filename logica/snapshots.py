@@ -0,0 +1,158 @@
+"""Snapshots versionados de los datos con recarga en caliente.
+
+Un `GestorSnapshots` guarda el snapshot vigente (p. ej. el router de búsqueda o los datos de
+`logica.modelo`) y un hilo vigila la huella de sus ficheros de origen. Cuando cambian, el nuevo
+snapshot se construye en segundo plano, con índices y agregados incluidos, y después se sustituye
+el vigente con una sola asignación. Una búsqueda toma el snapshot al empezar (`actual()`) y
+termina con él aunque entretanto se publique otro; mientras se construye el nuevo se sigue
+sirviendo el anterior, así que no hay arranque en frío tras una actualización.
+
+Para evitar cargar ficheros a medio escribir, un cambio sólo se aplica cuando la huella se
+mantiene estable durante dos comprobaciones seguidas. Si la construcción falla se conserva el
+snapshot anterior y se vuelve a intentar con el siguiente cambio.
+
+Con un `registro` (los ficheros de un registro de sólo añadir, ver `logica.ingesta`), un cambio
+que sólo afecta al registro no reconstruye el snapshot: `actualizar(snapshot)` devuelve uno nuevo
+con las filas añadidas aplicadas sobre el vigente.
+
+El intervalo de comprobación se lee de AVERIAS_RECARGA_S (segundos, 0 = sin recarga).
+"""
+import logging
+import os
+import threading
+import time
+
+from logica.instrumentacion import contar, medir
+from logica.memoria_compartida import huella
+
+ENV_INTERVALO = 'AVERIAS_RECARGA_S'
+INTERVALO_S = 5.0
+
+log = logging.getLogger(__name__)
+
+
+def intervalo_recarga():
+    try:
+        return float(os.environ.get(ENV_INTERVALO, INTERVALO_S))
+    except ValueError:
+        return INTERVALO_S
+
+
+class GestorSnapshots:
+    """Snapshot vigente de unos datos y recarga en segundo plano cuando cambian sus `fuentes`.
+
+    `construir()` devuelve el objeto del snapshot; `fuentes` es la lista de ficheros a vigilar (o
+    una función que la devuelve, si depende de qué ficheros existen). `al_publicar(nuevo, viejo)`
+    se llama tras cada sustitución. Si sólo cambian los ficheros de `registro` se llama a
+    `actualizar(vigente)`; si devuelve None se reconstruye todo.
+    """
+
+    def __init__(self, nombre, construir, fuentes, intervalo=None, al_publicar=None, registro=(), actualizar=None):
+        self.nombre = nombre
+        self._construir = construir
+        self._fuentes = fuentes
+        self._registro = registro
+        self._actualizar = actualizar
+        self.intervalo = intervalo_recarga() if intervalo is None else intervalo
+        self._al_publicar = al_publicar
+        self._actual = None
+        self.version = None
+        self.publicado = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo = None
+        self._fallida = None
+
+    @staticmethod
+    def _existentes(ficheros):
+        ficheros = ficheros() if callable(ficheros) else ficheros
+        return [f for f in ficheros if os.path.exists(f)]
+
+    def fuentes(self):
+        return self._existentes(self._fuentes)
+
+    def huella(self):
+        """(huella de las fuentes, huella del registro)."""
+        return huella(*self.fuentes()), huella(*self._existentes(self._registro))
+
+    def actual(self):
+        """Snapshot vigente; el primero se construye en la llamada (y arranca la vigilancia)."""
+        snapshot = self._actual
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if self._actual is None:
+                version = self.huella()
+                self._publicar(self._construir_medido(), version)
+                self._arrancar()
+            return self._actual
+
+    def publicar(self, snapshot, version=None):
+        """Sustituye el snapshot vigente (p. ej. con datos construidos fuera del gestor)."""
+        with self._lock:
+            self._publicar(snapshot, version)
+
+    def _publicar(self, snapshot, version):
+        viejo = self._actual
+        self._actual = snapshot
+        self.version = version
+        self.publicado = time.time()
+        if viejo is not None:
+            contar(f'snapshots.{self.nombre}.recargas')
+            log.info('snapshot %s: publicada la versión %s', self.nombre, version)
+        if self._al_publicar is not None:
+            self._al_publicar(snapshot, viejo)
+
+    def _construir_medido(self):
+        with medir(f'snapshots.{self.nombre}.construir'):
+            return self._construir()
+
+    def _actualizar_medido(self, snapshot):
+        with medir(f'snapshots.{self.nombre}.actualizar'):
+            nuevo = self._actualizar(snapshot)
+        if nuevo is not None:
+            contar(f'snapshots.{self.nombre}.actualizaciones')
+        return nuevo
+
+    # --- Vigilancia ---
+
+    def _arrancar(self):
+        if self.intervalo <= 0 or self._hilo is not None:
+            return
+        self._hilo = threading.Thread(target=self._vigilar, name=f'snapshots-{self.nombre}', daemon=True)
+        self._hilo.start()
+
+    def comprobar(self, pendiente=None):
+        """Una comprobación: recarga si la huella cambió y coincide con `pendiente`.
+
+        Devuelve la huella nueva si cambió pero aún no es estable (para la siguiente llamada).
+        """
+        try:
+            version = self.huella()
+        except OSError:
+            return None  # un fichero se está sustituyendo
+        if version in (self.version, self._fallida):
+            return None
+        if version != pendiente:
+            return version
+        # Mismas fuentes y registro distinto: basta con aplicar lo añadido al snapshot vigente
+        incremental = self._actualizar is not None and self.version is not None and version[0] == self.version[0]
+        try:
+            nuevo = self._actualizar_medido(self._actual) if incremental else None
+            if nuevo is None:
+                nuevo = self._construir_medido()
+        except Exception:
+            log.exception('snapshot %s: error al construir la versión %s; se mantiene la anterior', self.nombre, version)
+            contar(f'snapshots.{self.nombre}.errores')
+            self._fallida = version
+            return None
+        self.publicar(nuevo, version)
+        return None
+
+    def _vigilar(self):
+        pendiente = None
+        while not self._parar.wait(self.intervalo):
+            pendiente = self.comprobar(pendiente)
+
+    def parar(self):
+        self._parar.set()
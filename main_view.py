@@ -2,6 +2,9 @@ import streamlit as st
 import vistas.modelo_form as modelo_form
 import vistas.tabla_averias_modelo as tabla_averias_modelo
 import vistas.claverogenerador_view as claverogenerador_view
+import vistas.estadisticas_view as estadisticas_view
+from logica.instrumentacion import iniciar_traza, cerrar_traza
+from vistas.panel_debug import perfil_activo, render_panel_debug
 
 def load_css():
     """Injects custom CSS to style the Streamlit app like a corporate landing page."""
@@ -102,6 +105,18 @@ def main():
     # Set page config
     st.set_page_config(page_title="Mobility Solutions", layout="wide")
     
+    traza = iniciar_traza("main_view", perfilar=perfil_activo())
+    # Close the trace even if a view raises (or Streamlit stops/reruns the script); the debug
+    # panel is only rendered after a normal run
+    try:
+        render_page()
+    finally:
+        cerrar_traza(traza)
+    render_panel_debug(traza)
+
+
+def render_page():
+    """Landing page with the option cards and the selected view."""
     # Load custom CSS
     load_css()
 
@@ -157,6 +172,20 @@ def main():
         if st.button("Ver averías por modelo", key="b3"):
             st.session_state.page = "Modelo"
 
+    _, col4, _ = st.columns([1, 1, 1])
+
+    with col4:
+        st.markdown("""
+            <div class="card">
+                <h3>Frecuencia de averías</h3>
+                <p>
+                    Consulta cuántas veces falla cada componente por mes, unidad y modelo, y el tiempo medio entre averías (MTBF).
+                </p>
+            </div>
+        """, unsafe_allow_html=True)
+        if st.button("Ver frecuencia de averías", key="b4"):
+            st.session_state.page = "Estadisticas"
+
     # Display the selected "page" for demonstration or render the modelo_form view
     if "page" in st.session_state:
         if st.session_state.page == "Modelo":
@@ -168,6 +197,9 @@ def main():
         elif st.session_state.page == "ClaveroGenerador":
             # Render the claverogenerador view in-place
             claverogenerador_view.render_claverogenerador()
+        elif st.session_state.page == "Estadisticas":
+            # Render the failure-frequency / MTBF view backed by the precomputed cube
+            estadisticas_view.render_estadisticas()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
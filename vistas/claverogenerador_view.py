@@ -2,6 +2,18 @@ import streamlit as st
 import pandas as pd
 import os
 
+from logica.indice_actuaciones import IndiceActuaciones, cargar_o_construir
+from logica.ingesta import cargar_modelo, codificar
+from logica.instrumentacion import medir
+from logica.jerarquia import (
+    opciones_nivel1,
+    filtrar_nivel1,
+    opciones_nivel2,
+    filtrar_nivel2,
+    componentes_finales,
+    resolver_clavero,
+)
+
 
 @st.cache_data
 def cargar_datos_view():
@@ -20,17 +32,35 @@ def cargar_datos_view():
         return None
 
 
-@st.cache_data
-def cargar_diccionario_view():
-    try:
-        csv_path = os.path.join('data', 'diccionario.csv')
-        if not os.path.exists(csv_path):
-            return None
-        return pd.read_csv(csv_path)
-    except Exception:
+@st.cache_resource
+def cargar_modelo_view():
+    return cargar_modelo()
+
+
+@st.cache_resource
+def cargar_actuaciones_view(version=None):
+    """Actuaciones del diccionario ordenadas por clavero, sin embeddings (no carga el modelo)."""
+    csv_path = os.path.join('data', 'diccionario.csv')
+    if not os.path.exists(csv_path):
         return None
+    return IndiceActuaciones.construir(pd.read_csv(csv_path))
 
 
+@st.cache_resource
+def cargar_indice_view(version=None):
+    """Índice semántico de las definiciones del diccionario (se reconstruye si cambia el CSV)."""
+    csv_path = os.path.join('data', 'diccionario.csv')
+    if not os.path.exists(csv_path):
+        return None
+    return cargar_o_construir(csv_path, codificar_textos=lambda textos: codificar(textos, cargar_modelo_view()))
+
+
+def _version_diccionario():
+    csv_path = os.path.join('data', 'diccionario.csv')
+    return os.path.getmtime(csv_path) if os.path.exists(csv_path) else None
+
+
+@medir('vista.claverogenerador')
 def render_claverogenerador():
     """Renderiza la vista del generador de claveros (sin set_page_config)."""
     st.markdown("<div class='header'> <h1 style='text-align: center;'>🛠️ Generador de Claveros de Frenos</h1> </div>", unsafe_allow_html=True)
@@ -50,8 +80,7 @@ def render_claverogenerador():
 
     st.subheader("📋 Paso 1: Seleccione el sistema principal")
 
-    nivel1_opciones = df[df['componente_nivel1'].notna()]['componente_nivel1'].unique()
-    nivel1_opciones = sorted([opt for opt in nivel1_opciones if opt != ''])
+    nivel1_opciones = opciones_nivel1(df)
 
     if len(nivel1_opciones) == 0:
         st.warning("⚠️ No se encontraron sistemas principales en el archivo CSV.")
@@ -62,33 +91,25 @@ def render_claverogenerador():
         return
     st.session_state.nivel1_sel = nivel1_seleccionado
 
-    df_filtrado_n1 = df[df['componente_nivel1'] == nivel1_seleccionado]
+    df_filtrado_n1 = filtrar_nivel1(df, nivel1_seleccionado)
     st.markdown("---")
 
     st.subheader("📋 Paso 2: Seleccione el subsistema")
-    nivel2_opciones = df_filtrado_n1[df_filtrado_n1['nivel'] == 2]['componente'].unique()
-    nivel2_opciones = sorted([opt for opt in nivel2_opciones if opt != ''])
-
-    nivel3_sin_nivel2 = df_filtrado_n1[(df_filtrado_n1['nivel'] == 3) & ~df_filtrado_n1['clavero'].str[:7].isin(df_filtrado_n1[df_filtrado_n1['nivel'] == 2]['clavero'])]
-    if not nivel3_sin_nivel2.empty:
-        nivel2_opciones = list(nivel2_opciones) + ['Otros']
+    nivel2_opciones, nivel3_sin_nivel2 = opciones_nivel2(df_filtrado_n1)
 
     nivel2_seleccionado = st.selectbox("Subsistema:", options=['Seleccione...'] + list(nivel2_opciones), key='select_nivel2')
     if nivel2_seleccionado == 'Seleccione...':
         return
     st.session_state.nivel2_sel = nivel2_seleccionado
 
-    if nivel2_seleccionado == 'Otros':
-        df_filtrado_n2 = nivel3_sin_nivel2
-    else:
-        df_filtrado_n2 = df_filtrado_n1[df_filtrado_n1['componente_nivel2'] == nivel2_seleccionado]
+    df_filtrado_n2 = filtrar_nivel2(df_filtrado_n1, nivel2_seleccionado, nivel3_sin_nivel2)
 
     st.markdown("---")
     st.subheader("📋 Paso 3: Seleccione el componente")
 
-    componentes_finales = df_filtrado_n2[df_filtrado_n2['nivel'] == 3]['componente'].unique()
-    if len(componentes_finales) > 0:
-        componente_seleccionado = st.selectbox("Componente:", options=['Seleccione...'] + list(sorted(componentes_finales)), key='select_componente')
+    componentes = componentes_finales(df_filtrado_n2)
+    if len(componentes) > 0:
+        componente_seleccionado = st.selectbox("Componente:", options=['Seleccione...'] + componentes, key='select_componente')
         if componente_seleccionado == 'Seleccione...':
             return
         st.session_state.componente_sel = componente_seleccionado
@@ -102,26 +123,14 @@ def render_claverogenerador():
         st.session_state.clavero_generado = None
         st.session_state.ruta_seleccion = []
 
-        if st.session_state.componente_sel:
-            resultado = df[(df['componente_nivel1'] == st.session_state.nivel1_sel) & (df['componente_nivel2'] == st.session_state.nivel2_sel) & (df['componente'] == st.session_state.componente_sel) & (df['nivel'] == 3)]
-            st.session_state.ruta_seleccion = [st.session_state.nivel1_sel, st.session_state.nivel2_sel, st.session_state.componente_sel]
-        elif st.session_state.nivel2_sel:
-            resultado = df[(df['componente_nivel1'] == st.session_state.nivel1_sel) & (df['componente'] == st.session_state.nivel2_sel) & (df['nivel'] == 2)]
-            st.session_state.ruta_seleccion = [st.session_state.nivel1_sel, st.session_state.nivel2_sel]
-        else:
-            resultado = df[(df['componente'] == st.session_state.nivel1_sel) & (df['nivel'] == 1)]
-            st.session_state.ruta_seleccion = [st.session_state.nivel1_sel]
-
-        if not resultado.empty:
-            st.session_state.clavero_generado = resultado.iloc[0]['clavero']
-        else:
-            st.session_state.clavero_generado = None
+        clavero, ruta = resolver_clavero(df, st.session_state.nivel1_sel, st.session_state.nivel2_sel, st.session_state.componente_sel)
+        st.session_state.ruta_seleccion = ruta
+        st.session_state.clavero_generado = clavero
 
     if st.session_state.get('clavero_generado'):
         clavero_generated = st.session_state.clavero_generado
-        df_diccionario = cargar_diccionario_view()
-        if df_diccionario is not None:
-            actuaciones = df_diccionario[df_diccionario.iloc[:, 0] == clavero_generated]
+        actuaciones = cargar_actuaciones_view(_version_diccionario())
+        if actuaciones is not None:
             st.markdown('---')
             st.markdown('### ✅ Resultado')
             st.write('**Ruta seleccionada:**')
@@ -131,30 +140,37 @@ def render_claverogenerador():
 
             st.markdown(f"<div style='background-color: #e7f3fe; padding: 20px; border-radius: 10px; border-left: 5px solid #2196F3; margin-top: 20px;'><h2 style='color: #0b5394; margin: 0;'>➡️ Clavero base:</h2><h1 style='color: #0b5394; margin: 10px 0 0 0; font-size: 36px;'>{clavero_generated}</h1></div>", unsafe_allow_html=True)
 
-            if not actuaciones.empty:
-                descripcion_col = actuaciones.columns[3] if len(actuaciones.columns) > 3 else actuaciones.columns[1]
-                actuaciones_validas = actuaciones[actuaciones[descripcion_col].notna() & (actuaciones[descripcion_col].astype(str).str.strip() != '')]
-                if actuaciones_validas.empty:
-                    st.info('ℹ️ No existe actuación preexistente para este clavero.')
-                else:
-                    st.markdown('### 📋 Seleccione la actuación realizada:')
-                    opciones_map = {}
-                    for _, row in actuaciones_validas.iterrows():
-                        display = f"{row.iloc[1]} - {row.iloc[3]}"
-                        opciones_map[display] = (row.iloc[1], row.iloc[3])
-                    st.session_state.opciones_map = opciones_map
-                    actuacion = st.selectbox('Tipo de actuación:', options=['Seleccione...'] + list(opciones_map.keys()), key='select_actuacion')
-                    if st.session_state.get('select_actuacion') and st.session_state.select_actuacion != 'Seleccione...':
-                        sel = st.session_state.select_actuacion
-                        codigo_txx, descripcion = st.session_state.opciones_map[sel]
-                        clavero_final = f"{clavero_generated}{codigo_txx}"
-                        st.markdown('---')
-                        st.markdown('### 📑 Resumen')
-                        st.write(f"**Clavero base:** {clavero_generated}")
-                        st.write(f"**Actuación:** {sel}")
-                        st.write(f"**Código:** {codigo_txx}")
-                        st.write(f"**Descripción:** {descripcion}")
-                        st.markdown(f"<div style='background-color: #d4edda; padding: 12px; border-radius: 8px; border-left: 4px solid #28a745; margin-top: 10px;'><strong>Clavero final:</strong> <span style='font-size:18px'>{clavero_final}</span></div>", unsafe_allow_html=True)
+            # Sólo las actuaciones de este clavero; el modelo se carga únicamente si se escribe una
+            # descripción, para ordenarlas por similitud
+            descripcion_averia = st.text_input('Descripción de la avería (opcional, ordena las actuaciones):', key='descripcion_actuacion')
+            if descripcion_averia.strip():
+                with medir('actuaciones.rankear'):
+                    query_vec = codificar([descripcion_averia], cargar_modelo_view())[0]
+                    indice = cargar_indice_view(_version_diccionario())
+                    actuaciones_validas = indice.rankear(query_vec, clavero_generated, descendientes=False)
+            else:
+                actuaciones_validas = actuaciones.actuaciones(clavero_generated)
+            if actuaciones_validas.empty:
+                st.info('ℹ️ No existe actuación preexistente para este clavero.')
+            else:
+                st.markdown('### 📋 Seleccione la actuación realizada:')
+                opciones_map = {}
+                for row in actuaciones_validas.itertuples(index=False):
+                    display = f"{row.codigo} - {row.definicion}"
+                    opciones_map[display] = (row.codigo, row.definicion)
+                st.session_state.opciones_map = opciones_map
+                actuacion = st.selectbox('Tipo de actuación:', options=['Seleccione...'] + list(opciones_map.keys()), key='select_actuacion')
+                if st.session_state.get('select_actuacion') and st.session_state.select_actuacion != 'Seleccione...':
+                    sel = st.session_state.select_actuacion
+                    codigo_txx, descripcion = st.session_state.opciones_map[sel]
+                    clavero_final = f"{clavero_generated}{codigo_txx}"
+                    st.markdown('---')
+                    st.markdown('### 📑 Resumen')
+                    st.write(f"**Clavero base:** {clavero_generated}")
+                    st.write(f"**Actuación:** {sel}")
+                    st.write(f"**Código:** {codigo_txx}")
+                    st.write(f"**Descripción:** {descripcion}")
+                    st.markdown(f"<div style='background-color: #d4edda; padding: 12px; border-radius: 8px; border-left: 4px solid #28a745; margin-top: 10px;'><strong>Clavero final:</strong> <span style='font-size:18px'>{clavero_final}</span></div>", unsafe_allow_html=True)
 
     st.markdown('---')
     st.markdown("<p style='text-align: center; color: gray; font-size: 12px;'>Generador de Claveros v1.0 | Sistema de Mantenimiento Ferroviario</p>", unsafe_allow_html=True)
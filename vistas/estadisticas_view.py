@@ -0,0 +1,67 @@
+import streamlit as st
+
+from logica.instrumentacion import medir
+from logica.modelo import cubo_fallos
+
+PLACEHOLDER = "Seleccione..."
+ALL_MODELS = "Todos los modelos"
+
+
+@medir("vista.estadisticas")
+def render_estadisticas() -> None:
+    """Failure frequency per month and MTBF for a clavero, read from the precomputed cube."""
+    st.markdown(
+        """
+        <div class="header">
+            <h1>📈 Frecuencia de averías y MTBF</h1>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+    cubo = cubo_fallos()
+
+    st.subheader("📋 Paso 1: Seleccione el modelo")
+    models = sorted(m for m in cubo.modelos.valores if m)
+    model_choice = st.selectbox("Modelo", [ALL_MODELS] + models, key="stats_model")
+    model = None if model_choice == ALL_MODELS else model_choice
+
+    st.subheader("📋 Paso 2: Seleccione el clavero")
+    counts = cubo.conteo_claveros(model)
+    ordered = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+    labels = {f"{k} ({v})": k for k, v in ordered}
+    clavero_label = st.selectbox("Clavero", [PLACEHOLDER] + list(labels.keys()), key="stats_clavero")
+    if clavero_label == PLACEHOLDER:
+        return
+    clavero = labels[clavero_label]
+
+    st.markdown("---")
+    mtbf = cubo.mtbf_dias(clavero, modelo=model)
+    col1, col2 = st.columns(2)
+    col1.metric("Averías registradas", cubo.total(clavero, modelo=model))
+    col2.metric("MTBF medio por unidad", f"{mtbf:.0f} días" if mtbf is not None else "—")
+
+    serie = cubo.serie_mensual(clavero, modelo=model)
+    if serie.empty:
+        st.info("No hay averías con fecha para esta selección.")
+    else:
+        st.write("**Averías por mes**")
+        st.bar_chart(serie.set_index("mes")["averias"])
+
+    units = cubo.tabla_unidades(clavero, modelo=model)
+    if not units.empty:
+        st.write("**Por unidad**")
+        units = units.rename(columns={
+            "equipo": "Equipo",
+            "averias": "Averías",
+            "primera": "Primera",
+            "ultima": "Última",
+            "mtbf_dias": "MTBF (días)",
+        })
+        units["MTBF (días)"] = units["MTBF (días)"].round(1)
+        st.dataframe(units, use_container_width=True, hide_index=True)
+
+    if st.button("⏮️ Volver", use_container_width=True, key="stats_back"):
+        st.session_state.pop("page", None)
+        # Return to allow the app to re-run and show previous view
+        return
@@ -1,6 +1,7 @@
 import streamlit as st
 from typing import List, Dict, Tuple
 
+from logica.instrumentacion import medir
 from logica.modelo import get_models, give_claveros
 
 
@@ -63,6 +64,7 @@ def _format_claveros_map(claveros: Dict[str, int]) -> List[Tuple[str, str]]:
     return [(f"{k} ({v})", k) for k, v in items]
 
 
+@medir("vista.modelo_form")
 def render_model_form() -> None:
     """Render the model selection form.
 
@@ -0,0 +1,60 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+from logica.instrumentacion import exportar_prometheus
+
+
+def debug_activo() -> bool:
+    """El panel se activa con AVERIAS_DEBUG=1 o con `?debug=1` en la URL."""
+    if os.environ.get("AVERIAS_DEBUG") == "1":
+        return True
+    try:
+        return st.query_params.get("debug") == "1"
+    except Exception:
+        return False
+
+
+def perfil_activo() -> bool:
+    """Captura de cProfile por petición: AVERIAS_PERFIL=1 o `?perfil=1` (sólo con el panel activo)."""
+    if not debug_activo():
+        return False
+    if os.environ.get("AVERIAS_PERFIL") == "1":
+        return True
+    try:
+        return st.query_params.get("perfil") == "1"
+    except Exception:
+        return False
+
+
+def render_panel_debug(traza) -> None:
+    """Muestra los tiempos por etapa de la ejecución actual, sus contadores y el perfil si lo hay."""
+    if traza is None or not debug_activo():
+        return
+
+    with st.expander(f"🐞 Tiempos de la ejecución ({(traza.duracion or 0) * 1000:.1f} ms)", expanded=False):
+        resumen = traza.resumen()
+        if resumen:
+            df = pd.DataFrame(
+                [(etapa, llamadas, segundos * 1000) for etapa, (llamadas, segundos) in resumen.items()],
+                columns=["Etapa", "Llamadas", "Total (ms)"],
+            ).sort_values("Total (ms)", ascending=False)
+            st.dataframe(df, use_container_width=True, hide_index=True)
+        else:
+            st.write("No se ha medido ninguna etapa en esta ejecución.")
+
+        if traza.contadores:
+            st.write("**Contadores:**")
+            st.json(traza.contadores)
+
+        if traza.perfil:
+            st.write("**Perfil (cProfile):**")
+            st.code(traza.perfil, language="text")
+
+        st.download_button(
+            "Descargar métricas (Prometheus)",
+            exportar_prometheus(),
+            file_name="metricas.prom",
+            mime="text/plain",
+        )
@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
+from datetime import timedelta
 from typing import Optional
 
-from logica.modelo import give_work
+from logica.instrumentacion import medir
+from logica.modelo import give_work_pagina, indice_fechas
 
 # Column name constants (avoid repeated literals)
 COL_FECHA = "Fecha"
@@ -10,6 +12,11 @@ COL_ORDEN = "Orden de trabajo"
 COL_AVARIA = "Descripción avería"
 COL_REPAR = "Descripción reparación"
 COL_COMMENT = "Comentarios"
+COLUMNS = [COL_FECHA, COL_ORDEN, COL_AVARIA, COL_REPAR, COL_COMMENT]
+
+PAGE_SIZES = [25, 50, 100]
+ORDER_NEWEST = "Más recientes primero"
+ORDER_OLDEST = "Más antiguas primero"
 
 def _load_css():
     """Small CSS for the table header."""
@@ -25,6 +32,24 @@ def _load_css():
     )
 
 
+def _date_range_input():
+    """Optional period filter. Returns (from, to) with 'to' exclusive, or (None, None)."""
+    min_date, max_date = indice_fechas().extremos()
+    if min_date is None:
+        return None, None
+    period = st.date_input(
+        "Periodo",
+        value=(min_date.date(), max_date.date()),
+        min_value=min_date.date(),
+        max_value=max_date.date(),
+        key="table_period",
+    )
+    if len(period) != 2 or (period[0] == min_date.date() and period[1] == max_date.date()):
+        return None, None
+    return period[0], period[1] + timedelta(days=1)
+
+
+@medir("vista.tabla_averias_modelo")
 def render_table_for_model(primary: Optional[str] = None, secondary: Optional[str] = None) -> None:
     """Render an example table for the given model.
 
@@ -69,21 +94,48 @@ def render_table_for_model(primary: Optional[str] = None, secondary: Optional[st
             unsafe_allow_html=True,
         )
 
-    # Load real rows from the data layer using give_work(clavero)
+    col_size, col_order, col_dates = st.columns([1, 2, 2])
+    with col_size:
+        page_size = st.selectbox("Filas por página", PAGE_SIZES, index=1, key="table_page_size")
+    with col_order:
+        order = st.radio("Orden", [ORDER_NEWEST, ORDER_OLDEST], horizontal=True, key="table_order")
+    with col_dates:
+        date_from, date_to = _date_range_input()
+
+    # Reset to the first page whenever the selection, page size, order or period changes
+    selection = (primary, secondary, page_size, order, date_from, date_to)
+    if st.session_state.get("table_selection") != selection:
+        st.session_state["table_selection"] = selection
+        st.session_state["table_page"] = 1
+
+    # Load only the visible page from the data layer (comments are cleaned for these rows only)
+    page = st.session_state.get("table_page", 1)
     try:
-        works = give_work(secondary,primary)
-        # give_work returns a list of rows [fecha_creacion, descripcion_ot, descripcion_averia, descripcion_reparacion]
+        works, total = give_work_pagina(
+            secondary, primary, offset=(page - 1) * page_size, limit=page_size, descendente=(order == ORDER_NEWEST),
+            desde=date_from, hasta=date_to,
+        )
+        # each row is [fecha_creacion, descripcion_ot, descripcion_averia, descripcion_reparacion, comentarios]
         if not works:
             st.info("No se encontraron órdenes de trabajo para la selección proporcionada.")
-            df = pd.DataFrame(columns=[COL_FECHA, COL_ORDEN, COL_AVARIA, COL_REPAR, COL_COMMENT])
-        else:
-            df = pd.DataFrame(works, columns=[COL_FECHA, COL_ORDEN, COL_AVARIA, COL_REPAR, COL_COMMENT])
+        df = pd.DataFrame(works, columns=COLUMNS)
     except Exception as exc:
         st.error(f"Error al cargar datos: {exc}")
-        df = pd.DataFrame(columns=[COL_FECHA, COL_ORDEN, COL_AVARIA, COL_REPAR, COL_COMMENT])
+        df = pd.DataFrame(columns=COLUMNS)
+        total = 0
+
+    n_pages = max(1, -(-total // page_size))
+    if total:
+        first = (page - 1) * page_size + 1
+        st.caption(f"Mostrando {first}–{first + len(df) - 1} de {total} órdenes de trabajo")
 
     st.dataframe(df, use_container_width=True)
 
+    if n_pages > 1:
+        _, col_page, _ = st.columns([1, 1, 1])
+        with col_page:
+            st.number_input(f"Página (de {n_pages})", min_value=1, max_value=n_pages, step=1, key="table_page")
+
     if st.button("⏮️ Volver", use_container_width=True):
         if "page" in st.session_state:
             st.session_state.pop("page", None)